@@ -1,40 +1,83 @@
+import logging
+import random
+import re
+
+from barin import diff
+from barin import lazy
+from barin import partial
+from barin.schema import Invalid
+from barin.schema.trusted import trusted_loader
 from barin.util import reify
-from barin.event import notify_object
+from barin.event import notify_object, notify_objects
+
+log = logging.getLogger(__name__)
+
+_SAMPLED = re.compile(r"^sampled\((0(\.\d*)?|1(\.0*)?|\.\d+)\)$")
+
+
+def validation_mode(validate):
+    """Parse a validate= mode into (mode, sampling rate).
 
+    The modes are "full" (the default), "trusted" (no validation) and
+    "sampled(p)" (validate a fraction p of the documents)."""
+    if validate is None or validate == "full":
+        return "full", 1.0
+    elif validate == "trusted":
+        return "trusted", 0.0
+    match = _SAMPLED.match(str(validate).replace(" ", ""))
+    if match is None:
+        raise ValueError("Unknown validation mode {!r}".format(validate))
+    return "sampled", float(match.group(1))
 
-def adapter(manager):
-    if getattr(manager, "polymorphic_discriminator", None):
-        return PolymorphicAdapter(manager)
+
+def adapter(manager, lazy=False, validate=None, projection=None):
+    mode, rate = validation_mode(validate)
+    if lazy:
+        return LazyAdapter(manager, projection)
+    elif mode == "trusted":
+        return TrustedAdapter(manager, projection)
+    elif mode == "sampled":
+        return SampledAdapter(manager, rate, projection)
+    elif getattr(manager, "polymorphic_discriminator", None):
+        return PolymorphicAdapter(manager, projection)
     else:
-        return StaticAdapter(manager)
+        return StaticAdapter(manager, projection)
 
 
-class StaticAdapter(object):
-    """Validate and adapt instances of a (non-polymorphic) managed class"""
+def _schema(reg, projection):
+    """The schema validating documents of reg loaded with projection"""
+    if projection is None:
+        return reg.schema
+    return projection.schema(reg.schema)
 
-    def __init__(self, manager):
-        self._manager = manager
 
-    @reify
-    def cls(self):
-        return self._manager.cls
+def _finish(vobj, obj, projection):
+    diff.track_loaded(vobj, obj)
+    if projection is not None:
+        partial.mark(vobj, projection)
+    notify_object(vobj)
+    return vobj
 
-    @reify
-    def schema(self):
-        return self._manager.schema
 
-    def __call__(self, obj, state=None):
-        reg = self._manager.registry.by_class(self.cls)
-        vobj = reg.schema.validate(obj, state)
-        notify_object(vobj)
-        return vobj
+def _validator(schema):
+    """The function validating documents of schema (its generated code,
+    if compiled)"""
+    if schema.compiled:
+        return schema.compile()
+    return schema.validate
 
 
-class PolymorphicAdapter(object):
-    """Validate and adapt instances of a polymorphic managed class"""
+class _Adapter(object):
+    """Base of the adapters: resolves the registrations of the managed
+    class once (again when the registry changes) into a table of
+    whatever _load() returns for each of them"""
 
-    def __init__(self, manager):
+    def __init__(self, manager, projection=None):
         self._manager = manager
+        self.projection = projection
+        self._generation = None
+        self._table = {}
+        self._default = None
 
     @reify
     def cls(self):
@@ -44,8 +87,130 @@ class PolymorphicAdapter(object):
     def registry(self):
         return self._manager.registry
 
+    @reify
+    def discriminator(self):
+        return self.registry.polymorphic_discriminator
+
     def __call__(self, obj, state=None):
-        reg = self.registry.by_value(obj)
-        vobj = reg.schema.validate(obj, state)
-        notify_object(vobj)
-        return vobj
+        vobj = self._adapt(self._lookup(obj), obj, state)
+        return _finish(vobj, obj, self.projection)
+
+    def many(self, objs, state=None):
+        """Adapt a list of documents, looking up their registrations and
+        dispatching hooks once for the batch"""
+        registry = self.registry
+        if self._generation != registry.generation:
+            self._resolve()
+        adapt = self._adapt
+        disc = self.discriminator
+        if disc is None:
+            entry = self._default
+            result = [adapt(entry, obj, state) for obj in objs]
+        else:
+            table, default = self._table, self._default
+            result = [
+                adapt(table.get(obj.get(disc), default), obj, state)
+                for obj in objs
+            ]
+        track = diff.track_loaded
+        for vobj, obj in zip(result, objs):
+            track(vobj, obj)
+        if self.projection is not None:
+            for vobj in result:
+                partial.mark(vobj, self.projection)
+        notify_objects(result)
+        return result
+
+    def _load(self, reg):
+        """Return the entry of reg in the table"""
+        raise NotImplementedError()
+
+    def _adapt(self, entry, obj, state):
+        """Convert obj with the entry of its registration"""
+        raise NotImplementedError()
+
+    def _lookup(self, obj):
+        """Return _load() of the registration of obj"""
+        if self._generation != self.registry.generation:
+            self._resolve()
+        if self.discriminator is None:
+            return self._default
+        return self._table.get(obj.get(self.discriminator), self._default)
+
+    def _resolve(self):
+        registry = self.registry
+        if self.discriminator is None:
+            self._table = {}
+            self._default = self._load(registry.by_class(self.cls))
+        else:
+            self._table = dict(
+                (disc, self._load(reg))
+                for disc, reg in registry._by_disc.items()
+            )
+            default = registry.default
+            self._default = None if default is None else self._load(default)
+        self._generation = registry.generation
+
+
+class StaticAdapter(_Adapter):
+    """Validate and adapt instances of a (non-polymorphic) managed class"""
+
+    def _load(self, reg):
+        return _validator(_schema(reg, self.projection))
+
+    def _adapt(self, validate, obj, state):
+        return validate(obj, state)
+
+
+class PolymorphicAdapter(StaticAdapter):
+    """Validate and adapt instances of a polymorphic managed class, looking
+    up the validator by discriminator"""
+
+
+class LazyAdapter(_Adapter):
+    """Adapt raw BSON documents to instances of a managed class which
+    validate each field on first access"""
+
+    def _load(self, reg):
+        return _schema(reg, self.projection)
+
+    def _adapt(self, schema, obj, state):
+        return lazy.load(schema, obj)
+
+
+class TrustedAdapter(_Adapter):
+    """Adapt documents from a trusted source without validating them"""
+
+    def _load(self, reg):
+        schema = _schema(reg, self.projection)
+        return reg.cls, _validator(schema), trusted_loader(schema)
+
+    def _adapt(self, entry, obj, state):
+        return entry[2](obj)
+
+
+class SampledAdapter(TrustedAdapter):
+    """Validate a fraction of the documents, logging (and counting)
+    validation failures rather than raising them"""
+
+    def __init__(self, manager, rate, projection=None):
+        super(SampledAdapter, self).__init__(manager, projection)
+        self.rate = rate
+        self.sampled = 0
+        self.failures = 0
+
+    def _adapt(self, entry, obj, state):
+        if random.random() >= self.rate:
+            return entry[2](obj)
+        cls, validate, load = entry
+        self.sampled += 1
+        try:
+            return validate(obj, state)
+        except Invalid as err:
+            self.failures += 1
+            log.warning(
+                "Sampled validation of %s failed: %s",
+                cls.__name__,
+                err.unpack_errors(),
+            )
+            return load(obj)
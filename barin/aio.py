@@ -0,0 +1,375 @@
+"""asyncio counterparts of the collection managers, queries and cursors.
+
+These work with any asyncio driver exposing the pymongo API with awaitable
+methods, e.g. pymongo's AsyncMongoClient or Motor. Bind the async database
+with Metadata.bind_async(db) and use the ``aio`` attribute of class
+managers, instance managers, queries and aggregates::
+
+    doc = await MyDoc.m.aio.find_one({'_id': 1})
+    async for doc in MyDoc.m.query.match(...).aio:
+        ...
+    await doc.m.aio.replace()
+"""
+import inspect
+
+import pymongo
+
+from . import diff
+from . import errors
+from . import event
+from . import lazy
+from . import partial
+from .cursor import pop_cursor_options
+
+
+async def _resolve(value):
+    """Await value if the driver returned an awaitable"""
+    if inspect.isawaitable(value):
+        value = await value
+    return value
+
+
+class AsyncCursor(object):
+    def __init__(
+        self,
+        manager,
+        cursor,
+        lazy=False,
+        preload=(),
+        validate=None,
+        projection=None,
+        prefetch=0,
+        prefetch_adapt=True,
+    ):
+        if preload:
+            raise errors.QueryError("preload is not supported by AsyncCursor")
+        if prefetch:
+            raise errors.QueryError("prefetch is not supported by AsyncCursor")
+        self._manager = manager
+        self._lazy = lazy
+        self._validate = validate
+        self._projection = projection
+        self.cursor = cursor
+        self.adapter = manager.read_adapter(validate, lazy, projection)
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        obj = await self.cursor.__anext__()
+        return self.adapter(obj)
+
+    async def all(self):
+        return [obj async for obj in self]
+
+    async def first(self):
+        async for obj in self:
+            return obj
+        return None
+
+    async def one(self):
+        result = [obj async for obj in self]
+        if len(result) != 1:
+            raise ValueError(
+                "{} results returned for one()".format(len(result))
+            )
+        return result[0]
+
+    def _wrap_cursor(name):
+        def wrapper(self, *args, **kwargs):
+            orig = getattr(self.cursor, name)
+            res = orig(*args, **kwargs)
+            return AsyncCursor(
+                self._manager,
+                res,
+                lazy=self._lazy,
+                validate=self._validate,
+                projection=self._projection,
+            )
+
+        wrapper.__name__ = "wrapped_{}".format(name)
+        return wrapper
+
+    sort = _wrap_cursor("sort")
+    skip = _wrap_cursor("skip")
+    limit = _wrap_cursor("limit")
+
+
+class AsyncClassManager(object):
+    """Async operations of a CollectionClassManager"""
+
+    def __init__(self, manager):
+        self._manager = manager
+
+    def __repr__(self):
+        return "<{} {}>".format(
+            self.__class__.__name__, self._manager.cls.__name__
+        )
+
+    @property
+    def hooks(self):
+        return self._manager.hooks
+
+    @property
+    def adapter(self):
+        return self._manager.adapter
+
+    @property
+    def collection(self):
+        coll = self._manager.collection_manager.async_collection
+        if coll is None:
+            raise errors.BarinError(
+                "Metadata is not bound to an async database"
+            )
+        return coll
+
+    def find(self, *args, **kwargs):
+        options = pop_cursor_options(kwargs)
+        # The result cache only serves synchronous reads
+        kwargs.pop("cached", None)
+        args, projection = partial.extract(args, kwargs, 1)
+        if projection is not None:
+            options["projection"] = projection
+        coll = self.collection
+        if options.get("lazy"):
+            coll = lazy.raw_collection(coll)
+        return AsyncCursor(
+            self._manager, coll.find(*args, **kwargs), **options
+        )
+
+    def find_by(self, **kwargs):
+        return self.find(kwargs)
+
+    def _wrap_single(name, position=None):
+        async def wrapper(self, *args, **kwargs):
+            validate = kwargs.pop("validate", None)
+            kwargs.pop("cached", None)
+            args, projection = partial.extract(args, kwargs, position)
+            orig = getattr(self.collection, name)
+            res = await orig(*args, **kwargs)
+            if res is None:
+                return res
+            return self._manager.read_adapter(
+                validate, projection=projection
+            )(res)
+
+        wrapper.__name__ = "wrapped_{}".format(name)
+        return wrapper
+
+    find_one = _wrap_single("find_one", 1)
+    find_one_and_update = event.with_async_hooks("find_one_and_update")(
+        _wrap_single("find_one_and_update")
+    )
+    find_one_and_replace = event.with_async_hooks("find_one_and_replace")(
+        _wrap_single("find_one_and_replace")
+    )
+    find_one_and_delete = event.with_async_hooks("find_one_and_delete")(
+        _wrap_single("find_one_and_delete")
+    )
+
+    async def get(self, **kwargs):
+        return await self.find_one(kwargs)
+
+    def _wrap_collection(name):
+        async def wrapper(self, *args, **kwargs):
+            orig = getattr(self.collection, name)
+            return await orig(*args, **kwargs)
+
+        wrapper.__name__ = "wrapped_{}".format(name)
+        return wrapper
+
+    def _wrap_write(name):
+        @event.with_async_hooks(name)
+        async def wrapper(self, *args, **kwargs):
+            orig = getattr(self.collection, name)
+            return await orig(*args, **kwargs)
+
+        wrapper.__name__ = "wrapped_{}".format(name)
+        return wrapper
+
+    update_one = _wrap_write("update_one")
+    update_many = _wrap_write("update_many")
+    replace_one = _wrap_write("replace_one")
+    delete_one = _wrap_write("delete_one")
+    delete_many = _wrap_write("delete_many")
+    bulk_write = _wrap_write("bulk_write")
+    count_documents = _wrap_collection("count_documents")
+
+    @event.with_async_hooks()
+    async def insert_one(self, obj):
+        return await self.collection.insert_one(self.adapter(obj))
+
+    @event.with_async_hooks()
+    async def insert_many(self, objs):
+        return await self.collection.insert_many(map(self.adapter, objs))
+
+
+class AsyncInstanceManager(object):
+    """Async operations of an InstanceManager"""
+
+    __slots__ = ("_manager", "instance")
+
+    def __init__(self, manager, instance):
+        self._manager = manager
+        self.instance = instance
+
+    @property
+    def hooks(self):
+        return self._manager.hooks
+
+    @event.with_async_hooks("insert")
+    async def insert(self):
+        return await self._manager.insert_one(self.instance)
+
+    @event.with_async_hooks("delete")
+    async def delete(self):
+        return await self._manager.delete_one({"_id": self.instance._id})
+
+    @event.with_async_hooks("replace")
+    async def replace(self, **kwargs):
+        partial.require_complete(self.instance)
+        lazy.materialize(self.instance)
+        diff.forget(self.instance)
+        return await self._manager.replace_one(
+            {"_id": self.instance._id}, self.instance, **kwargs
+        )
+
+    @event.with_async_hooks("save")
+    async def save(self, **kwargs):
+        schema = partial.schema_for(
+            self.instance, self._manager._manager.schema
+        )
+        spec = diff.update_spec(self.instance, schema)
+        if spec is None:
+            partial.require_complete(self.instance)
+            kwargs.setdefault("upsert", True)
+            lazy.materialize(self.instance)
+            res = await self._manager.replace_one(
+                {"_id": self.instance._id}, self.instance, **kwargs
+            )
+            diff.snapshot(self.instance)
+            return res
+        if not spec:
+            return None
+        res = await self._manager.update_one(
+            {"_id": self.instance._id}, spec, **kwargs
+        )
+        diff.commit(self.instance, spec)
+        return res
+
+    @event.with_async_hooks("update")
+    async def update(self, update_spec, **kwargs):
+        refresh = kwargs.pop("refresh", False)
+        if refresh:
+            obj = await self._manager.find_one_and_update(
+                {"_id": self.instance._id},
+                update_spec,
+                return_document=pymongo.ReturnDocument.AFTER,
+                **kwargs
+            )
+            if obj:
+                self.instance.clear()
+                self.instance.update(obj)
+                diff.track(self.instance, diff.stored(obj))
+            else:
+                # Object has been deleted
+                return None
+        else:
+            return await self._manager.update_one(
+                {"_id": self.instance._id}, update_spec, **kwargs
+            )
+
+
+class _AsyncCursorSource(object):
+    async def get_cursor(self):
+        raise NotImplementedError()
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        cursor = await self.get_cursor()
+        async for obj in cursor:
+            yield obj
+
+    async def all(self):
+        return [obj async for obj in self]
+
+    async def first(self):
+        async for obj in self:
+            return obj
+        return None
+
+    async def one(self):
+        result = [obj async for obj in self]
+        if len(result) != 1:
+            raise ValueError(
+                "{} results returned for one()".format(len(result))
+            )
+        return result[0]
+
+
+class AsyncQuery(_AsyncCursorSource):
+    """Async execution of a (synchronously built) Query"""
+
+    def __init__(self, query):
+        self.query = query
+
+    @property
+    def _mgr(self):
+        return self.query._mgr.aio
+
+    async def get_cursor(self):
+        query = self.query
+        return self._mgr.find(**query._compile_query(), **query.options)
+
+    async def count(self):
+        filter_args = self.query._compile_query().get("filter", {})
+        return await self._mgr.count_documents(filter=filter_args)
+
+    def _wrap_mgr(name):
+        async def wrapper(self, *args, **kwargs):
+            orig = getattr(self._mgr, name)
+            qres = self.query._compile_query()
+            if "sort" in qres:
+                kwargs["sort"] = qres["sort"]
+            return await orig(qres["filter"], *args, **kwargs)
+
+        wrapper.__name__ = "wrapped_{}".format(name)
+        return wrapper
+
+    update_one = _wrap_mgr("update_one")
+    update_many = _wrap_mgr("update_many")
+    replace_one = _wrap_mgr("replace_one")
+    delete_one = _wrap_mgr("delete_one")
+    delete_many = _wrap_mgr("delete_many")
+    find_one_and_update = _wrap_mgr("find_one_and_update")
+    find_one_and_replace = _wrap_mgr("find_one_and_replace")
+    find_one_and_delete = _wrap_mgr("find_one_and_delete")
+
+
+class AsyncAggregate(_AsyncCursorSource):
+    """Async execution of a (synchronously built) Aggregate"""
+
+    def __init__(self, aggregate):
+        self.aggregate = aggregate
+
+    async def get_cursor(self):
+        agg = self.aggregate
+        collection = agg._mgr.aio.collection
+        is_lazy = agg.options.get("lazy", False) and not agg.raw
+        if is_lazy:
+            collection = lazy.raw_collection(collection)
+        pipeline = agg._cursor_pipeline()
+        if agg._hint:
+            res = collection.aggregate(pipeline, hint=agg._hint)
+        else:
+            res = collection.aggregate(pipeline)
+        res = await _resolve(res)
+        if agg.raw:
+            return res
+        options = dict(agg.options, lazy=is_lazy)
+        return AsyncCursor(agg._mgr, res, **options)
@@ -0,0 +1,200 @@
+"""Chunked bulk inserts.
+
+insert_bulk() reads the input in chunks, so it can stream from a
+generator. Each chunk is validated and BSON encoded, split into
+insert_many() batches of at most max_bytes, and inserted.
+
+Validation is pure Python, so it doesn't run faster on threads (see
+benchmarks/bench_bulk.py): by default (workers=0) the chunks are handled
+one after the other. With workers > 0, they are handled by a thread pool
+(in copies of the caller's context), which can overlap the validation of
+a chunk with the server round trips of others; validators and hooks
+relying on thread-local state then run on other threads.
+
+With ordered=True the batches are inserted one after the other. The
+insert stops at the first invalid document or write error.
+"""
+from collections import deque, namedtuple
+from concurrent.futures import Future, ThreadPoolExecutor
+import contextvars
+from itertools import islice
+
+import bson
+import pymongo.errors
+from bson.raw_bson import RawBSONDocument
+
+from .schema import Invalid
+
+# The errors bson.encode() raises for values it can't encode with the
+# codec options (e.g. native UUIDs without a uuid_representation, or
+# integers over 64 bits)
+_ENCODING_ERRORS = (bson.errors.BSONError, ValueError, OverflowError)
+
+BulkError = namedtuple("BulkError", "index error")
+
+
+class BulkInsertResult(object):
+    """Outcome of insert_bulk(). errors lists a BulkError for each document
+    which failed validation (an Invalid) or BSON encoding (the exception)
+    or was rejected by the server (the writeError document), by its
+    position in the input."""
+
+    def __init__(self):
+        self.inserted_count = 0
+        self.errors = []
+
+    def __repr__(self):
+        return "<BulkInsertResult inserted={} errors={}>".format(
+            self.inserted_count, len(self.errors)
+        )
+
+    def _merge(self, inserted_count, errors):
+        self.inserted_count += inserted_count
+        self.errors.extend(errors)
+
+
+def insert_bulk(
+    manager,
+    objs,
+    chunk_size=1000,
+    max_bytes=8 * 2 ** 20,
+    workers=0,
+    ordered=False,
+    executor=None,
+):
+    """Validate and insert objs with manager (a CollectionClassManager),
+    returning a BulkInsertResult"""
+    collection = manager.collection_manager.collection
+    result = BulkInsertResult()
+    own_executor = executor is None
+    if own_executor:
+        if workers:
+            executor = ThreadPoolExecutor(workers)
+        else:
+            executor = _SerialExecutor()
+    opts = collection.codec_options
+    if ordered:
+        task = (_prepare, manager.adapter, opts, max_bytes)
+    else:
+        task = (
+            _prepare_and_insert,
+            manager.adapter,
+            opts,
+            max_bytes,
+            collection,
+        )
+    pending = deque()
+    try:
+        for chunk in _chunks(objs, chunk_size):
+            pending.append(
+                executor.submit(contextvars.copy_context().run, *task, chunk)
+            )
+            if len(pending) > workers:
+                if not _collect(pending, result, ordered, collection):
+                    return result
+        while pending:
+            if not _collect(pending, result, ordered, collection):
+                return result
+    finally:
+        for future in pending:
+            future.cancel()
+        if own_executor:
+            executor.shutdown()
+        result.errors.sort(key=lambda e: e.index)
+    return result
+
+
+def _collect(pending, result, ordered, collection):
+    """Handle the oldest chunk, returning False to stop"""
+    if not ordered:
+        result._merge(*pending.popleft().result())
+        return True
+    batches, errors = pending.popleft().result()
+    stop = errors[0].index if errors else None
+    for batch in batches:
+        if stop is not None:
+            batch = [item for item in batch if item[0] < stop]
+            if not batch:
+                break
+        inserted_count, write_errors = _insert(collection, batch, True)
+        result._merge(inserted_count, write_errors)
+        if write_errors:
+            return False
+    if errors:
+        result._merge(0, errors[:1])
+        return False
+    return True
+
+
+def _chunks(objs, size):
+    it = enumerate(objs)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _prepare(adapter, opts, max_bytes, chunk):
+    """Validate and encode a chunk, returning (batches, errors)"""
+    batches, errors = [], []
+    batch, size = [], 0
+    for index, obj in chunk:
+        try:
+            doc = adapter(obj)
+        except Invalid as err:
+            errors.append(BulkError(index, err))
+            continue
+        try:
+            raw = bson.encode(doc, codec_options=opts)
+        except _ENCODING_ERRORS as err:
+            errors.append(BulkError(index, err))
+            continue
+        if batch and size + len(raw) > max_bytes:
+            batches.append(batch)
+            batch, size = [], 0
+        batch.append((index, RawBSONDocument(raw)))
+        size += len(raw)
+    if batch:
+        batches.append(batch)
+    return batches, errors
+
+
+def _prepare_and_insert(adapter, opts, max_bytes, collection, chunk):
+    batches, errors = _prepare(adapter, opts, max_bytes, chunk)
+    inserted_count = 0
+    for batch in batches:
+        count, write_errors = _insert(collection, batch, False)
+        inserted_count += count
+        errors.extend(write_errors)
+    return inserted_count, errors
+
+
+def _insert(collection, batch, ordered):
+    """Insert a batch of (index, raw) pairs, returning
+    (inserted_count, errors)"""
+    try:
+        collection.insert_many([raw for index, raw in batch], ordered=ordered)
+    except pymongo.errors.BulkWriteError as err:
+        details = err.details
+        errors = [
+            BulkError(batch[e["index"]][0], e)
+            for e in details.get("writeErrors", ())
+        ]
+        return details.get("nInserted", 0), errors
+    return len(batch), []
+
+
+class _SerialExecutor(object):
+    """Runs the submitted calls right away"""
+
+    def submit(self, func, *args):
+        future = Future()
+        try:
+            future.set_result(func(*args))
+        except BaseException as err:
+            future.set_exception(err)
+        return future
+
+    def shutdown(self, wait=True):
+        pass
@@ -0,0 +1,235 @@
+"""Read-through cache of query results, stored as raw BSON.
+
+Enable it for every find()/find_one()/get()/Query of a collection with
+the ``cache`` collection option, or for a single query with
+``query.cached()``::
+
+    Country = collection(metadata, 'country', ..., cache=True)
+    Country = collection(metadata, 'country', ..., cache=dict(ttl=300))
+    Doc.m.query.match(...).cached(ttl=10).all()
+
+The option is True (default settings), the TTL in seconds, a dict of
+ResultCache arguments or a ResultCache. Results are cached by the
+operation and its (compiled) arguments, and are revalidated on every hit
+so cached documents are never shared. Each collection's cache is cleared
+by its write operations (see CollectionManager.WRITE_HOOKS); writes made
+outside barin are only picked up once the entries expire. Async reads
+(through the ``aio`` attributes) bypass the cache.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+import bson
+import pymongo.cursor
+import pymongo.errors
+from bson.errors import InvalidDocument
+
+
+class ResultCache(object):
+    """LRU cache with a TTL and a cap on the number of stored bytes"""
+
+    def __init__(
+        self,
+        ttl=60.0,
+        max_entries=1024,
+        max_bytes=16 * 2 ** 20,
+        clock=time.monotonic,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.nbytes = 0
+        self.generation = 0
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return "<ResultCache {entries} entries, {nbytes} bytes>".format(
+            **self.stats()
+        )
+
+    def __len__(self):
+        return len(self._entries)
+
+    @classmethod
+    def from_option(cls, option):
+        """Return the cache configured by a collection option, or None"""
+        if option is None or option is False:
+            return None
+        elif isinstance(option, cls):
+            return option
+        elif option is True:
+            return cls()
+        elif isinstance(option, dict):
+            return cls(**option)
+        return cls(ttl=option)
+
+    @staticmethod
+    def key(op, args, kwargs):
+        """The cache key of an operation, or None if it can't be cached"""
+        try:
+            return bson.encode(dict(op=op, args=list(args), kwargs=kwargs))
+        except (InvalidDocument, TypeError):
+            return None
+
+    def get(self, key):
+        """Return the list of raw BSON documents stored under key,
+        or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= self.clock():
+                self._discard(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, raws, ttl=True, generation=None):
+        """Store the list of raw BSON documents under key.
+
+        Nothing is stored if the cache was invalidated since
+        ``generation`` or if the result exceeds max_bytes.
+        """
+        if ttl is True:
+            ttl = self.ttl
+        size = len(key) + sum(map(len, raws))
+        if size > self.max_bytes:
+            return False
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return False
+            self._discard(key)
+            self._entries[key] = (self.clock() + ttl, raws, size)
+            self.nbytes += size
+            while self._entries and (
+                len(self._entries) > self.max_entries
+                or self.nbytes > self.max_bytes
+            ):
+                self._discard(next(iter(self._entries)))
+                self.evictions += 1
+        return True
+
+    def fill(self, key, docs, ttl=True):
+        """Yield the RawBSONDocuments docs, storing them under key once
+        exhausted"""
+        generation = self.generation
+        raws, size = [], 0
+        for doc in docs:
+            if raws is not None:
+                raws.append(doc.raw)
+                size += len(doc.raw)
+                if size > self.max_bytes:
+                    raws = None
+            yield doc
+        if raws is not None:
+            self.put(key, raws, ttl, generation)
+
+    def invalidate(self):
+        """Drop all entries"""
+        with self._lock:
+            self.generation += 1
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        return dict(
+            hits=self.hits,
+            misses=self.misses,
+            evictions=self.evictions,
+            invalidations=self.invalidations,
+            entries=len(self._entries),
+            nbytes=self.nbytes,
+        )
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.nbytes -= entry[2]
+
+
+class CachedCursor(object):
+    """Stands in for the pymongo cursor of a cached find().
+
+    sort(), skip() and limit() become arguments of the read, and so part
+    of its cache key; read(args, kwargs) is called on the first
+    iteration. Using any other cursor method (hint(), collation(), ...)
+    before that bypasses the cache: the method applies to the cursor
+    returned by find(args, kwargs), which is then iterated."""
+
+    def __init__(self, read, find, collection, args, kwargs):
+        self.collection = collection
+        self._read = read
+        self._find = find
+        self._args = args
+        self._kwargs = dict(kwargs)
+        self._batch_size = None
+        self._cursor = None
+        self._it = None
+
+    def __getattr__(self, name):
+        if name.startswith("_") or not hasattr(pymongo.cursor.Cursor, name):
+            raise AttributeError(name)
+        if self._cursor is None:
+            if self._it is not None:
+                raise pymongo.errors.InvalidOperation(
+                    "cannot use {}() after executing a cached query".format(
+                        name
+                    )
+                )
+            cursor = self._find(self._args, self._kwargs)
+            if self._batch_size is not None:
+                cursor.batch_size(self._batch_size)
+            self._cursor = self._it = cursor
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._it is None:
+            self._it = iter(self._read(self._args, self._kwargs))
+        return next(self._it)
+
+    next = __next__
+
+    def _set(self, name, value):
+        if self._cursor is not None:
+            getattr(self._cursor, name)(value)
+            return self
+        if self._it is not None:
+            raise pymongo.errors.InvalidOperation(
+                "cannot set options after executing query"
+            )
+        self._kwargs[name] = value
+        return self
+
+    def sort(self, key_or_list, direction=None):
+        if isinstance(key_or_list, str):
+            if direction is None:
+                direction = 1
+            key_or_list = [(key_or_list, direction)]
+        return self._set("sort", list(key_or_list))
+
+    def skip(self, skip):
+        return self._set("skip", skip)
+
+    def limit(self, limit):
+        return self._set("limit", limit)
+
+    def batch_size(self, batch_size):
+        if self._cursor is not None:
+            self._cursor.batch_size(batch_size)
+        else:
+            self._batch_size = batch_size
+        return self
+
+    def close(self):
+        self._it = iter(())
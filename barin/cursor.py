@@ -1,14 +1,65 @@
-from .adapter import adapter
+from itertools import islice
+
+import pymongo.errors
+
+from . import errors
+from . import instrument
+from . import prefetch
+from . import session
+
+# Keyword arguments to find() which configure the barin Cursor
+CURSOR_OPTIONS = ("lazy", "preload", "validate", "prefetch", "prefetch_adapt")
+
+
+def pop_cursor_options(kwargs):
+    return dict(
+        (name, kwargs.pop(name)) for name in CURSOR_OPTIONS if name in kwargs
+    )
+
+
+def _set_batch_size(pymongo_cursor, size):
+    set_batch_size = getattr(pymongo_cursor, "batch_size", None)
+    if set_batch_size is not None:
+        try:
+            set_batch_size(size)
+        except pymongo.errors.InvalidOperation:
+            pass  # Iteration has started
 
 
 class Cursor(object):
-    def __init__(self, manager, pymongo_cursor):
+    preload_batch_size = 100
+
+    def __init__(
+        self,
+        manager,
+        pymongo_cursor,
+        lazy=False,
+        preload=(),
+        validate=None,
+        projection=None,
+        prefetch=0,
+        prefetch_adapt=True,
+    ):
         self._manager = manager
+        self._options = dict(
+            lazy=lazy,
+            preload=tuple(preload),
+            validate=validate,
+            projection=projection,
+            prefetch=prefetch,
+            prefetch_adapt=prefetch_adapt,
+        )
         self.pymongo_cursor = pymongo_cursor
-        self._wrap_cursor("sort")
-        self._wrap_cursor("skip")
-        self._wrap_cursor("limit")
-        self.adapter = adapter(manager)
+        self.adapter = manager.read_adapter(validate, lazy, projection)
+        if isinstance(pymongo_cursor, instrument.MeteredCursor):
+            self.adapter = instrument.MeteredAdapter(
+                self.adapter, pymongo_cursor
+            )
+        self._session = session.current(manager.metadata)
+        self._buffer = None
+        self._prefetcher = None
+        if preload or prefetch:
+            self._buffer = iter(())
 
     def __getattr__(self, name):
         return getattr(self.pymongo_cursor, name)
@@ -20,8 +71,12 @@ class Cursor(object):
         return self
 
     def __next__(self):
-        obj = next(self.pymongo_cursor)
-        return self.adapter(obj)
+        if self._buffer is not None:
+            return self._next_buffered()
+        obj = self.adapter(next(self.pymongo_cursor))
+        if self._session is not None:
+            obj = self._session.merge(self._manager, obj)
+        return obj
 
     next = __next__
 
@@ -40,12 +95,139 @@ class Cursor(object):
             return res
         raise ValueError("More than one result returned for one()")
 
-    def _wrap_cursor(self, name):
-        def wrapper(*args, **kwargs):
+    def preload(self, *names):
+        """Load the named relationships for each batch of results with
+        one query per relationship"""
+        return self._clone(
+            self.pymongo_cursor, preload=self._options["preload"] + names
+        )
+
+    def close(self):
+        """Stop prefetching (if any) and close the pymongo cursor"""
+        if self._prefetcher is not None:
+            self._prefetcher.close()
+        close = getattr(self.pymongo_cursor, "close", None)
+        if close is not None:
+            close()
+
+    def prefetch_stats(self):
+        """The prefetch.Prefetcher statistics, or None"""
+        if self._prefetcher is None:
+            return None
+        return self._prefetcher.stats()
+
+    def _clone(self, pymongo_cursor, **overrides):
+        options = dict(self._options, **overrides)
+        return Cursor(self._manager, pymongo_cursor, **options)
+
+    def _next_buffered(self):
+        for obj in self._buffer:
+            return obj
+        batch = self._next_batch(self.preload_batch_size)
+        if not batch:
+            raise StopIteration()
+        self._buffer = iter(batch)
+        return next(self._buffer)
+
+    def batches(self, size=100):
+        """Yield the results in lists of (at most) size documents, also
+        setting the server batch size (if iteration hasn't started)"""
+        _set_batch_size(self.pymongo_cursor, size)
+        if self._buffer is not None:
+            rest = list(self._buffer)
+            self._buffer = iter(())
+            if rest:
+                yield rest
+        while True:
+            batch = self._next_batch(size)
+            if not batch:
+                return
+            yield batch
+
+    def _next_batch(self, size):
+        if self._options["prefetch"]:
+            batch = self._next_prefetched(size)
+        else:
+            batch = self.adapter.many(list(islice(self.pymongo_cursor, size)))
+        if self._session is not None:
+            merge = self._session.merge
+            batch = [merge(self._manager, obj) for obj in batch]
+        if batch and self._options["preload"]:
+            self._preload(batch)
+        return batch
+
+    def _next_prefetched(self, size):
+        adapt = self._options["prefetch_adapt"]
+        if self._prefetcher is None:
+            self._prefetcher = prefetch.Prefetcher(
+                self.pymongo_cursor,
+                size,
+                depth=self._options["prefetch"],
+                adapt=self.adapter.many if adapt else None,
+            )
+        batch = self._prefetcher.next_batch()
+        if not adapt:
+            batch = self.adapter.many(batch)
+        return batch
+
+    def _preload(self, batch):
+        mgr = self._manager
+        cls = mgr.registry.by_class(mgr.cls).cls
+        for name in self._options["preload"]:
+            loader = getattr(getattr(cls, name, None), "preload", None)
+            if loader is None:
+                raise errors.QueryError(
+                    "{} is not a relationship of {}".format(name, cls)
+                )
+            loader(batch, mgr.metadata)
+
+    def _wrap_cursor(name):
+        def wrapper(self, *args, **kwargs):
             orig = getattr(self.pymongo_cursor, name)
             res = orig(*args, **kwargs)
-            return Cursor(self._manager, res)
+            return self._clone(res)
 
         wrapper.__name__ = "wrapped_{}".format(name)
-        setattr(self, name, wrapper)
         return wrapper
+
+    sort = _wrap_cursor("sort")
+    skip = _wrap_cursor("skip")
+    limit = _wrap_cursor("limit")
+
+
+class RawCursor(object):
+    """Cursor returning the documents of a pymongo cursor as they are (the
+    results of a raw aggregation)"""
+
+    def __init__(self, pymongo_cursor):
+        self.pymongo_cursor = pymongo_cursor
+
+    def __getattr__(self, name):
+        return getattr(self.pymongo_cursor, name)
+
+    def __dir__(self):
+        return dir(self.pymongo_cursor) + list(self.__dict__.keys())
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self.pymongo_cursor)
+
+    next = __next__
+
+    def all(self):
+        return list(self)
+
+    def first(self):
+        return next(iter(self))
+
+    def batches(self, size=100):
+        """Yield the results in lists of (at most) size documents, also
+        setting the server batch size (if iteration hasn't started)"""
+        _set_batch_size(self.pymongo_cursor, size)
+        while True:
+            batch = list(islice(self.pymongo_cursor, size))
+            if not batch:
+                return
+            yield batch
@@ -0,0 +1,223 @@
+"""Minimal update documents from the changes made to loaded documents.
+
+The adapters keep a reference to the document as it came from the
+database (the raw document the instance was validated from). update_spec()
+compares the instance against it and returns the $set/$unset/$push update
+which takes the stored document to the instance's state:
+
+- subdocuments are compared key by key, so a change deep inside a large
+  subdocument only $sets the changed path
+- lists which only grew at the end are extended with $push/$each
+- values which differ from the stored ones only by the conversion of
+  their validator (e.g. an int stored for a Float field, or a Binary for
+  a UUID) are unchanged
+
+Mutable values the instance shares with the loaded document (e.g. from an
+Anything field) are copied into the snapshot when loading, so changes
+made to them in place are detected. Only the changed top-level fields
+are validated.
+"""
+from collections.abc import Mapping
+
+from bson.raw_bson import RawBSONDocument
+
+from . import lazy
+from .schema import Invalid, Missing
+
+SNAPSHOT = "_barin_snapshot"
+
+
+def track(obj, raw):
+    """Remember raw as the stored state of obj"""
+    state = getattr(obj, "__dict__", None)
+    if state is not None:
+        state[SNAPSHOT] = raw
+    return obj
+
+
+def track_loaded(obj, raw):
+    """Remember the document raw which obj was validated from as the
+    stored state of obj"""
+    return track(obj, _unshare(raw, obj))
+
+
+def snapshot(obj):
+    """Remember (a copy of) the current state of obj as its stored state"""
+    return track(obj, _copy(lazy.materialize(obj)))
+
+
+def stored(obj):
+    """Return the stored state of obj, or None"""
+    return getattr(obj, "__dict__", {}).get(SNAPSHOT)
+
+
+def forget(obj):
+    state = getattr(obj, "__dict__", None)
+    if state is not None:
+        state.pop(SNAPSHOT, None)
+
+
+def update_spec(obj, schema=None):
+    """Return the update taking the stored state of obj to its current
+    state (an empty dict when nothing changed), or None when there is no
+    stored state to compare with.
+
+    The changed fields are validated with schema and the validated values
+    are stored in obj.
+    """
+    old = stored(obj)
+    if old is None:
+        return None
+    if isinstance(obj, lazy.LazyDocument):
+        # Fields which were never loaded can't have been modified
+        pending = obj._barin_pending
+        names = list(dict.keys(obj))
+        loaded = set(names)
+        removed = [
+            k for k in old.keys() if k not in pending and k not in loaded
+        ]
+    else:
+        names = list(obj.keys())
+        removed = [k for k in old.keys() if k not in obj]
+
+    ops = {"$set": {}, "$unset": {}, "$push": {}}
+    errors = {}
+    for name in names:
+        value = dict.__getitem__(obj, name)
+        orig = old.get(name, Missing)
+        if orig is not Missing:
+            orig = lazy.inflate(orig)
+        field_ops = {"$set": {}, "$unset": {}, "$push": {}}
+        _diff(name, orig, value, field_ops)
+        if not any(field_ops.values()):
+            continue
+        if schema is not None:
+            try:
+                validated = _validate(schema, name, value)
+            except Invalid as err:
+                errors[name] = err
+                continue
+            if validated is not value:
+                dict.__setitem__(obj, name, validated)
+            if orig is not Missing:
+                # Compare with the stored value as it was loaded
+                try:
+                    orig = _validate(schema, name, orig)
+                except Invalid:
+                    pass
+            field_ops = {"$set": {}, "$unset": {}, "$push": {}}
+            _diff(name, orig, validated, field_ops)
+        for op, paths in field_ops.items():
+            ops[op].update(paths)
+    if schema is not None:
+        for name in removed:
+            if schema.fields.get(name, Missing) is not Missing:
+                try:
+                    schema.fields[name].validate(Missing)
+                except Invalid as err:
+                    errors[name] = err
+    if errors:
+        raise Invalid("", obj, document=errors)
+    for name in removed:
+        ops["$unset"][name] = ""
+    return dict((op, paths) for op, paths in ops.items() if paths)
+
+
+def commit(obj, spec):
+    """Update the stored state of obj after spec was applied"""
+    old = obj.__dict__[SNAPSHOT]
+    new = dict(old)
+    for paths in spec.values():
+        for path in paths:
+            name = path.split(".", 1)[0]
+            if name in obj:
+                new[name] = _copy(obj[name])
+            else:
+                new.pop(name, None)
+    track(obj, new)
+
+
+def _validate(schema, name, value):
+    validator = schema.fields.get(name, Missing)
+    if validator is Missing:
+        validator = schema.extra_validator
+    if not validator:
+        return value
+    return validator.validate(value)
+
+
+def _diff(path, old, new, ops):
+    if old is new:
+        if isinstance(new, (Mapping, list)):
+            ops["$set"][path] = new
+        return
+    if (
+        isinstance(old, Mapping)
+        and isinstance(new, Mapping)
+        and _plain(old)
+        and _plain(new)
+    ):
+        for key, value in new.items():
+            sub = path + "." + key
+            if key in old:
+                _diff(sub, old[key], value, ops)
+            else:
+                ops["$set"][sub] = value
+        for key in old:
+            if key not in new:
+                ops["$unset"][path + "." + key] = ""
+    elif (
+        isinstance(old, list)
+        and isinstance(new, list)
+        and len(new) > len(old)
+        and new[: len(old)] == old
+    ):
+        ops["$push"][path] = {"$each": new[len(old):]}
+    elif type(old) is not type(new) or old != new:
+        ops["$set"][path] = new
+
+
+def _plain(doc):
+    """True if all keys of doc can be used in a dotted path"""
+    return all(
+        isinstance(k, str) and k and "." not in k and not k.startswith("$")
+        for k in doc
+    )
+
+
+def _unshare(raw, value):
+    """Return raw, with copies of the documents and lists it shares with
+    value (its validated form)"""
+    if raw is value:
+        if isinstance(raw, (Mapping, list)):
+            return _copy(raw)
+        return raw
+    if isinstance(raw, RawBSONDocument):
+        # Its values are decoded anew on each access
+        return raw
+    if isinstance(raw, Mapping) and isinstance(value, dict):
+        result = raw
+        for key, v in raw.items():
+            new = _unshare(v, dict.get(value, key))
+            if new is not v:
+                if result is raw:
+                    result = dict(raw)
+                result[key] = new
+        return result
+    if isinstance(raw, list) and isinstance(value, list):
+        if len(raw) != len(value):
+            return raw
+        result = [_unshare(v, new) for v, new in zip(raw, value)]
+        if any(a is not b for a, b in zip(result, raw)):
+            return result
+    return raw
+
+
+def _copy(value):
+    """Copy the documents and lists of value into plain dicts and lists
+    (the other BSON values are immutable)"""
+    if isinstance(value, Mapping):
+        return dict((key, _copy(v)) for key, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return [_copy(v) for v in value]
+    return value
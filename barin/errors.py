@@ -2,3 +2,5 @@ class BarinError(Exception): pass
 class SchemaError(BarinError): pass
 class QueryError(BarinError): pass
 class ConflictError(QueryError): pass
+class FieldNotLoaded(BarinError, KeyError): pass
+class PartialDocumentError(BarinError): pass
@@ -1,3 +1,4 @@
+import inspect
 import logging
 from functools import wraps
 from contextlib import contextmanager
@@ -5,6 +6,10 @@ from contextlib import contextmanager
 log = logging.getLogger(__name__)
 _OBJECT_HOOKS = []
 
+# Prefix of the hook lists holding coroutine functions, which only the
+# async operations (see with_async_hooks) call
+ASYNC_PREFIX = "async_"
+
 
 def listens_for_object(func):
     _OBJECT_HOOKS.append(func)
@@ -21,7 +26,17 @@ def notify_object(obj):
             )
 
 
+def notify_objects(objs):
+    """notify_object() each of objs"""
+    if not _OBJECT_HOOKS:
+        return
+    for obj in objs:
+        notify_object(obj)
+
+
 def listen(obj, hook, callback):
+    if inspect.iscoroutinefunction(callback):
+        hook = ASYNC_PREFIX + hook
     obj.__barin__.hooks[hook].append(callback)
 
 
@@ -44,10 +59,50 @@ def with_hooks(hook=None, before=True, after=True):
         else:
             hook_name = hook
 
+        before_name = "before_" + hook_name
+        after_name = "after_" + hook_name
+
         @wraps(func)
         def wrapper(self, *args, **kwargs):
-            with hook_context(self.hooks, hook_name, self, args, kwargs):
-                return func(self, *args, **kwargs)
+            hooks = self.hooks
+            if before:
+                _call_hooks(hooks.get(before_name, ()), self, args, kwargs)
+            result = func(self, *args, **kwargs)
+            if after:
+                _call_hooks(hooks.get(after_name, ()), self, args, kwargs)
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+def with_async_hooks(hook=None, before=True, after=True):
+    """Like with_hooks, for coroutine methods. The (sync) hooks run,
+    then the coroutine function hooks are awaited."""
+
+    def decorator(func):
+        if hook is None:
+            hook_name = func.__name__
+        else:
+            hook_name = hook
+
+        before_name = "before_" + hook_name
+        after_name = "after_" + hook_name
+
+        @wraps(func)
+        async def wrapper(self, *args, **kwargs):
+            hooks = self.hooks
+            if before:
+                await _acall_hooks(
+                    _async_hooks(hooks, before_name), self, args, kwargs
+                )
+            result = await func(self, *args, **kwargs)
+            if after:
+                await _acall_hooks(
+                    _async_hooks(hooks, after_name), self, args, kwargs
+                )
+            return result
 
         return wrapper
 
@@ -63,6 +118,26 @@ def hook_context(hooks, hook, self, args, kwargs, before=True, after=True):
         _call_hooks(hooks.get("after_" + hook, []), self, args, kwargs)
 
 
+def _async_hooks(hooks, name):
+    return list(hooks.get(name, ())) + list(
+        hooks.get(ASYNC_PREFIX + name, ())
+    )
+
+
 def _call_hooks(funcs, self, args, kwargs):
     for func in funcs:
-        func(self, *args, **kwargs)
+        res = func(self, *args, **kwargs)
+        if inspect.isawaitable(res):
+            if inspect.iscoroutine(res):
+                res.close()
+            raise TypeError(
+                "Hook {!r} returned an awaitable, which a synchronous "
+                "operation can't await".format(func)
+            )
+
+
+async def _acall_hooks(funcs, self, args, kwargs):
+    for func in funcs:
+        res = func(self, *args, **kwargs)
+        if inspect.isawaitable(res):
+            await res
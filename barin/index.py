@@ -1,5 +1,29 @@
+"""Declared indexes, and ensure_indexes() to create them.
+
+ensure_indexes() compares the indexes declared on each collection with
+those on the server, matching on the key spec and options, and creates
+the missing ones with one create_indexes() call per collection. The
+collections are handled in parallel. Existing indexes with the same keys
+but different options are reported as conflicting and left alone;
+indexes that aren't declared are reported as extraneous (and dropped
+with drop_unknown=True).
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+import pymongo
 import six
 
+# Options which change what an index does; the others (e.g. background)
+# don't make two indexes different
+SIGNIFICANT_OPTIONS = (
+    "unique",
+    "sparse",
+    "partialFilterExpression",
+    "expireAfterSeconds",
+    "collation",
+    "hidden",
+)
+
 
 class Index(object):
     def __init__(self, arg, **options):
@@ -10,7 +34,7 @@ class Index(object):
             if isinstance(a, six.string_types):
                 self.arg.append((a, 1))
             else:
-                self.arg.append(a)
+                self.arg.append(tuple(a))
         self.options = options
 
     def __repr__(self):
@@ -18,3 +42,137 @@ class Index(object):
 
     def create(self, collection):
         return collection.create_index(self.arg, **self.options)
+
+    def model(self):
+        return pymongo.IndexModel(self.arg, **self.options)
+
+    def matches_keys(self, info):
+        """True if the existing index (a list_indexes() document) has the
+        key spec of this index"""
+        key = list(info["key"].items())
+        text = [name for name, kind in self.arg if kind == "text"]
+        if not text:
+            return key == self.arg
+        # Text indexes are stored as {_fts: "text", _ftsx: 1}
+        others = [k for k in self.arg if k[1] != "text"]
+        stored = [k for k in key if k[0] not in ("_fts", "_ftsx")]
+        return (
+            "_fts" in info["key"]
+            and set(info.get("weights", {})) == set(text)
+            and stored == others
+        )
+
+    def matches_options(self, info):
+        """True if the existing index (with the same keys) has the
+        options of this index"""
+        if "name" in self.options and self.options["name"] != info["name"]:
+            return False
+        names = set(SIGNIFICANT_OPTIONS).union(self.options)
+        names.difference_update(["name", "background"])
+        return all(
+            _same_option(self.options.get(name), info.get(name))
+            for name in names
+        )
+
+
+class IndexReport(object):
+    """The outcome of ensure_indexes(). Each list holds (collection name,
+    index) pairs: the declared Index for created, unchanged and
+    conflicting (with the existing index information for conflicting),
+    the existing index information for extraneous and dropped."""
+
+    def __init__(self):
+        self.created = []
+        self.unchanged = []
+        self.conflicting = []
+        self.extraneous = []
+        self.dropped = []
+        self.errors = []
+
+    def __repr__(self):
+        return (
+            "<IndexReport created={} unchanged={} conflicting={} "
+            "extraneous={} errors={}>".format(
+                len(self.created),
+                len(self.unchanged),
+                len(self.conflicting),
+                len(self.extraneous),
+                len(self.errors),
+            )
+        )
+
+    def _merge(self, other):
+        for name in (
+            "created",
+            "unchanged",
+            "conflicting",
+            "extraneous",
+            "dropped",
+            "errors",
+        ):
+            getattr(self, name).extend(getattr(other, name))
+
+
+def ensure_indexes(managers, dry_run=False, drop_unknown=False, workers=4):
+    """Create the declared indexes of managers (CollectionManagers),
+    returning an IndexReport"""
+    report = IndexReport()
+    managers = [mgr for mgr in managers if mgr.collection is not None]
+    with ThreadPoolExecutor(max(1, workers)) as executor:
+        futures = [
+            executor.submit(_ensure, mgr, dry_run, drop_unknown)
+            for mgr in managers
+        ]
+        for future in futures:
+            report._merge(future.result())
+    return report
+
+
+def _ensure(mgr, dry_run, drop_unknown):
+    report = IndexReport()
+    name = mgr.name
+    collection = mgr.collection
+    try:
+        existing = [
+            info
+            for info in collection.list_indexes()
+            if info["name"] != "_id_"
+        ]
+        missing = []
+        matched = set()
+        for index in mgr.indexes:
+            same_keys = [
+                info for info in existing if index.matches_keys(info)
+            ]
+            same = [info for info in same_keys if index.matches_options(info)]
+            if same:
+                matched.add(same[0]["name"])
+                report.unchanged.append((name, index))
+            elif same_keys:
+                matched.add(same_keys[0]["name"])
+                report.conflicting.append((name, index, same_keys[0]))
+            else:
+                missing.append(index)
+        if missing and not dry_run:
+            collection.create_indexes([index.model() for index in missing])
+        report.created.extend((name, index) for index in missing)
+        for info in existing:
+            if info["name"] in matched:
+                continue
+            report.extraneous.append((name, info))
+            if drop_unknown:
+                if not dry_run:
+                    collection.drop_index(info["name"])
+                report.dropped.append((name, info))
+    except pymongo.errors.PyMongoError as err:
+        report.errors.append((name, err))
+    return report
+
+
+def _same_option(declared, existing):
+    if not declared and not existing:
+        return True
+    if isinstance(declared, dict) and isinstance(existing, dict):
+        # The server fills in defaults, e.g. of collations
+        return all(existing.get(k) == v for k, v in declared.items())
+    return declared == existing
@@ -0,0 +1,296 @@
+"""Per-operation latency and volume instrumentation.
+
+Enable it with ``collector = metadata.instrument()``. The collection
+class managers then report observations to the collector, labelled by
+collection and operation:
+
+- server_seconds: time spent in pymongo calls, i.e. waiting for the
+  server (for cursors, the total of all batches of the cursor)
+- decode_seconds: decoding BSON (cursors and single-document reads are
+  then read from the raw collection and decoded by barin, so that this
+  is measured apart from the server time)
+- adapt_seconds: validation and adaptation by the read adapter (for
+  inserts, validation of the documents)
+- total_seconds: operations which can't be split (insert_bulk)
+- documents, bytes: per cursor or single-document read
+
+Cursors report once, when exhausted, closed or garbage collected. Reads
+served by the result cache (see barin.cache) aren't reported.
+
+A Collector only needs an observe() method. HistogramCollector keeps
+histograms in memory and renders them in the Prometheus text format;
+StatsdCollector sends each observation as a statsd line.
+"""
+import bisect
+import socket
+import threading
+from time import perf_counter
+
+import bson
+from bson.raw_bson import RawBSONDocument
+
+SECONDS_BUCKETS = (
+    0.0001,
+    0.0005,
+    0.001,
+    0.005,
+    0.01,
+    0.05,
+    0.1,
+    0.5,
+    1.0,
+    5.0,
+)
+COUNT_BUCKETS = (1, 4, 16, 64, 256, 1024, 4096, 16384, 65536, 262144)
+
+
+class Collector(object):
+    def observe(self, collection, operation, name, value):
+        """Record one observation of the metric name"""
+        raise NotImplementedError()
+
+
+class Histogram(object):
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+
+class HistogramCollector(Collector):
+    """Keeps a Histogram per (metric, collection, operation)"""
+
+    def __init__(self, seconds_buckets=SECONDS_BUCKETS, buckets=COUNT_BUCKETS):
+        self.seconds_buckets = seconds_buckets
+        self.buckets = buckets
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, collection, operation, name, value):
+        key = (name, collection, operation)
+        with self._lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                if name.endswith("_seconds"):
+                    hist = Histogram(self.seconds_buckets)
+                else:
+                    hist = Histogram(self.buckets)
+                self.histograms[key] = hist
+            hist.observe(value)
+
+    def histogram(self, collection, operation, name):
+        return self.histograms.get((name, collection, operation))
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+
+    def prometheus(self, prefix="barin"):
+        """Render the histograms in the Prometheus text format"""
+        lines = []
+        with self._lock:
+            items = sorted(self.histograms.items())
+        last = None
+        for (name, collection, operation), hist in items:
+            metric = "{}_{}".format(prefix, name)
+            if metric != last:
+                lines.append("# TYPE {} histogram".format(metric))
+                last = metric
+            labels = 'collection="{}",operation="{}"'.format(
+                collection, operation
+            )
+            total = 0
+            for bound, count in zip(hist.buckets, hist.counts):
+                total += count
+                lines.append(
+                    '{}_bucket{{{},le="{}"}} {}'.format(
+                        metric, labels, bound, total
+                    )
+                )
+            lines.append(
+                '{}_bucket{{{},le="+Inf"}} {}'.format(
+                    metric, labels, hist.count
+                )
+            )
+            lines.append("{}_sum{{{}}} {}".format(metric, labels, hist.sum))
+            lines.append(
+                "{}_count{{{}}} {}".format(metric, labels, hist.count)
+            )
+        return "\n".join(lines) + "\n"
+
+
+class StatsdCollector(Collector):
+    """Sends each observation to statsd: timings in ms, counts as
+    counters. send(line) defaults to a UDP datagram to host:port."""
+
+    def __init__(self, send=None, prefix="barin", host="localhost", port=8125):
+        if send is None:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            address = (host, port)
+
+            def send(line):
+                sock.sendto(line.encode("utf-8"), address)
+
+        self.send = send
+        self.prefix = prefix
+
+    def observe(self, collection, operation, name, value):
+        if name.endswith("_seconds"):
+            line = "{}.{}.{}.{}:{:.3f}|ms".format(
+                self.prefix, collection, operation, name[:-8], value * 1000
+            )
+        else:
+            line = "{}.{}.{}.{}:{}|c".format(
+                self.prefix, collection, operation, name, value
+            )
+        self.send(line)
+
+
+class MeteredAdapter(object):
+    """Wraps a read adapter, adding its time to the meter's
+    adapt_seconds"""
+
+    def __init__(self, adapter, meter):
+        self.adapter = adapter
+        self.meter = meter
+
+    def __call__(self, obj):
+        start = perf_counter()
+        result = self.adapter(obj)
+        self.meter.adapt_seconds += perf_counter() - start
+        return result
+
+    def many(self, objs):
+        start = perf_counter()
+        result = self.adapter.many(objs)
+        self.meter.adapt_seconds += perf_counter() - start
+        return result
+
+
+class MeteredCursor(object):
+    """Wraps a pymongo cursor, timing its fetches and (for raw cursors,
+    given codec_options) the decoding of its documents. The barin Cursor
+    adds adapt_seconds. The totals are reported when the cursor is
+    exhausted, closed or garbage collected."""
+
+    def __init__(
+        self,
+        cursor,
+        collector,
+        collection,
+        operation,
+        codec_options=None,
+        server_seconds=0.0,
+    ):
+        self.cursor = cursor
+        self.collector = collector
+        self.collection = collection
+        self.operation = operation
+        self.codec_options = codec_options
+        self.server_seconds = server_seconds
+        self.decode_seconds = 0.0
+        self.adapt_seconds = 0.0
+        self.documents = 0
+        self.bytes = 0
+        self._it = None
+        self._reported = False
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._it is None:
+            self._it = iter(self.cursor)
+        start = perf_counter()
+        try:
+            doc = next(self._it)
+        except StopIteration:
+            self.server_seconds += perf_counter() - start
+            self.report()
+            raise
+        fetched = perf_counter()
+        self.server_seconds += fetched - start
+        self.documents += 1
+        if isinstance(doc, RawBSONDocument):
+            self.bytes += len(doc.raw)
+            if self.codec_options is not None:
+                doc = bson.decode(doc.raw, self.codec_options)
+                self.decode_seconds += perf_counter() - fetched
+        return doc
+
+    next = __next__
+
+    def _wrap_cursor(name):
+        def wrapper(self, *args, **kwargs):
+            getattr(self.cursor, name)(*args, **kwargs)
+            return self
+
+        wrapper.__name__ = "wrapped_{}".format(name)
+        return wrapper
+
+    sort = _wrap_cursor("sort")
+    skip = _wrap_cursor("skip")
+    limit = _wrap_cursor("limit")
+
+    def close(self):
+        self.report()
+        close = getattr(self.cursor, "close", None)
+        if close is not None:
+            close()
+
+    def report(self):
+        if self._reported:
+            return
+        self._reported = True
+        observe = self.collector.observe
+        coll, op = self.collection, self.operation
+        observe(coll, op, "server_seconds", self.server_seconds)
+        if self.codec_options is not None:
+            observe(coll, op, "decode_seconds", self.decode_seconds)
+        observe(coll, op, "adapt_seconds", self.adapt_seconds)
+        observe(coll, op, "documents", self.documents)
+        observe(coll, op, "bytes", self.bytes)
+
+    def __del__(self):
+        try:
+            self.report()
+        except Exception:
+            pass
+
+
+def timed(collector, collection, operation, name, func, *args, **kwargs):
+    """Call func, reporting its duration as the metric name"""
+    start = perf_counter()
+    result = func(*args, **kwargs)
+    collector.observe(collection, operation, name, perf_counter() - start)
+    return result
+
+
+def read_one(collector, collection, operation, func, codec_options, *args,
+             **kwargs):
+    """Call a single-document read func (on a raw collection), reporting
+    its server and decode time and volume; return the decoded result"""
+    start = perf_counter()
+    doc = func(*args, **kwargs)
+    fetched = perf_counter()
+    observe = collector.observe
+    observe(collection, operation, "server_seconds", fetched - start)
+    size = 0
+    if isinstance(doc, RawBSONDocument):
+        size = len(doc.raw)
+        doc = bson.decode(doc.raw, codec_options)
+        observe(
+            collection, operation, "decode_seconds", perf_counter() - fetched
+        )
+    observe(collection, operation, "documents", 0 if doc is None else 1)
+    observe(collection, operation, "bytes", size)
+    return doc
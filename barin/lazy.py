@@ -0,0 +1,251 @@
+"""Documents that validate their fields lazily from raw BSON."""
+import struct
+import weakref
+
+import bson.errors
+from bson.raw_bson import RawBSONDocument
+
+from .base import Document
+from .schema import Invalid, Missing
+
+_LAZY_CLASSES = weakref.WeakKeyDictionary()
+
+_INT32 = struct.Struct("<i")
+
+# Size of the BSON element values of fixed size, by element type
+_FIXED_SIZES = {
+    0x01: 8,  # double
+    0x06: 0,  # undefined
+    0x07: 12,  # ObjectId
+    0x08: 1,  # bool
+    0x09: 8,  # datetime
+    0x0A: 0,  # null
+    0x10: 4,  # int32
+    0x11: 8,  # timestamp
+    0x12: 8,  # int64
+    0x13: 16,  # decimal128
+    0x7F: 0,  # MaxKey
+    0xFF: 0,  # MinKey
+}
+
+
+def raw_collection(collection):
+    """Return a view of the pymongo collection which yields
+    RawBSONDocuments"""
+    opts = collection.codec_options.with_options(
+        document_class=RawBSONDocument)
+    return collection.with_options(codec_options=opts)
+
+
+def lazy_class(cls):
+    """Return the lazy subclass of a mapped class"""
+    try:
+        return _LAZY_CLASSES[cls]
+    except KeyError:
+        pass
+    result = _LAZY_CLASSES[cls] = type(cls.__name__, (LazyDocument, cls), {})
+    return result
+
+
+def load(schema, raw):
+    """Create a lazy instance of schema.as_class backed by raw"""
+    cls = lazy_class(schema.as_class)
+    obj = cls.__new__(cls)
+    obj._barin_schema = schema
+    obj._barin_raw = raw
+    obj._barin_pending = set(schema.fields)
+    obj._barin_pending.update(field_names(raw.raw))
+    return obj
+
+
+def field_names(data):
+    """Return the top-level field names of the BSON document data,
+    skipping over the values without decoding them"""
+    names = []
+    pos = 4
+    end = len(data) - 1
+    while pos < end:
+        etype = data[pos]
+        name_end = data.index(b"\x00", pos + 1)
+        names.append(data[pos + 1:name_end].decode("utf-8"))
+        pos = name_end + 1
+        size = _FIXED_SIZES.get(etype)
+        if size is None:
+            size = _value_size(data, pos, etype)
+        pos += size
+    return names
+
+
+def _value_size(data, pos, etype):
+    if etype in (0x03, 0x04, 0x0F):  # document, array, code with scope
+        return _INT32.unpack_from(data, pos)[0]
+    elif etype in (0x02, 0x0D, 0x0E):  # string, code, symbol
+        return 4 + _INT32.unpack_from(data, pos)[0]
+    elif etype == 0x05:  # binary (with its subtype)
+        return 5 + _INT32.unpack_from(data, pos)[0]
+    elif etype == 0x0C:  # DBPointer
+        return 16 + _INT32.unpack_from(data, pos)[0]
+    elif etype == 0x0B:  # regex: pattern and flags C strings
+        flags = data.index(b"\x00", pos) + 1
+        return data.index(b"\x00", flags) + 1 - pos
+    raise bson.errors.InvalidBSON(
+        "Unknown BSON element type {:#x}".format(etype))
+
+
+def materialize(obj):
+    """Make sure all fields of a (possibly lazy) object are loaded"""
+    if isinstance(obj, LazyDocument):
+        obj._barin_load_all()
+    return obj
+
+
+def inflate(value):
+    """Convert (nested) RawBSONDocuments to regular dicts"""
+    if isinstance(value, RawBSONDocument):
+        return dict((k, inflate(v)) for k, v in value.items())
+    elif isinstance(value, list):
+        return [inflate(v) for v in value]
+    return value
+
+
+def _loading(name):
+    method = getattr(dict, name)
+
+    def wrapper(self, *args, **kwargs):
+        self._barin_load_all()
+        return method(self, *args, **kwargs)
+
+    wrapper.__name__ = name
+    return wrapper
+
+
+class LazyDocument(Document):
+    """Decodes and validates fields from the raw document on first access.
+
+    Any operation that needs the whole document (iteration, comparison,
+    repr, ...) loads all remaining fields first.
+    """
+
+    def __missing__(self, name):
+        if name in self._barin_pending:
+            return self._barin_load(name)
+        missing = getattr(super(LazyDocument, self), '__missing__', None)
+        if missing is not None:
+            # e.g. partial documents raise FieldNotLoaded
+            return missing(name)
+        raise KeyError(name)
+
+    def __contains__(self, name):
+        if dict.__contains__(self, name):
+            return True
+        try:
+            self.__missing__(name)
+        except KeyError:
+            return False
+        return True
+
+    def __setitem__(self, name, value):
+        self._barin_pending.discard(name)
+        dict.__setitem__(self, name, value)
+
+    def __delitem__(self, name):
+        if name in self._barin_pending:
+            self._barin_pending.discard(name)
+            dict.pop(self, name, None)
+        else:
+            dict.__delitem__(self, name)
+
+    def __eq__(self, other):
+        self._barin_load_all()
+        materialize(other)
+        return dict.__eq__(self, other)
+
+    def __ne__(self, other):
+        self._barin_load_all()
+        materialize(other)
+        return dict.__ne__(self, other)
+
+    __hash__ = None
+
+    def __repr__(self):
+        self._barin_load_all()
+        return super(LazyDocument, self).__repr__()
+
+    def get(self, name, default=None):
+        try:
+            return self[name]
+        except KeyError:
+            return default
+
+    def setdefault(self, name, default=None):
+        if name in self:
+            return self[name]
+        self[name] = default
+        return default
+
+    def pop(self, name, *args):
+        if name in self._barin_pending:
+            self.__contains__(name)
+        return dict.pop(self, name, *args)
+
+    def update(self, *args, **kwargs):
+        for k, v in dict(*args, **kwargs).items():
+            self[k] = v
+
+    def clear(self):
+        self._barin_pending.clear()
+        dict.clear(self)
+
+    __iter__ = _loading('__iter__')
+    __len__ = _loading('__len__')
+    __reversed__ = _loading('__reversed__')
+    keys = _loading('keys')
+    values = _loading('values')
+    items = _loading('items')
+    copy = _loading('copy')
+    popitem = _loading('popitem')
+
+    def _barin_load(self, name):
+        schema = self._barin_schema
+        raw = self._barin_raw
+        self._barin_pending.discard(name)
+        validator = schema.fields.get(name, Missing)
+        try:
+            if validator is not Missing:
+                value = validator.validate(inflate(raw.get(name, Missing)))
+            elif schema.strip_extra:
+                raise KeyError(name)
+            elif not schema.allow_extra:
+                raise Invalid(schema._msgs['extra'], inflate(raw[name]))
+            elif schema.extra_validator:
+                value = schema.extra_validator.validate(inflate(raw[name]))
+            else:
+                value = inflate(raw[name])
+        except Invalid as err:
+            raise Invalid('', raw, document={name: err})
+        dict.__setitem__(self, name, value)
+        return value
+
+    def _barin_load_all(self):
+        pending = self._barin_pending
+        if not pending:
+            return
+        fields = self._barin_schema.fields
+        order = list(fields)
+        raw_names = field_names(self._barin_raw.raw)
+        order += [k for k in raw_names if k not in fields]
+        for name in order:
+            if name in pending:
+                try:
+                    self._barin_load(name)
+                except KeyError:
+                    pass
+        # Restore the field order of an eagerly validated document
+        items = [
+            (k, dict.__getitem__(self, k))
+            for k in order if dict.__contains__(self, k)]
+        extra = [(k, v) for k, v in dict.items(self) if k not in fields]
+        dict.clear(self)
+        dict.update(self, items)
+        for k, v in extra:
+            dict.setdefault(self, k, v)
@@ -1,7 +1,18 @@
+import bson
+from bson.raw_bson import RawBSONDocument
+
+from barin import aio
+from barin import bulk
+from barin import cache
 from barin import cursor
 from barin import query
 from barin import event
+from barin import instrument
+from barin import partial
+from barin import session
 from barin.adapter import adapter
+from barin.util import reify
+from .instance_manager import InstanceManager, bulk_sync
 
 
 class ClassManager(object):
@@ -10,6 +21,7 @@ class ClassManager(object):
         self._reg = reg
         self.cls = cls
         self.adapter = adapter(self)
+        self._read_adapters = {}
 
     def __repr__(self):
         return '<{} {}>'.format(
@@ -29,6 +41,23 @@ class ClassManager(object):
     def __getitem__(self, name):
         return self._reg[name]
 
+    def read_adapter(self, validate=None, lazy=False, projection=None):
+        """Return the adapter for documents read from the database
+        (with a partial.Projection, if given).
+
+        validate defaults to the collection's validate option, then to
+        the metadata's."""
+        if validate is None:
+            validate = self.manager.validate_mode or self.metadata.validate
+        key = (validate, lazy, projection)
+        try:
+            return self._read_adapters[key]
+        except KeyError:
+            pass
+        result = self._read_adapters[key] = adapter(
+            self, lazy=lazy, validate=validate, projection=projection)
+        return result
+
     def create(self, *args, **kwargs):
         """Create a (validated) document."""
         vobj = self.schema.validate(dict(*args, **kwargs))
@@ -46,6 +75,16 @@ class CollectionClassManager(ClassManager):
             self.query = self.query.match(reg.spec)
             self.aggregate = self.aggregate.match(reg.spec)
 
+    @reify
+    def aio(self):
+        """Awaitable counterparts of this manager's operations"""
+        return aio.AsyncClassManager(self)
+
+    @property
+    def collector(self):
+        """The metadata's instrument.Collector, or None"""
+        return self.collection_manager.metadata.collector
+
     def filtered_query(self, spec):
         result = dict(spec)
         result.update(self._reg.spec)
@@ -53,27 +92,168 @@ class CollectionClassManager(ClassManager):
 
     def _wrap_cursor(name):
         def wrapper(self, *args, **kwargs):
-            orig = getattr(self.collection_manager.collection, name)
+            options = cursor.pop_cursor_options(kwargs)
+            args, projection = partial.extract(args, kwargs, 1)
+            if projection is not None:
+                options['projection'] = projection
+            ttl = self._cache_ttl(kwargs.pop('cached', None))
+            if ttl is not None:
+                cm = self.collection_manager
+                if cm.cache.key(name, args, kwargs) is not None:
+                    lazy = options.get('lazy')
+                    res = cache.CachedCursor(
+                        self._cached_reader(name, ttl, lazy),
+                        self._reader(name, lazy),
+                        cm.collection, args, kwargs)
+                    return cursor.Cursor(self, res, **options)
+            cm = self.collection_manager
+            collector = self.collector
+            if options.get('lazy') or collector is not None:
+                coll = cm.raw_collection
+            else:
+                coll = cm.collection
+            orig = getattr(coll, name)
             res = orig(*args, **kwargs)
-            return cursor.Cursor(self, res)
+            if collector is not None:
+                codec_options = None
+                if not options.get('lazy'):
+                    codec_options = cm.collection.codec_options
+                res = instrument.MeteredCursor(
+                    res, collector, cm.name, name, codec_options)
+            return cursor.Cursor(self, res, **options)
         wrapper.__name__ = 'wrapped_{}'.format(name)
         return wrapper
 
-    def _wrap_single(name):
+    def _wrap_single(name, position=None):
         def wrapper(self, *args, **kwargs):
-            orig = getattr(self.collection_manager.collection, name)
-            res = orig(*args, **kwargs)
-            if res is None:
-                return res
-            return self.adapter(res)
+            validate = kwargs.pop('validate', None)
+            args, projection = partial.extract(args, kwargs, position)
+            cm = self.collection_manager
+            collector = self.collector
+            if collector is None:
+                orig = getattr(cm.collection, name)
+                return self._adapt_one(
+                    orig(*args, **kwargs), validate, projection)
+            res = instrument.read_one(
+                collector, cm.name, name, getattr(cm.raw_collection, name),
+                cm.collection.codec_options, *args, **kwargs)
+            return instrument.timed(
+                collector, cm.name, name, 'adapt_seconds',
+                self._adapt_one, res, validate, projection)
+        wrapper.__name__ = 'wrapped_{}'.format(name)
+        return wrapper
+
+    def _wrap_write(name):
+        @event.with_hooks(name)
+        def wrapper(self, *args, **kwargs):
+            cm = self.collection_manager
+            orig = getattr(cm.collection, name)
+            collector = self.collector
+            if collector is None:
+                return orig(*args, **kwargs)
+            return instrument.timed(
+                collector, cm.name, name, 'server_seconds',
+                orig, *args, **kwargs)
         wrapper.__name__ = 'wrapped_{}'.format(name)
         return wrapper
 
     find = _wrap_cursor('find')
-    find_one = _wrap_single('find_one')
-    find_one_and_update = _wrap_single('find_one_and_update')
-    find_one_and_replace = _wrap_single('find_one_and_replace')
-    find_one_and_delete = _wrap_single('find_one_and_delete')
+    _find_one = _wrap_single('find_one', 1)
+    find_one_and_update = event.with_hooks('find_one_and_update')(
+        _wrap_single('find_one_and_update'))
+    find_one_and_replace = event.with_hooks('find_one_and_replace')(
+        _wrap_single('find_one_and_replace'))
+    find_one_and_delete = event.with_hooks('find_one_and_delete')(
+        _wrap_single('find_one_and_delete'))
+    update_one = _wrap_write('update_one')
+    update_many = _wrap_write('update_many')
+    replace_one = _wrap_write('replace_one')
+    delete_one = _wrap_write('delete_one')
+    delete_many = _wrap_write('delete_many')
+    bulk_write = _wrap_write('bulk_write')
+
+    def find_one(self, *args, **kwargs):
+        ttl = self._cache_ttl(kwargs.pop('cached', None))
+        if ttl is not None:
+            validate = kwargs.pop('validate', None)
+            args, projection = partial.extract(args, kwargs, 1)
+            res = self._cached_read('find_one', ttl, False, args, kwargs)
+            if res is not None:
+                return self._adapt_one(
+                    next(iter(res), None), validate, projection)
+            kwargs['validate'] = validate
+        return self._find_one(*args, **kwargs)
+
+    def _adapt_one(self, res, validate=None, projection=None):
+        if res is None:
+            return res
+        res = self.read_adapter(validate, projection=projection)(res)
+        sess = session.current(self.metadata)
+        if sess is not None:
+            res = sess.merge(self, res)
+        return res
+
+    def _cache_ttl(self, cached):
+        """The TTL to cache a read for (True for the default), or None"""
+        if cached is None:
+            cached = self.collection_manager.cache_reads
+        if cached is False:
+            return None
+        return cached
+
+    def _cached_reader(self, name, ttl, lazy):
+        """Return a function(args, kwargs) returning the (cached)
+        documents of a cache.CachedCursor"""
+        direct = self._reader(name, lazy)
+
+        def read(args, kwargs):
+            res = self._cached_read(name, ttl, lazy, args, kwargs)
+            if res is not None:
+                return res
+            return direct(args, kwargs)
+        return read
+
+    def _reader(self, name, lazy):
+        """Return a function(args, kwargs) calling the collection's
+        method, bypassing the cache"""
+        def read(args, kwargs):
+            if lazy:
+                coll = self.collection_manager.raw_collection
+            else:
+                coll = self.collection_manager.collection
+            return getattr(coll, name)(*args, **kwargs)
+        return read
+
+    def _cached_read(self, name, ttl, lazy, args, kwargs):
+        """Return the (cached) documents of find or find_one, or None if
+        the arguments can't be cached"""
+        cache = self.collection_manager.cache
+        key = cache.key(name, args, kwargs)
+        if key is None:
+            return None
+        raws = cache.get(key)
+        if raws is None:
+            coll = self.collection_manager.raw_collection
+            res = getattr(coll, name)(*args, **kwargs)
+            if name == 'find_one':
+                res = [] if res is None else [res]
+            docs = cache.fill(key, res, ttl)
+            if name == 'find_one':
+                docs = list(docs)
+        else:
+            docs = map(RawBSONDocument, raws)
+        if lazy:
+            return docs
+        opts = self.collection_manager.collection.codec_options
+        return (bson.decode(doc.raw, opts) for doc in docs)
+
+    def synchronize_many(self, instances, isdel=False):
+        """Sync the backrefs of many instances with one bulk_write per
+        target collection"""
+        return bulk_sync(
+            op
+            for instance in instances
+            for op in InstanceManager(self, instance)._sync_ops(isdel))
 
     def get(self, **kwargs):
         return self.find_one(kwargs)
@@ -83,9 +263,45 @@ class CollectionClassManager(ClassManager):
 
     @event.with_hooks()
     def insert_one(self, obj):
-        return self.collection_manager.insert_one(
-            self.adapter(obj))
+        cm = self.collection_manager
+        collector = self.collector
+        if collector is None:
+            return cm.insert_one(self.adapter(obj))
+        doc = instrument.timed(
+            collector, cm.name, 'insert_one', 'adapt_seconds',
+            self.adapter, obj)
+        return instrument.timed(
+            collector, cm.name, 'insert_one', 'server_seconds',
+            cm.insert_one, doc)
 
     @event.with_hooks()
     def insert_many(self, objs):
-        return self.collection_manager.insert_many(map(self.adapter, objs))
+        cm = self.collection_manager
+        collector = self.collector
+        if collector is None:
+            return cm.insert_many(map(self.adapter, objs))
+        # Validate up front, so the server time is measured apart
+        docs = instrument.timed(
+            collector, cm.name, 'insert_many', 'adapt_seconds',
+            list, map(self.adapter, objs))
+        collector.observe(cm.name, 'insert_many', 'documents', len(docs))
+        return instrument.timed(
+            collector, cm.name, 'insert_many', 'server_seconds',
+            cm.insert_many, docs)
+
+    @event.with_hooks()
+    def insert_bulk(self, objs, chunk_size=1000, max_bytes=8 * 2 ** 20,
+                    workers=0, ordered=False, executor=None):
+        """Validate objs (any iterable) in chunks (on a thread pool of
+        workers threads, if any) and insert them in batches of at most
+        max_bytes, returning a bulk.BulkInsertResult"""
+        collector = self.collector
+        if collector is not None:
+            return instrument.timed(
+                collector, self.collection_manager.name, 'insert_bulk',
+                'total_seconds', bulk.insert_bulk,
+                self, objs, chunk_size=chunk_size, max_bytes=max_bytes,
+                workers=workers, ordered=ordered, executor=executor)
+        return bulk.insert_bulk(
+            self, objs, chunk_size=chunk_size, max_bytes=max_bytes,
+            workers=workers, ordered=ordered, executor=executor)
@@ -1,13 +1,16 @@
 import pymongo
 
 from barin import schema as S
+from barin import aio
+from barin import diff
 from barin import event
-
-
-# TODO: test backref logic
+from barin import lazy
+from barin import partial
+from barin import session
 
 
 class InstanceManager(object):
+    __slots__ = ('_manager', 'instance')
 
     def __init__(self, manager, instance):
         self._manager = manager
@@ -17,10 +20,19 @@ class InstanceManager(object):
         return getattr(self._manager, name)
 
     def __dir__(self):
-        return dir(self._manager) + list(self.__dict__.keys())
+        return dir(self._manager) + list(self.__slots__)
+
+    @property
+    def aio(self):
+        """Awaitable counterparts of insert/replace/update/delete"""
+        return aio.AsyncInstanceManager(self._manager.aio, self.instance)
 
     def synchronize(self, isdel=False):
         '''Sync all backrefs'''
+        return bulk_sync(self._sync_ops(isdel))
+
+    def _sync_ops(self, isdel):
+        '''Yield (other_cls, operation) pairs which sync all backrefs'''
         _id = self.instance['_id']
         for fname, f in self.fields.items():
             if f.backref:
@@ -29,31 +41,88 @@ class InstanceManager(object):
                 other_fld = other_cls.m.fields[f.backref.fname]
                 if isinstance(f._schema, S.Array):
                     if isinstance(other_fld._schema, S.Array):
-                        self._sync_m2m(_id, f, v, other_cls, other_fld, isdel)
+                        sync = self._sync_m2m
                     else:
-                        self._sync_o2m(_id, f, v, other_cls, other_fld, isdel)
+                        sync = self._sync_o2m
                 else:
                     if isinstance(other_fld._schema, S.Array):
-                        self._sync_m2o(_id, f, v, other_cls, other_fld, isdel)
+                        sync = self._sync_m2o
                     else:
-                        self._sync_o2o(_id, f, v, other_cls, other_fld, isdel)
+                        sync = self._sync_o2o
+                for op in sync(_id, f, v, other_cls, other_fld, isdel):
+                    yield other_cls, op
 
-    @event.with_hooks('insert')
     def insert(self):
+        sess = session.current(self.metadata)
+        if sess is not None:
+            return sess.insert(self)
+        return self._insert()
+
+    def delete(self):
+        sess = session.current(self.metadata)
+        if sess is not None:
+            return sess.delete(self)
+        return self._delete()
+
+    def replace(self, **kwargs):
+        sess = session.current(self.metadata)
+        if sess is not None:
+            return sess.replace(self, **kwargs)
+        return self._replace(**kwargs)
+
+    def update(self, update_spec, **kwargs):
+        sess = session.current(self.metadata)
+        if sess is not None and not kwargs.get('refresh'):
+            kwargs.pop('refresh', None)
+            return sess.update(self, update_spec, **kwargs)
+        return self._update(update_spec, **kwargs)
+
+    def save(self, **kwargs):
+        sess = session.current(self.metadata)
+        if sess is not None:
+            return sess.save(self, **kwargs)
+        return self._save(**kwargs)
+
+    @event.with_hooks('insert')
+    def _insert(self):
         return self._manager.insert_one(self.instance)
 
     @event.with_hooks('delete')
-    def delete(self):
+    def _delete(self):
         return self._manager.delete_one(
             {'_id': self.instance._id})
 
     @event.with_hooks('replace')
-    def replace(self, **kwargs):
+    def _replace(self, **kwargs):
+        partial.require_complete(self.instance)
+        lazy.materialize(self.instance)
+        diff.forget(self.instance)
         return self._manager.replace_one(
             {'_id': self.instance._id}, self.instance, **kwargs)
 
+    @event.with_hooks('save')
+    def _save(self, **kwargs):
+        '''Send only the changes made since the document was loaded (or
+        last saved); replace (upsert) documents that weren't loaded'''
+        spec = diff.update_spec(
+            self.instance, partial.schema_for(self.instance, self.schema))
+        if spec is None:
+            partial.require_complete(self.instance)
+            kwargs.setdefault('upsert', True)
+            lazy.materialize(self.instance)
+            res = self._manager.replace_one(
+                {'_id': self.instance._id}, self.instance, **kwargs)
+            diff.snapshot(self.instance)
+            return res
+        if not spec:
+            return None
+        res = self._manager.update_one(
+            {'_id': self.instance._id}, spec, **kwargs)
+        diff.commit(self.instance, spec)
+        return res
+
     @event.with_hooks('update')
-    def update(self, update_spec, **kwargs):
+    def _update(self, update_spec, **kwargs):
         refresh = kwargs.pop('refresh', False)
         if refresh:
             obj = self._manager.find_one_and_update(
@@ -64,6 +133,7 @@ class InstanceManager(object):
             if obj:
                 self.instance.clear()
                 self.instance.update(obj)
+                diff.track(self.instance, diff.stored(obj))
             else:
                 # Object has been deleted
                 return None
@@ -77,44 +147,61 @@ class InstanceManager(object):
         q = other_cls.m.query.match(other_fld == this_id)
         if not isdel:
             q = q.match(other_cls._id.nin(this_val))
-        q.update_many(other_fld.pull(this_id))
+        yield pymongo.UpdateMany(_filter(q), other_fld.pull(this_id))
         if isdel:
             return
         q = (other_cls.m.query
             .match(other_cls._id.in_(this_val)))
-        q.update_many(other_fld.add_to_set(this_id))
+        yield pymongo.UpdateMany(_filter(q), other_fld.add_to_set(this_id))
 
     def _sync_o2m(self, this_id, this_fld, this_val, other_cls, other_fld, isdel):
         "this is an array, other is a scalar"
         q = other_cls.m.query.match(other_fld == this_id)
         if not isdel:
             q = q.match(other_cls._id.nin(this_val))
-        q.update_many(other_fld.set(None))
+        yield pymongo.UpdateMany(_filter(q), other_fld.set(None))
         if isdel:
             return
         q = (other_cls.m.query
             .match(other_cls._id.in_(this_val)))
-        q.update_many(other_fld.set(this_id))
+        yield pymongo.UpdateMany(_filter(q), other_fld.set(this_id))
 
     def _sync_m2o(self, this_id, this_fld, this_val, other_cls, other_fld, isdel):
         "this is a scalar, other is an array"
         q = other_cls.m.query.match(other_fld == this_id)
         if not isdel:
             q = q.match(other_cls._id != this_val)
-        q.update_many(other_fld.pull(this_id))
+        yield pymongo.UpdateMany(_filter(q), other_fld.pull(this_id))
         if isdel:
             return
         q = other_cls.m.query.match(other_cls._id == this_val)
-        q.update_one(other_fld.add_to_set(this_id))
+        yield pymongo.UpdateOne(_filter(q), other_fld.add_to_set(this_id))
 
     def _sync_o2o(self, this_id, this_fld, this_val, other_cls, other_fld, isdel):
         "this is a scalar, other is a scalar"
         q = other_cls.m.query.match(other_fld == this_id)
         if not isdel:
             q = q.match(other_cls._id != this_val)
-        q.update_many(other_fld.set(None))
+        yield pymongo.UpdateMany(_filter(q), other_fld.set(None))
         if isdel:
             return
         q = other_cls.m.query.match(other_cls._id == this_val)
-        q.update_one(other_fld.set(this_id))
+        yield pymongo.UpdateOne(_filter(q), other_fld.set(this_id))
+
+
+def bulk_sync(ops):
+    '''Run (other_cls, operation) pairs with one ordered bulk_write per
+    target collection, returning the list of BulkWriteResults'''
+    by_collection = {}
+    for other_cls, op in ops:
+        coll_mgr = other_cls.m.collection_manager
+        by_collection.setdefault(coll_mgr, []).append(op)
+    results = []
+    for coll_mgr, coll_ops in by_collection.items():
+        results.append(coll_mgr.collection.bulk_write(coll_ops, ordered=True))
+        coll_mgr.invalidate_cache()
+    return results
+
 
+def _filter(query):
+    return query._compile_query()['filter']
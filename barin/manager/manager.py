@@ -1,6 +1,8 @@
 import logging
 from collections import defaultdict
 
+from barin import lazy
+from barin.cache import ResultCache
 from . import polymorphism as poly
 from .class_manager import ClassManager, CollectionClassManager
 from .instance_manager import InstanceManager
@@ -14,7 +16,9 @@ class BaseManager(object):
     def __init__(self, metadata, name, **options):
         self.metadata = metadata
         self.name = name
+        self.validate_mode = options.pop('validate', None)
         self.options = options
+        self._class_managers = {}
         self.registry = poly.Registry(
             self, options.pop('polymorphic_discriminator', None))
         self.hooks = defaultdict(list)
@@ -23,13 +27,27 @@ class BaseManager(object):
         return '<{} {}>'.format(self.__class__.__name__, self.name)
 
     def class_manager(self, cls):
+        try:
+            return self._class_managers[cls]
+        except KeyError:
+            pass
+        cm = self._class_managers[cls] = self._create_class_manager(cls)
+        return cm
+
+    def reset_class_managers(self):
+        """Forget cached class managers (called when the registry changes)"""
+        self._class_managers.clear()
+
+    def _create_class_manager(self, cls):
         reg = self.registry.by_class(cls)
         return ClassManager(reg, cls)
 
     def __get__(self, obj, cls=None):
         if cls is None:
             cls = type(obj)
-        cm = self.class_manager(cls)
+        cm = self._class_managers.get(cls)
+        if cm is None:
+            cm = self.class_manager(cls)
         if obj is None:
             return cm
         else:
@@ -40,13 +58,43 @@ class BaseManager(object):
 
 
 class CollectionManager(BaseManager):
+    # Hooks of the write operations which invalidate the result cache
+    WRITE_HOOKS = (
+        'insert_one', 'insert_many', 'insert_bulk', 'update_one',
+        'update_many',
+        'replace_one', 'delete_one', 'delete_many', 'bulk_write',
+        'find_one_and_update', 'find_one_and_replace',
+        'find_one_and_delete')
 
     def __init__(self, metadata, cname, indexes, **options):
+        cache = ResultCache.from_option(options.pop('cache', None))
+        disc_index = options.pop('discriminator_index', None)
         super(CollectionManager, self).__init__(
             metadata, cname, **options)
-        self.indexes = indexes
+        self.indexes = list(indexes)
+        if disc_index:
+            self.indexes.append(
+                self.registry.discriminator_index(disc_index))
+        self._cache = cache
+        self.cache_reads = cache is not None
+        for name in self.WRITE_HOOKS:
+            self.hooks['after_' + name].append(self._invalidate_hook)
 
-    def class_manager(self, cls):
+    @property
+    def cache(self):
+        """The ResultCache of this collection (see barin.cache)"""
+        if self._cache is None:
+            self._cache = ResultCache()
+        return self._cache
+
+    def invalidate_cache(self):
+        if self._cache is not None:
+            self._cache.invalidate()
+
+    def _invalidate_hook(self, *args, **kwargs):
+        self.invalidate_cache()
+
+    def _create_class_manager(self, cls):
         reg = self.registry.by_class(cls)
         return CollectionClassManager(reg, cls, self)
 
@@ -56,6 +104,21 @@ class CollectionManager(BaseManager):
             return None
         return getattr(self._db, self.name)
 
+    @property
+    def raw_collection(self):
+        """The collection, returning raw BSON documents"""
+        coll = self.collection
+        if coll is None:
+            return None
+        return lazy.raw_collection(coll)
+
+    @property
+    def async_collection(self):
+        db = self.metadata.async_db
+        if db is None:
+            return None
+        return getattr(db, self.name)
+
     @property
     def _db(self):
         return self.metadata.db
@@ -1,5 +1,5 @@
-import re
 from barin import errors
+from barin.index import Index
 from barin.util import reify, NoDefault
 
 
@@ -9,7 +9,12 @@ class Registry(object):
         self.polymorphic_discriminator = polymorphic_discriminator
         self._by_disc = {}
         self._by_cls = {}
+        self._by_mro = {}
+        self._specs = {}
         self.default = None
+        # Incremented whenever a registration changes, so that adapters
+        # know to resolve their registrations again
+        self.generation = 0
 
     def register(self, cls, fields, options, discriminator=NoDefault):
         reg = Registration(self, cls, fields, options, discriminator)
@@ -23,20 +28,77 @@ class Registry(object):
         self._by_disc[discriminator] = self._by_cls[cls] = reg
         if discriminator is NoDefault:
             self.default = reg
+        self._changed()
 
     def register_override(self, collection, cls):
         reg = self.by_class(collection)
         reg.cls = cls
+        self._changed()
+
+    def _changed(self):
+        self._by_mro.clear()
+        self._specs.clear()
+        self.generation += 1
+        self.manager.reset_class_managers()
+
+    def discriminators(self, reg):
+        """The discriminators of reg and of the registrations derived from
+        it, in registration order"""
+        return [
+            other.discriminator
+            for other in self._by_disc.values()
+            if other.discriminator is not NoDefault
+            and issubclass(other.registered_cls, reg.registered_cls)
+        ]
+
+    def discriminator_index(self, option=True):
+        """The Index declared by the discriminator_index option: True for
+        an index on the discriminator alone, or a list of keys to follow
+        it in a compound index"""
+        if not self.polymorphic_discriminator:
+            raise errors.SchemaError(
+                "discriminator_index requires a polymorphic_discriminator"
+            )
+        keys = [(self.polymorphic_discriminator, 1)]
+        if option is not True:
+            keys += Index(option).arg
+        return Index(keys)
+
+    def spec(self, reg):
+        """The filter matching the documents of reg (and of the classes
+        derived from it) by equality on the discriminator"""
+        try:
+            return self._specs[reg]
+        except KeyError:
+            pass
+        if reg.discriminator is NoDefault:
+            result = {}
+        else:
+            discs = self.discriminators(reg)
+            if len(discs) == 1:
+                value = {"$eq": discs[0]}
+            else:
+                value = {"$in": discs}
+            result = {self.polymorphic_discriminator: value}
+        self._specs[reg] = result
+        return result
 
     def by_disc(self, discriminator):
         return self._by_disc.get(discriminator, self.default)
 
     def by_class(self, cls):
+        try:
+            return self._by_mro[cls]
+        except KeyError:
+            pass
+        result = self.default
         for cur in cls.mro():
             reg = self._by_cls.get(cur, None)
             if reg is not None:
-                return reg
-        return self.default
+                result = reg
+                break
+        self._by_mro[cls] = result
+        return result
 
     def by_value(self, value):
         disc = value.get(self.polymorphic_discriminator)
@@ -53,14 +115,15 @@ class Registration(object):
     def __init__(self, registry, cls, fields, options, discriminator):
         self.registry = registry
         self.cls = cls
+        # The class as registered, which cmap() doesn't override
+        self.registered_cls = cls
         self.fields = fields
         self.options = options
         self.discriminator = discriminator
-        if discriminator is NoDefault:
-            self.spec = {}
-        else:
-            re_disc = {"$regex": f"^{re.escape(discriminator)}"}
-            self.spec = {registry.polymorphic_discriminator: re_disc}
+
+    @property
+    def spec(self):
+        return self.registry.spec(self)
 
     def __repr__(self):
         return "<Reg {}>".format(self.cls.__name__)
@@ -0,0 +1,414 @@
+"""Client-side evaluation of query filters on in-memory documents.
+
+compile_matcher(filter) compiles the filter once into a tree of closures
+and returns a function(doc) -> bool, so cached, preloaded or already
+fetched documents can be filtered without another query.
+
+The semantics follow the server's for the operators Field emits: dotted
+paths traverse arrays (and index them with numeric parts), operators
+match an array if they match the array itself or any of its elements,
+null matches missing fields, comparisons only match values of the same
+type bracket, and each operator on a field may be satisfied by a
+different element. Unsupported operators ($where, $text, $geoWithin,
+$expr, ...) raise QueryError when compiling.
+"""
+import datetime
+import math
+import re
+from collections.abc import Mapping
+
+import bson
+from bson.regex import Regex
+
+from . import errors
+
+
+class _Missing(object):
+    def __repr__(self):
+        return "MISSING"
+
+
+MISSING = _Missing()
+
+_LOGICAL = ("$and", "$or", "$nor")
+_NUMBERS = (int, float)
+_PATTERNS = (re.Pattern, Regex)
+_FLAGS = dict(i=re.IGNORECASE, m=re.MULTILINE, x=re.VERBOSE, s=re.DOTALL)
+
+
+def compile_matcher(flt):
+    """Return a function(doc) -> bool evaluating the filter flt"""
+    if not isinstance(flt, dict):
+        raise errors.QueryError("Illegal filter: {}".format(flt))
+    return _document(flt)
+
+
+def _document(flt):
+    preds = []
+    for key, value in flt.items():
+        if key in _LOGICAL:
+            preds.append(_logical(key, value))
+        elif key == "$comment":
+            continue
+        elif key.startswith("$"):
+            raise errors.QueryError("Unsupported operator {}".format(key))
+        else:
+            preds.append(_path(key, _value(value)))
+    if not preds:
+        return lambda doc: True
+    return _all_of(preds)
+
+
+def _logical(op, parts):
+    if not isinstance(parts, list) or not parts:
+        raise errors.QueryError("{} needs a non-empty list".format(op))
+    preds = [compile_matcher(part) for part in parts]
+    if op == "$and":
+        return _all_of(preds)
+    match = _any_of(preds)
+    if op == "$nor":
+        return lambda doc: not match(doc)
+    return match
+
+
+def _all_of(preds):
+    """Return a predicate true when all of preds are"""
+    if len(preds) == 1:
+        return preds[0]
+
+    def match(arg):
+        for pred in preds:
+            if not pred(arg):
+                return False
+        return True
+
+    return match
+
+
+def _any_of(preds):
+    """Return a predicate true when any of preds is"""
+    if len(preds) == 1:
+        return preds[0]
+
+    def match(arg):
+        for pred in preds:
+            if pred(arg):
+                return True
+        return False
+
+    return match
+
+
+def _path(key, test):
+    """Apply test to the candidate values of the dotted path key"""
+    if "." not in key:
+        return lambda doc: test((doc.get(key, MISSING),))
+    parts = key.split(".")
+
+    def match(doc):
+        values = []
+        _resolve(doc, parts, 0, values)
+        return test(values)
+
+    return match
+
+
+def _resolve(value, parts, i, out):
+    if i == len(parts):
+        out.append(value)
+        return
+    part = parts[i]
+    if isinstance(value, list):
+        found = False
+        if part.isdigit() and int(part) < len(value):
+            _resolve(value[int(part)], parts, i + 1, out)
+            found = True
+        for elem in value:
+            if isinstance(elem, Mapping):
+                _resolve(elem, parts, i, out)
+                found = True
+        if not found:
+            out.append(MISSING)
+    elif isinstance(value, Mapping):
+        _resolve(value.get(part, MISSING), parts, i + 1, out)
+    else:
+        out.append(MISSING)
+
+
+def _value(spec):
+    """Return a function(candidate values) -> bool for the field spec"""
+    if _is_operators(spec):
+        if "$options" in spec and "$regex" not in spec:
+            raise errors.QueryError("$options needs $regex")
+        tests = [
+            _operator(op, arg, spec) for op, arg in spec.items()
+            if op != "$options"
+        ]
+        return _all_of(tests)
+    if isinstance(spec, _PATTERNS):
+        return _any(_expand(_regex_test(spec)))
+    return _any(_expand(_eq_test(spec)))
+
+
+def _is_operators(spec):
+    return (
+        isinstance(spec, dict)
+        and bool(spec)
+        and all(key.startswith("$") for key in spec)
+    )
+
+
+def _any(test):
+    def match(values):
+        for value in values:
+            if test(value):
+                return True
+        return False
+
+    return match
+
+
+def _not(test):
+    return lambda values: not test(values)
+
+
+def _expand(test):
+    """Match the value itself or any of its elements"""
+
+    def match(value):
+        if test(value):
+            return True
+        if isinstance(value, list):
+            for elem in value:
+                if test(elem):
+                    return True
+        return False
+
+    return match
+
+
+def _operator(op, arg, spec):
+    if op == "$eq":
+        return _any(_expand(_eq_test(arg)))
+    elif op == "$ne":
+        return _not(_any(_expand(_eq_test(arg))))
+    elif op in ("$gt", "$gte", "$lt", "$lte"):
+        return _any(_expand(_compare_test(op, arg)))
+    elif op == "$in":
+        return _any(_expand(_in_test(op, arg)))
+    elif op == "$nin":
+        return _not(_any(_expand(_in_test(op, arg))))
+    elif op == "$exists":
+        if arg:
+            return lambda values: any(v is not MISSING for v in values)
+        return lambda values: all(v is MISSING for v in values)
+    elif op == "$size":
+        if not isinstance(arg, int) or isinstance(arg, bool):
+            raise errors.QueryError("$size needs an integer")
+        return _any(lambda v: isinstance(v, list) and len(v) == arg)
+    elif op == "$all":
+        return _all(arg)
+    elif op == "$elemMatch":
+        return _any(_elem_match_test(arg))
+    elif op == "$regex":
+        options = spec.get("$options", "")
+        return _any(_expand(_regex_test(arg, options)))
+    elif op == "$mod":
+        return _any(_expand(_mod_test(arg)))
+    elif op == "$not":
+        if not (_is_operators(arg) or isinstance(arg, _PATTERNS)):
+            raise errors.QueryError("$not needs operators or a regex")
+        return _not(_value(arg))
+    raise errors.QueryError("Unsupported operator {}".format(op))
+
+
+def _all(arg):
+    if not isinstance(arg, list):
+        raise errors.QueryError("$all needs a list")
+    if not arg:
+        return lambda values: False
+    tests = []
+    for item in arg:
+        if isinstance(item, dict) and list(item) == ["$elemMatch"]:
+            tests.append(_any(_elem_match_test(item["$elemMatch"])))
+        else:
+            tests.append(_any(_expand(_eq_test(item))))
+    return _all_of(tests)
+
+
+def _elem_match_test(arg):
+    if not isinstance(arg, dict):
+        raise errors.QueryError("$elemMatch needs a document")
+    if _is_operators(arg) and not any(key in _LOGICAL for key in arg):
+        inner = _value(arg)
+
+        def test_elem(elem):
+            return inner((elem,))
+
+    else:
+        match = _document(arg)
+
+        def test_elem(elem):
+            return isinstance(elem, Mapping) and match(elem)
+
+    def test(value):
+        if not isinstance(value, list):
+            return False
+        for elem in value:
+            if test_elem(elem):
+                return True
+        return False
+
+    return test
+
+
+def _bracket(value):
+    """The type bracket of value for comparisons"""
+    if value is None or value is MISSING:
+        return 0
+    if isinstance(value, bool):
+        return 7
+    if isinstance(value, _NUMBERS):
+        return 1
+    if isinstance(value, str):
+        return 2
+    if isinstance(value, Mapping):
+        return 3
+    if isinstance(value, list):
+        return 4
+    if isinstance(value, bytes):
+        return 5
+    if isinstance(value, bson.ObjectId):
+        return 6
+    if isinstance(value, datetime.datetime):
+        return 8
+    return type(value)
+
+
+def _eq(a, b):
+    if _bracket(a) != _bracket(b):
+        return False
+    if a is MISSING or a is None:
+        return True
+    if isinstance(a, Mapping):
+        # Documents compare in field order
+        if list(a.keys()) != list(b.keys()):
+            return False
+        return all(_eq(a[key], b[key]) for key in a)
+    if isinstance(a, list):
+        if len(a) != len(b):
+            return False
+        return all(_eq(x, y) for x, y in zip(a, b))
+    try:
+        return a == b
+    except TypeError:
+        return False
+
+
+def _eq_test(arg):
+    if arg is None:
+        return lambda value: value is None or value is MISSING
+    if not isinstance(arg, (Mapping, list)):
+        # Fast path for scalars
+        bracket = _bracket(arg)
+        return lambda value: value == arg and _bracket(value) == bracket
+    return lambda value: _eq(value, arg)
+
+
+def _compare_test(op, arg):
+    if arg is None:
+        if op in ("$gte", "$lte"):
+            return _eq_test(None)
+        return lambda value: False
+    bracket = _bracket(arg)
+    if op == "$gt":
+
+        def compare(value):
+            return value > arg
+
+    elif op == "$gte":
+
+        def compare(value):
+            return value >= arg
+
+    elif op == "$lt":
+
+        def compare(value):
+            return value < arg
+
+    else:
+
+        def compare(value):
+            return value <= arg
+
+    if bracket == 1:
+
+        def test(value):
+            # Fast path for numbers
+            cls = value.__class__
+            if cls is int or cls is float:
+                return compare(value)
+            return _bracket(value) == 1 and compare(value)
+
+        return test
+
+    def test(value):
+        if _bracket(value) != bracket:
+            return False
+        try:
+            return compare(value)
+        except TypeError:
+            return False
+
+    return test
+
+
+def _in_test(op, arg):
+    if not isinstance(arg, list):
+        raise errors.QueryError("{} needs a list".format(op))
+    tests = []
+    for item in arg:
+        if isinstance(item, _PATTERNS):
+            tests.append(_regex_test(item))
+        else:
+            tests.append(_eq_test(item))
+    return _any_of(tests)
+
+
+def _regex_test(pattern, options=""):
+    if isinstance(pattern, Regex):
+        pattern = pattern.try_compile()
+    if isinstance(options, int):
+        flags = options
+    else:
+        flags = 0
+        for option in options:
+            if option not in _FLAGS:
+                raise errors.QueryError(
+                    "Unsupported regex option {}".format(option)
+                )
+            flags |= _FLAGS[option]
+    if isinstance(pattern, re.Pattern):
+        regex = re.compile(pattern.pattern, pattern.flags | flags)
+    else:
+        regex = re.compile(pattern, flags)
+    search = regex.search
+    return lambda value: isinstance(value, str) and search(value) is not None
+
+
+def _mod_test(arg):
+    if not isinstance(arg, list) or len(arg) != 2:
+        raise errors.QueryError("$mod needs [divisor, remainder]")
+    divisor, remainder = int(arg[0]), int(arg[1])
+    if divisor == 0:
+        raise errors.QueryError("$mod divisor cannot be 0")
+
+    def test(value):
+        if isinstance(value, bool) or not isinstance(value, _NUMBERS):
+            return False
+        if isinstance(value, float) and not math.isfinite(value):
+            return False
+        # Truncated division, as on the server
+        return math.fmod(int(value), divisor) == remainder
+
+    return test
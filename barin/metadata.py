@@ -1,13 +1,22 @@
 from collections import defaultdict
+from . import index
+from . import instrument
+from . import plans
 from .collection import Collection, CollectionRef
+from .session import Session
 
 
 class Metadata(object):
-    def __init__(self, db=None):
+    def __init__(self, db=None, async_db=None, validate="full"):
         self.collections = []
         self._classes_full = {}
         self._classes_short = defaultdict(list)
         self.db = db
+        self.async_db = async_db
+        # Default validation mode of reads, see adapter.validation_mode
+        self.validate = validate
+        # instrument.Collector of the operations' latency and volume
+        self.collector = None
 
     def __getitem__(self, index):
         try:
@@ -40,5 +49,41 @@ class Metadata(object):
     def bind(self, db):
         self.db = db
 
+    def bind_async(self, db):
+        """Bind an asyncio database (pymongo AsyncDatabase, Motor, ...)"""
+        self.async_db = db
+
+    def session(self):
+        """Return a unit of work; use it as a context manager"""
+        return Session(self)
+
+    def instrument(self, collector=None):
+        """Report the operations' latency and volume to collector
+        (default: a new instrument.HistogramCollector), returning it.
+        Set self.collector to None to stop."""
+        if collector is None:
+            collector = instrument.HistogramCollector()
+        self.collector = collector
+        return collector
+
+    def ensure_indexes(self, dry_run=False, drop_unknown=False, workers=4):
+        """Create the declared indexes of all collections, returning an
+        index.IndexReport (see barin.index)"""
+        managers = []
+        for cls in self.collections:
+            if cls.__barin__ not in managers:
+                managers.append(cls.__barin__)
+        return index.ensure_indexes(
+            managers,
+            dry_run=dry_run,
+            drop_unknown=drop_unknown,
+            workers=workers,
+        )
+
+    def check_plans(self, queries, max_ratio=10):
+        """Explain each of queries, returning a plans.PlanReport for each
+        (see barin.plans)"""
+        return [plans.check(query, max_ratio) for query in queries]
+
     def cref(self, name):
         return CollectionRef(self, name)
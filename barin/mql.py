@@ -1,4 +1,5 @@
 from . import errors
+from .matcher import compile_matcher  # noqa: F401
 
 
 class Clause(dict):
@@ -1,9 +1,14 @@
 import bson
 import struct
 from collections import defaultdict
-from marisa_trie import Trie
+from collections.abc import Mapping
 from functools import update_wrapper
 
+try:
+    from marisa_trie import Trie
+except ImportError:  # pragma no cover
+    Trie = None
+
 def reify(func):
     result = _Reified(func)
     update_wrapper(result, func)
@@ -120,16 +125,118 @@ def getval(data, opts, name):
 
 
 def iter_records(curs, *names):
-    opts = bson.CodecOptions(document_class=bson.raw_bson.RawBSONDocument)
     trie = PathTrie([n.split('.') for n in names])
     template = dict((n, None) for n in names)
     for doc in curs:
         rec = dict(template)
-        for k, v in get_fields(doc.raw, opts, trie):
+        for k, v in get_paths(doc, trie):
             rec['.'.join(k)] = v
         yield tuple(rec[n] for n in names)
 
 
+def get_paths(doc, trie):
+    """Return list of (name, value) tuples where name is in the trie.
+
+    doc may be any mapping; RawBSONDocuments only decode the levels
+    which are actually traversed.
+    """
+    result = []
+    for ename, value in doc.items():
+        if ename in trie:
+            result.append(([ename], value))
+            continue
+        new_trie = trie.get(ename)
+        if new_trie and isinstance(value, Mapping):
+            result += [
+                ([ename] + key, v)
+                for key, v in get_paths(value, new_trie)
+            ]
+    return result
+
+
+def to_columns(curs, names, dtypes=None, capacity=1024):
+    """Fill one numpy masked array per (dotted) name from the documents
+    in curs. Missing and null values are masked."""
+    builder = ColumnBuilder(names, dtypes, capacity)
+    trie = PathTrie([n.split('.') for n in names])
+    index = dict((n, ix) for ix, n in enumerate(names))
+    template = [Missing] * len(names)
+    append = builder.append
+    for doc in curs:
+        rec = list(template)
+        for k, v in get_paths(doc, trie):
+            rec[index['.'.join(k)]] = v
+        append(rec)
+    return builder.finish()
+
+
+def projection(names):
+    """Server-side projection for the (dotted) names"""
+    result = dict((n, 1) for n in names)
+    if '_id' not in result:
+        result['_id'] = 0
+    return result
+
+
+class ColumnBuilder(object):
+    """Growable, preallocated numpy arrays (plus masks) for a set of
+    columns"""
+
+    def __init__(self, names, dtypes=None, capacity=1024):
+        import numpy
+        self._np = numpy
+        self.names = list(names)
+        if dtypes is None:
+            dtypes = {}
+        elif not isinstance(dtypes, Mapping):
+            dtypes = dict(zip(self.names, dtypes))
+        self.dtypes = [
+            numpy.dtype(dtypes.get(n, object)) for n in self.names]
+        self._size = 0
+        self._capacity = 0
+        self._data = [numpy.empty(0, dt) for dt in self.dtypes]
+        self._mask = [numpy.empty(0, bool) for dt in self.dtypes]
+        self._grow(max(capacity, 1))
+
+    def __len__(self):
+        return self._size
+
+    def _grow(self, capacity):
+        np = self._np
+        size = self._size
+        for ix, dt in enumerate(self.dtypes):
+            if dt.kind == 'O':
+                data = np.empty(capacity, dt)
+            else:
+                data = np.zeros(capacity, dt)
+            mask = np.ones(capacity, bool)
+            data[:size] = self._data[ix][:size]
+            mask[:size] = self._mask[ix][:size]
+            self._data[ix] = data
+            self._mask[ix] = mask
+        self._capacity = capacity
+
+    def append(self, values):
+        """Append a row. Missing and None values are masked."""
+        ix = self._size
+        if ix == self._capacity:
+            self._grow(2 * self._capacity)
+        for data, mask, value in zip(self._data, self._mask, values):
+            if value is Missing or value is None:
+                continue
+            data[ix] = value
+            mask[ix] = False
+        self._size = ix + 1
+
+    def finish(self):
+        """Return a dict of name => numpy.ma.MaskedArray"""
+        ma = self._np.ma
+        size = self._size
+        return dict(
+            (name, ma.MaskedArray(data[:size], mask=mask[:size]))
+            for name, data, mask in zip(self.names, self._data, self._mask))
+
+
 def get_fields(data, opts, trie):
     """Return list of (name, data) tuples where name is in the trie."""
     obj_size = bson._UNPACK_INT(data[:4])[0]
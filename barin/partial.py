@@ -0,0 +1,242 @@
+"""Documents loaded with a projection.
+
+Query.only()/exclude() (and find(projection=...)) load some of the fields
+of each document. Those documents are validated with a partial schema,
+which only contains the projected fields, and are instances of a partial
+subclass of their class. Reading a field that wasn't loaded raises
+errors.FieldNotLoaded, and partial documents can't be replace()d; use
+doc.m.save() to write back their changes.
+"""
+import copy
+import weakref
+from collections.abc import Mapping
+
+from . import errors
+from .base import Document
+from . import schema as S
+
+PROJECTION = "_barin_projection"
+
+_PARTIAL_CLASSES = weakref.WeakKeyDictionary()
+
+
+class Projection(object):
+    """The (dotted) field names loaded by a query, either inclusive
+    (only these fields) or exclusive (all but these fields)"""
+
+    def __init__(self, names=(), exclusive=False, include_id=True):
+        self.names = tuple(names)
+        self.exclusive = exclusive
+        self.include_id = include_id
+        self._key = (frozenset(self.names), exclusive, include_id)
+        self._schemas = {}
+
+    def __repr__(self):
+        return "<Projection {}>".format(self.spec())
+
+    def __eq__(self, other):
+        return isinstance(other, Projection) and self._key == other._key
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self._key)
+
+    @classmethod
+    def from_spec(cls, spec):
+        """Parse a pymongo projection (dict or list of names)"""
+        if spec is None or isinstance(spec, Projection):
+            return spec
+        if not spec:
+            return None
+        if isinstance(spec, Mapping):
+            items = spec.items()
+        else:
+            items = [(name, 1) for name in spec]
+        names, include_id, exclusive = [], True, None
+        for name, value in items:
+            # Operators such as $slice and $elemMatch include the field
+            excluded = not isinstance(value, Mapping) and not value
+            if name == "_id":
+                include_id = not excluded
+                continue
+            if exclusive is None:
+                exclusive = excluded
+            elif exclusive != excluded:
+                raise errors.QueryError(
+                    "Projection {} mixes inclusion and exclusion".format(spec)
+                )
+            names.append(name)
+        if exclusive is None:
+            exclusive = not include_id
+        return cls(names, exclusive, include_id)
+
+    def spec(self):
+        value = 0 if self.exclusive else 1
+        result = dict((name, value) for name in self.names)
+        if not self.include_id:
+            result["_id"] = 0
+        return result
+
+    def only(self, names):
+        if self.exclusive and self.names:
+            raise errors.QueryError("Can't combine only() and exclude()")
+        return Projection(self.names + tuple(names), False, self.include_id)
+
+    def exclude(self, names):
+        names = tuple(names)
+        include_id = self.include_id and "_id" not in names
+        names = tuple(n for n in names if n != "_id")
+        if self.names and not self.exclusive:
+            if names:
+                raise errors.QueryError("Can't combine only() and exclude()")
+            return Projection(self.names, False, include_id)
+        return Projection(self.names + names, True, include_id)
+
+    def includes(self, name):
+        """True if the top-level field name is (at least partially)
+        loaded"""
+        if name == "_id":
+            return self.include_id
+        if self.exclusive:
+            return name not in self.names
+        prefix = name + "."
+        return any(n == name or n.startswith(prefix) for n in self.names)
+
+    def schema(self, schema):
+        """Return the partial version of the Document schema"""
+        try:
+            return self._schemas[schema]
+        except KeyError:
+            pass
+        tree = {}
+        for name in self.names:
+            node = tree
+            parts = name.split(".")
+            for part in parts[:-1]:
+                node = node.setdefault(part, {})
+                if node is None:
+                    break
+            else:
+                node[parts[-1]] = None
+        if self.exclusive and not self.include_id:
+            tree["_id"] = None
+        elif not self.exclusive and self.include_id:
+            tree["_id"] = None
+        result = _partial(schema, tree, self.exclusive)
+        result.as_class = partial_class(schema.as_class)
+        self._schemas[schema] = result
+        return result
+
+
+class PartialDocument(Document):
+    """A document of which only some fields were loaded"""
+
+    def __missing__(self, name):
+        projection = self.__dict__.get(PROJECTION)
+        if projection is not None and not projection.includes(name):
+            raise errors.FieldNotLoaded(
+                "Field {!r} was not loaded by {}".format(name, projection)
+            )
+        raise KeyError(name)
+
+
+def partial_class(cls):
+    """Return the partial subclass of a mapped class"""
+    if issubclass(cls, PartialDocument):
+        return cls
+    try:
+        return _PARTIAL_CLASSES[cls]
+    except KeyError:
+        pass
+    result = _PARTIAL_CLASSES[cls] = type(
+        cls.__name__, (PartialDocument, cls), {}
+    )
+    return result
+
+
+def extract(args, kwargs, position=None):
+    """Parse the projection argument of a pymongo read (at args[position]
+    or in kwargs), replacing it with its spec. Return (args, Projection or
+    None)."""
+    if position is not None and len(args) > position:
+        projection = Projection.from_spec(args[position])
+        if projection is not None:
+            args = args[:position] + (projection.spec(),) + args[position + 1:]
+        return args, projection
+    projection = Projection.from_spec(kwargs.get("projection"))
+    if projection is not None:
+        kwargs["projection"] = projection.spec()
+    return args, projection
+
+
+def mark(obj, projection):
+    """Record the projection which loaded obj"""
+    obj.__dict__[PROJECTION] = projection
+    return obj
+
+
+def projection_of(obj):
+    """Return the Projection which loaded obj, or None if it is complete"""
+    return getattr(obj, "__dict__", {}).get(PROJECTION)
+
+
+def schema_for(obj, schema):
+    """Return the schema validating changes to obj: loaded fields are
+    validated with the partial schema, fields set after loading with the
+    full one"""
+    projection = projection_of(obj)
+    if projection is None:
+        return schema
+    result = _copy(schema)
+    result.fields = dict(schema.fields, **projection.schema(schema).fields)
+    return result
+
+
+def require_complete(obj):
+    projection = projection_of(obj)
+    if projection is not None:
+        raise errors.PartialDocumentError(
+            "Document was loaded with projection {}; use m.save()".format(
+                projection.spec()
+            )
+        )
+
+
+def _partial(validator, tree, exclusive):
+    """Copy validator, keeping only the fields in (or not in) tree"""
+    if isinstance(validator, S.Array) and isinstance(
+        validator.validator, S.Validator
+    ):
+        result = _copy(validator)
+        result.validator = _partial(validator.validator, tree, exclusive)
+        return result
+    if not isinstance(validator, S.Document):
+        return validator
+    fields = {}
+    if exclusive:
+        for name, fld in validator.fields.items():
+            if name not in tree:
+                fields[name] = fld
+            elif tree[name] is not None:
+                fields[name] = _partial(fld, tree[name], exclusive)
+    else:
+        for name, sub in tree.items():
+            fld = validator.fields.get(name)
+            if fld is None:
+                continue
+            if sub is None:
+                fields[name] = fld
+            else:
+                fields[name] = _partial(fld, sub, exclusive)
+    result = _copy(validator)
+    result.fields = fields
+    return result
+
+
+def _copy(validator):
+    result = copy.copy(validator)
+    # Forget the generated code / loaders of the original
+    result.__dict__.pop("_compiled", None)
+    return result
@@ -0,0 +1,166 @@
+"""Query plan checks against the declared indexes.
+
+check(query) runs Query.explain() and reports:
+
+- COLLSCAN: the query scans the whole collection
+- SORT: the results are sorted in memory
+- ratio: many more documents examined than returned
+- undeclared: no index declared on the collection (with Index(...),
+  including the implicit _id index) is used by the winning plan
+
+For queries with issues, it suggests an Index on the shape of the filter
+and sort, following the equality, sort, range rule: fields compared by
+equality first, then the sort keys, then fields compared by range.
+"""
+from .index import Index
+
+RANGE_OPERATORS = frozenset(
+    [
+        "$gt",
+        "$gte",
+        "$lt",
+        "$lte",
+        "$ne",
+        "$nin",
+        "$regex",
+        "$exists",
+        "$type",
+        "$mod",
+        "$not",
+        "$elemMatch",
+    ]
+)
+
+
+class PlanReport(object):
+    """The checks of one query's plan"""
+
+    def __init__(self, query, explain, max_ratio=10):
+        compiled = query._compile_query()
+        self.query = query
+        self.explain = explain
+        self.filter = compiled["filter"]
+        self.sort = compiled.get("sort", [])
+        stats = explain.get("executionStats", {})
+        self.n_returned = stats.get("nReturned", 0)
+        self.docs_examined = stats.get("totalDocsExamined", 0)
+        self.keys_examined = stats.get("totalKeysExamined", 0)
+        plan = explain.get("queryPlanner", {}).get("winningPlan", {})
+        self.stages = list(_stages(plan))
+        self.indexes = []
+        for stage in self.stages:
+            if "keyPattern" in stage:
+                self.indexes.append(list(stage["keyPattern"].items()))
+            elif stage.get("stage") == "IDHACK":
+                self.indexes.append([("_id", 1)])
+        self.issues = []
+        names = set(stage.get("stage") for stage in self.stages)
+        if "COLLSCAN" in names:
+            self.issues.append("COLLSCAN")
+        if "SORT" in names:
+            self.issues.append("SORT")
+        if self.docs_examined > max_ratio * max(self.n_returned, 1):
+            self.issues.append("ratio")
+        declared = [
+            [tuple(key) for key in index.arg]
+            for index in query._mgr.collection_manager.indexes
+        ]
+        declared.append([("_id", 1)])
+        if not any(keys in declared for keys in self.indexes):
+            self.issues.append("undeclared")
+        self.suggestion = None
+        if self.issues:
+            self.suggestion = suggest_index(self.filter, self.sort)
+
+    def __repr__(self):
+        result = "<PlanReport {} {}: {}".format(
+            self.query._mgr.collection_manager.name,
+            self.filter,
+            ", ".join(self.issues) or "ok",
+        )
+        if self.suggestion is not None:
+            result += ", try {}".format(self.suggestion)
+        return result + ">"
+
+    @property
+    def ok(self):
+        return not self.issues
+
+    @property
+    def ratio(self):
+        """Documents examined per document returned"""
+        return self.docs_examined / max(self.n_returned, 1)
+
+
+def check(query, max_ratio=10):
+    """Explain query and return its PlanReport"""
+    return PlanReport(query, query.explain(), max_ratio)
+
+
+def suggest_index(flt, sort=()):
+    """Return the Index for a filter and sort (list of (key, direction)),
+    or None when there is nothing to index"""
+    equality, ranges = [], []
+    _shape(flt, equality, ranges)
+    keys = [(name, 1) for name in equality]
+    for name, direction in _sort_keys(sort):
+        if name not in equality:
+            keys.append((name, direction))
+    seen = set(name for name, direction in keys)
+    for name in ranges:
+        if name not in seen:
+            keys.append((name, 1))
+            seen.add(name)
+    if not keys:
+        return None
+    return Index(keys)
+
+
+def _shape(flt, equality, ranges):
+    for name, value in flt.items():
+        if name == "$and":
+            for part in value:
+                _shape(part, equality, ranges)
+        elif name.startswith("$"):
+            # $or, $nor, $text, $expr, ...: not a single index shape
+            continue
+        elif isinstance(value, dict) and any(
+            op in RANGE_OPERATORS for op in value
+        ):
+            if "$eq" in value or "$in" in value:
+                _add(equality, name)
+            else:
+                _add(ranges, name)
+        else:
+            _add(equality, name)
+
+
+def _add(names, name):
+    if name not in names:
+        names.append(name)
+
+
+def _sort_keys(sort):
+    for spec in sort:
+        if isinstance(spec, tuple):
+            yield spec
+        else:
+            for key in spec:
+                yield key
+
+
+def _stages(plan):
+    """Yield the stages of a (possibly sharded or SBE) winning plan"""
+    if "queryPlan" in plan:
+        plan = plan["queryPlan"]
+    yield plan
+    for key in ("inputStage", "outerStage", "innerStage"):
+        if key in plan:
+            for stage in _stages(plan[key]):
+                yield stage
+    for child in plan.get("inputStages", ()):
+        for stage in _stages(child):
+            yield stage
+    for shard in plan.get("shards", ()):
+        for stage in _stages(shard.get("winningPlan", {})):
+            yield stage
@@ -0,0 +1,143 @@
+"""Background prefetching for cursors.
+
+A Prefetcher reads batches from a pymongo cursor on a daemon thread, and
+optionally adapts them there too, keeping up to depth batches in a
+bounded queue. The network round trips of getMore then overlap with the
+consumer's work. Errors raised on the thread are raised again by
+next_batch().
+
+close() (or garbage collection of the Prefetcher) stops the thread. The
+thread finishes the fetch it is in, if any, and then exits.
+
+stats() reports how often the consumer found the queue empty (starved)
+and how long it waited, and how often the thread found it full
+(blocked). Frequent starvation means a deeper queue won't help: the
+consumer is faster than the server.
+"""
+import queue
+import threading
+import time
+import weakref
+from itertools import islice
+
+_DONE = object()
+
+
+class _Failure(object):
+    def __init__(self, error):
+        self.error = error
+
+
+class _Stats(object):
+    def __init__(self):
+        self.batches = 0
+        self.documents = 0
+        self.starved = 0
+        self.starved_seconds = 0.0
+        self.blocked = 0
+
+
+class Prefetcher(object):
+    def __init__(self, source, batch_size, depth=2, adapt=None):
+        self._queue = queue.Queue(depth)
+        self._stop = threading.Event()
+        self._stats = _Stats()
+        self._done = False
+        self._thread = threading.Thread(
+            target=_produce,
+            args=(
+                source,
+                batch_size,
+                adapt,
+                self._queue,
+                self._stop,
+                self._stats,
+            ),
+            name="barin-prefetch",
+            daemon=True,
+        )
+        self._finalizer = weakref.finalize(
+            self, _cancel, self._stop, self._queue
+        )
+        self._thread.start()
+
+    def next_batch(self):
+        """Return the next batch, or an empty list when exhausted"""
+        if self._done:
+            return []
+        stats = self._stats
+        try:
+            item = self._queue.get_nowait()
+        except queue.Empty:
+            stats.starved += 1
+            start = time.monotonic()
+            item = self._queue.get()
+            stats.starved_seconds += time.monotonic() - start
+        if item is _DONE:
+            self._done = True
+            return []
+        if isinstance(item, _Failure):
+            self._done = True
+            raise item.error
+        stats.batches += 1
+        stats.documents += len(item)
+        return item
+
+    def close(self, timeout=None):
+        """Stop the thread, waiting up to timeout seconds for it to exit"""
+        self._done = True
+        self._finalizer()
+        self._thread.join(timeout)
+
+    def stats(self):
+        stats = self._stats
+        return dict(
+            batches=stats.batches,
+            documents=stats.documents,
+            starved=stats.starved,
+            starved_seconds=stats.starved_seconds,
+            blocked=stats.blocked,
+            queued=self._queue.qsize(),
+        )
+
+
+def _produce(source, batch_size, adapt, q, stop, stats):
+    it = iter(source)
+    try:
+        while not stop.is_set():
+            batch = list(islice(it, batch_size))
+            if not batch:
+                break
+            if adapt is not None:
+                batch = adapt(batch)
+            if not _put(q, stop, stats, batch):
+                return
+    except Exception as err:
+        _put(q, stop, stats, _Failure(err))
+        return
+    _put(q, stop, stats, _DONE)
+
+
+def _put(q, stop, stats, item):
+    try:
+        q.put_nowait(item)
+        return True
+    except queue.Full:
+        stats.blocked += 1
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.05)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def _cancel(stop, q):
+    stop.set()
+    # Unblock the thread if it is waiting for room in the queue
+    try:
+        while True:
+            q.get_nowait()
+    except queue.Empty:
+        pass
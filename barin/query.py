@@ -1,9 +1,17 @@
+import time
+
 import six
 from bson.son import SON
 
 from .base import partialmethod
-from .cursor import Cursor
+from .cursor import Cursor, RawCursor
+from . import aio
+from . import instrument
 from . import mql
+from . import lazy
+from . import numeric
+from . import scan
+from .partial import Projection
 
 
 class _CursorSource(object):
@@ -31,6 +39,11 @@ class _CursorSource(object):
             return res
         raise ValueError("More than one result returned for one()")
 
+    def batches(self, size=100):
+        """Yield the results in lists of (at most) size documents,
+        fetched in server batches of the same size"""
+        return self.get_cursor().batches(size)
+
     def count(self):
         filter_args = self._compile_query().get("filter", {})
         return self.get_cursor().collection.count_documents(filter=filter_args)
@@ -39,48 +52,172 @@ class _CursorSource(object):
         return self.count()
 
 
+class _Stage(object):
+    """Node of an immutable, structurally shared pipeline.
+
+    Queries built from a common prefix share its nodes, and the compiled
+    form of the pipeline ending at a node is memoized on that node.
+    """
+
+    __slots__ = ("parent", "op", "value", "compiled")
+
+    def __init__(self, parent, op, value):
+        self.parent = parent
+        self.op = op
+        self.value = value
+        self.compiled = None
+
+    def __iter__(self):
+        """Iterate over the stages from the root to this node"""
+        nodes = []
+        node = self
+        while node is not None:
+            nodes.append(node)
+            node = node.parent
+        return reversed(nodes)
+
+
 class Query(_CursorSource):
-    def __init__(self, mgr, pipeline=None):
+    def __init__(self, mgr, pipeline=None, options=None):
+        stages = None
+        for stage in pipeline or ():
+            for op, value in stage.items():
+                stages = _Stage(stages, op, value)
+        self._init(mgr, stages, options or {})
+
+    def _init(self, mgr, stages, options):
         self._mgr = mgr
-        if pipeline is None:
-            pipeline = []
-        self.pipeline = pipeline
-        self._wrap_mgr("find")
-        self._wrap_mgr("update_one")
-        self._wrap_mgr("update_many")
-        self._wrap_mgr("replace_one")
-        self._wrap_mgr("delete_one")
-        self._wrap_mgr("delete_many")
-        self._wrap_mgr("find_one_and_update")
-        self._wrap_mgr("find_one_and_replace")
-        self._wrap_mgr("find_one_and_delete")
+        self._stages = stages
+        self.options = options
+        return self
+
+    @property
+    def pipeline(self):
+        if self._stages is None:
+            return []
+        return [{node.op: node.value} for node in self._stages]
 
     def _append(self, op, value):
-        stage = {op: value}
-        return Query(self._mgr, self.pipeline + [stage])
+        stages = _Stage(self._stages, op, value)
+        return Query.__new__(Query)._init(self._mgr, stages, self.options)
 
-    match = partialmethod(_append, "$match")
-    limit = partialmethod(_append, "$limit")
-    skip = partialmethod(_append, "$skip")
-    geo_near = partialmethod(_append, "$geoNear")
+    def _with_options(self, **options):
+        return Query.__new__(Query)._init(
+            self._mgr, self._stages, dict(self.options, **options)
+        )
+
+    def match(self, value):
+        return self._append("$match", value)
+
+    def limit(self, value):
+        return self._append("$limit", value)
+
+    def skip(self, value):
+        return self._append("$skip", value)
+
+    def geo_near(self, value):
+        return self._append("$geoNear", value)
 
     def real_class(self):
         """Handles barin.cmap(...) classes"""
         return self._mgr.registry.by_class(self._mgr.cls).cls
 
     def get_cursor(self):
-        return self._mgr.find(**self._compile_query())
+        return self._mgr.find(**self._compile_query(), **self.options)
+
+    def explain(self):
+        """Return the explain() output of the query (see also
+        barin.plans)"""
+        kwargs = dict(self._compile_query())
+        projection = self.options.get("projection")
+        if projection is not None:
+            kwargs["projection"] = projection.spec()
+        collection = self._mgr.collection_manager.collection
+        return collection.find(**kwargs).explain()
+
+    @property
+    def aio(self):
+        """Run this query on the async database"""
+        return aio.AsyncQuery(self)
+
+    def lazy(self, lazy=True):
+        """Return documents which validate each field on first access"""
+        return self._with_options(lazy=lazy)
+
+    def preload(self, *names):
+        """Load the named relationships for each batch of results with
+        one query per relationship"""
+        names = self.options.get("preload", ()) + names
+        return self._with_options(preload=names)
+
+    def prefetch(self, depth=2, adapt=True):
+        """Fetch (and, with adapt, validate) up to depth batches of
+        results ahead on a background thread (see barin.prefetch)"""
+        return self._with_options(prefetch=depth, prefetch_adapt=adapt)
+
+    def validate(self, mode):
+        """Set the validation mode of the results: "full", "trusted" or
+        "sampled(p)" """
+        return self._with_options(validate=mode)
+
+    def only(self, *names):
+        """Load only the named (dotted) fields. The results are partial
+        documents (see barin.partial)."""
+        projection = self.options.get("projection") or Projection()
+        return self._with_options(projection=projection.only(names))
+
+    def exclude(self, *names):
+        """Load all but the named (dotted) fields"""
+        projection = self.options.get("projection") or Projection()
+        return self._with_options(projection=projection.exclude(names))
+
+    def cached(self, ttl=True):
+        """Serve results from the collection's result cache for ttl
+        seconds (True: the cache's default, False: bypass the cache)"""
+        return self._with_options(cached=ttl)
+
+    def parallel_scan(
+        self,
+        workers=4,
+        partition_key="_id",
+        partitions=None,
+        batches=False,
+        retries=2,
+        executor=None,
+        batch_size=100,
+    ):
+        """Yield the results (or, with batches=True, lists of at most
+        batch_size results) reading ranges of partition_key concurrently
+        (see barin.scan)"""
+        return scan.parallel_scan(
+            self,
+            workers=workers,
+            partition_key=partition_key,
+            partitions=partitions,
+            batches=batches,
+            retries=retries,
+            executor=executor,
+            batch_size=batch_size,
+        )
+
+    def to_columns(self, *names, **kwargs):
+        """Return a dict of numpy masked arrays, one per (dotted) name,
+        bypassing document validation"""
+        collection = self._mgr.collection_manager.raw_collection
+        pymongo_cursor = collection.find(
+            projection=numeric.projection(names), **self._compile_query()
+        )
+        return numeric.to_columns(pymongo_cursor, names, **kwargs)
 
     def sort(self, key_or_list, direction=1):
         if isinstance(key_or_list, six.string_types):
             sval = (key_or_list, direction)
         else:
             sval = key_or_list
-        stage = {"$sort": sval}
-        return Query(self._mgr, self.pipeline + [stage])
+        return self._append("$sort", sval)
 
-    def _wrap_mgr(self, name):
-        def wrapper(*args, **kwargs):
+    def _wrap_mgr(name):
+        def wrapper(self, *args, **kwargs):
             orig = getattr(self._mgr, name)
             qres = self._compile_query()
             if "sort" in qres:
@@ -94,24 +231,46 @@ class Query(_CursorSource):
             return res
 
         wrapper.__name__ = "wrapped_{}".format(name)
-        setattr(self, name, wrapper)
         return wrapper
 
+    find = _wrap_mgr("find")
+    update_one = _wrap_mgr("update_one")
+    update_many = _wrap_mgr("update_many")
+    replace_one = _wrap_mgr("replace_one")
+    delete_one = _wrap_mgr("delete_one")
+    delete_many = _wrap_mgr("delete_many")
+    find_one_and_update = _wrap_mgr("find_one_and_update")
+    find_one_and_replace = _wrap_mgr("find_one_and_replace")
+    find_one_and_delete = _wrap_mgr("find_one_and_delete")
+
     def _compile_query(self):
+        """Return the {filter, sort, skip, limit} for the pipeline.
+
+        The result is cached and shared, so it must not be modified.
+        """
+        node = self._stages
+        if node is None:
+            return dict(filter=mql.and_())
+        if node.compiled is None:
+            node.compiled = self._compile_stages(node)
+        return node.compiled
+
+    @staticmethod
+    def _compile_stages(stages):
         filters = []
         limits = []
         skips = []
         sorts = []
-        for stage in self.pipeline:
-            op, value = list(stage.items())[0]
+        for node in stages:
+            op = node.op
             if op == "$match":
-                filters.append(value)
+                filters.append(node.value)
             elif op == "$limit":
-                limits.append(value)
+                limits.append(node.value)
             elif op == "$skip":
-                skips.append(value)
+                skips.append(node.value)
             elif op == "$sort":
-                sorts.append(value)
+                sorts.append(node.value)
         result = dict(filter=mql.and_(*filters))
         if limits:
             result["limit"] = min(limits)
@@ -124,17 +283,24 @@ class Query(_CursorSource):
 
 class Aggregate(_CursorSource):
     def __init__(
-        self, mgr, pipeline=None, raw=False, hint=None, collection=None
+        self,
+        mgr,
+        pipeline=None,
+        raw=False,
+        hint=None,
+        collection=None,
+        options=None,
     ):
         self._mgr = mgr
         if pipeline is None:
             pipeline = []
+        if options is None:
+            options = {}
         self.pipeline = pipeline
         self.raw = raw
         self._hint = hint
-        if collection is None:
-            collection = self._mgr.collection
-        self.collection = collection
+        self.options = options
+        self._collection = collection
 
     def clone(self, **overrides):
         kwargs = dict(
@@ -142,11 +308,15 @@ class Aggregate(_CursorSource):
             pipeline=self.pipeline,
             raw=self.raw,
             hint=self._hint,
-            collection=self.collection,
+            collection=self._collection,
+            options=self.options,
         )
         kwargs.update(overrides)
         return Aggregate(**kwargs)
 
+    def _with_options(self, **options):
+        return self.clone(options=dict(self.options, **options))
+
     def _append(self, op, value, raw=None):
         if raw is None:
             raw = self.raw
@@ -156,6 +326,48 @@ class Aggregate(_CursorSource):
     def hint(self, index_name):
         return self.clone(hint=index_name)
 
+    def validate(self, mode):
+        """Set the validation mode of the results: "full", "trusted" or
+        "sampled(p)" """
+        return self._with_options(validate=mode)
+
+    def only(self, *names):
+        """Project the results to the named (dotted) fields. The results
+        are partial documents (see barin.partial)."""
+        projection = self.options.get("projection") or Projection()
+        return self._with_options(projection=projection.only(names))
+
+    def exclude(self, *names):
+        """Project away the named (dotted) fields"""
+        projection = self.options.get("projection") or Projection()
+        return self._with_options(projection=projection.exclude(names))
+
+    @property
+    def aio(self):
+        """Run this pipeline on the async database"""
+        return aio.AsyncAggregate(self)
+
+    def lazy(self, lazy=True):
+        """Return documents which validate each field on first access"""
+        return self._with_options(lazy=lazy)
+
+    def preload(self, *names):
+        """Load the named relationships for each batch of results with
+        one query per relationship"""
+        names = self.options.get("preload", ()) + names
+        return self._with_options(preload=names)
+
+    def prefetch(self, depth=2, adapt=True):
+        """Fetch (and, with adapt, validate) up to depth batches of
+        results ahead on a background thread (see barin.prefetch)"""
+        return self._with_options(prefetch=depth, prefetch_adapt=adapt)
+
+    @property
+    def collection(self):
+        if self._collection is None:
+            return self._mgr.collection
+        return self._collection
+
     @property
     def m(self):
         return self._mgr
@@ -231,17 +443,34 @@ class Aggregate(_CursorSource):
         stage = {"$sort": SON(sval)}
         return self.clone(pipeline=self.pipeline + [stage])
 
+    def to_columns(self, *names, **kwargs):
+        """Return a dict of numpy masked arrays, one per (dotted) name,
+        bypassing document validation"""
+        stage = {"$project": numeric.projection(names)}
+        collection = lazy.raw_collection(self.collection)
+        if self._hint:
+            pymongo_cursor = collection.aggregate(
+                self.pipeline + [stage], hint=self._hint
+            )
+        else:
+            pymongo_cursor = collection.aggregate(self.pipeline + [stage])
+        return numeric.to_columns(pymongo_cursor, names, **kwargs)
+
     def out(self, collection_name):
         pipeline = self.pipeline + [{"$out": collection_name}]
         if self._hint:
             cursor = self.collection.aggregate(pipeline, hint=self._hint)
         else:
             cursor = self.collection.aggregate(pipeline)
+        # Cached reads of the target collection are now stale
+        for cls in self._mgr.metadata.collections:
+            if cls.__barin__.name == collection_name:
+                cls.__barin__.invalidate_cache()
         return iter(Cursor(self._mgr, cursor))
 
     def explain(self):
         kwargs = dict(
-            pipeline=self.pipeline,
+            pipeline=self._cursor_pipeline(),
             explain=True,
         )
         if self._hint:
@@ -250,17 +479,40 @@ class Aggregate(_CursorSource):
             "aggregate", self.collection.name, **kwargs
         )
 
+    def _cursor_pipeline(self):
+        """The pipeline, ending with the $project of only()/exclude()"""
+        projection = self.options.get("projection")
+        if projection is None:
+            return self.pipeline
+        return self.pipeline + [{"$project": projection.spec()}]
+
     def get_cursor(self):
+        is_lazy = self.options.get("lazy", False) and not self.raw
+        collector = None if self.raw else self._mgr.metadata.collector
+        collection = self.collection
+        if is_lazy or collector is not None:
+            collection = lazy.raw_collection(collection)
+        pipeline = self._cursor_pipeline()
+        kwargs = {}
         if self._hint:
-            pymongo_cursor = self.collection.aggregate(
-                self.pipeline, hint=self._hint
+            kwargs["hint"] = self._hint
+        start = time.perf_counter()
+        pymongo_cursor = collection.aggregate(pipeline, **kwargs)
+        if collector is not None:
+            # The first batch is returned by the aggregate command
+            pymongo_cursor = instrument.MeteredCursor(
+                pymongo_cursor,
+                collector,
+                self._mgr.collection_manager.name,
+                "aggregate",
+                None if is_lazy else self.collection.codec_options,
+                server_seconds=time.perf_counter() - start,
             )
-        else:
-            pymongo_cursor = self.collection.aggregate(self.pipeline)
         if self.raw:
-            return pymongo_cursor
+            return RawCursor(pymongo_cursor)
         else:
-            return Cursor(self._mgr, pymongo_cursor)
+            options = dict(self.options, lazy=is_lazy)
+            return Cursor(self._mgr, pymongo_cursor, **options)
 
     def conform(self, mgr):
         return self.clone(mgr=mgr, raw=False)
@@ -1,5 +1,8 @@
+from barin import errors
 from barin import query
-from barin.adapter import adapter
+
+# Instance attribute holding relationships loaded by Cursor.preload
+PRELOADED = "_barin_preloaded"
 
 
 class joined_property:
@@ -30,6 +33,9 @@ class joined_property:
     def __get__(self, obj, cls=None):
         if obj is None:
             return self
+        preloaded = obj.__dict__.get(PRELOADED)
+        if preloaded is not None and self._name in preloaded:
+            return preloaded[self._name]
         value = obj.get(self._name, self.MISSING)
         cref = cls.m.metadata.cref(self._cname)
         if value is self.MISSING:
@@ -38,7 +44,7 @@ class joined_property:
             return None
         if isinstance(value, query.Aggregate):
             return value
-        adapt = adapter(cref.m)
+        adapt = cref.m.read_adapter()
         if self._many:
             return list(map(adapt, value))
         else:
@@ -46,7 +52,11 @@ class joined_property:
 
 
 class relationship(joined_property):
-    """joined_property that works with $lookups"""
+    """joined_property that works with $lookups
+
+    With many=True, the attribute is a list of the related documents,
+    whether they were preloaded or not (it used to be a query.Aggregate
+    when not preloaded)."""
 
     MISSING = object()
 
@@ -80,12 +90,53 @@ class relationship(joined_property):
         local_field = self._lookup_spec["localField"]
         foreign_field = self._lookup_spec["foreignField"]
         local_value = dotted_getattr(obj, local_field)
-        q = cref.m.aggregate.match({foreign_field: local_value})
+        # Raw documents, which __get__ adapts
+        q = cref.m.aggregate.match({foreign_field: local_value}).clone(
+            raw=True
+        )
         if self._many:
-            return q
+            # A list, like the preloaded and $lookup results
+            return q.all()
         else:
             return q.first()
 
+    def preload(self, objs, metadata):
+        """Load this relationship for all objs with a single $in query,
+        attaching the results (adapted with the validation mode of
+        cref.m.read_adapter(), as by __get__) to each object"""
+        if self._fget != self.simple_load:
+            raise errors.QueryError(
+                "Relationship {} cannot be preloaded".format(self._name)
+            )
+        local_field = self._lookup_spec["localField"]
+        foreign_field = self._lookup_spec["foreignField"]
+        local_values = [dotted_getattr(obj, local_field) for obj in objs]
+        keys = set()
+        for value in local_values:
+            keys.update(_keys(value))
+        by_key = {}
+        if keys:
+            cref = metadata.cref(self._cname)
+            q = cref.m.aggregate.match({foreign_field: {"$in": list(keys)}})
+            for res in q:
+                for key in _keys(dotted_getitem(res, foreign_field)):
+                    by_key.setdefault(key, []).append(res)
+        for obj, value in zip(objs, local_values):
+            seen = set()
+            matches = []
+            for key in _keys(value):
+                for res in by_key.get(key, ()):
+                    if id(res) not in seen:
+                        seen.add(id(res))
+                        matches.append(res)
+            if self._many:
+                result = matches
+            elif matches:
+                result = matches[0]
+            else:
+                result = None
+            obj.__dict__.setdefault(PRELOADED, {})[self._name] = result
+
     def _join(self, agg, **kwargs):
         """kwargs can override any part of the lookup spec"""
         many = kwargs.pop("many", self._many)
@@ -114,3 +165,23 @@ def dotted_getattr(obj, path):
     for attr in path.split("."):
         obj = getattr(obj, attr)
     return obj
+
+
+def dotted_getitem(obj, path):
+    for key in path.split("."):
+        if not isinstance(obj, dict):
+            return None
+        obj = obj.get(key)
+    return obj
+
+
+def _keys(value):
+    """Hashable lookup keys for a (possibly array) field value"""
+    if not isinstance(value, list):
+        value = [value]
+    for v in value:
+        try:
+            hash(v)
+        except TypeError:
+            continue
+        yield v
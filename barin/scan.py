@@ -0,0 +1,270 @@
+"""Parallel scans of the documents matched by a Query.
+
+parallel_scan() splits the values of a partition key into ranges with
+$bucketAuto, then reads each range with its own cursor on a thread pool,
+so that fetching, decoding and validating run concurrently. The query's
+filter and projection (and its other options) apply to each range. Each
+range is read in partition key (then _id) order and the ranges are
+yielded in key order, so the results come out sorted by the partition
+key (the first range also holds the documents whose key is missing or of
+another BSON type). Queries sorted otherwise are rejected.
+
+Each worker hands its partition over in batches of batch_size documents
+through a bounded queue, so at most a few batches per partition are held
+in memory. Workers run in a copy of the caller's context (e.g. its
+session).
+
+A partition whose cursor fails with a PyMongoError is read again (up to
+retries times) without restarting the other partitions, resuming after
+the last partition key and _id read.
+"""
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+import queue
+import threading
+
+import bson
+import pymongo.errors
+
+from . import errors
+
+# Batches queued per partition before its worker waits for the consumer
+QUEUE_DEPTH = 2
+
+_DONE = object()
+
+
+def parallel_scan(
+    query,
+    workers=4,
+    partition_key="_id",
+    partitions=None,
+    batches=False,
+    retries=2,
+    executor=None,
+    batch_size=100,
+):
+    """Yield the documents of query (or lists of at most batch_size
+    documents, with batches=True), reading partitions concurrently"""
+    compiled = query._compile_query()
+    if "skip" in compiled or "limit" in compiled:
+        raise errors.QueryError("parallel_scan() doesn't support skip/limit")
+    sort = _sort(partition_key)
+    if compiled.get("sort", sort) not in (sort, sort[:1]):
+        raise errors.QueryError(
+            "parallel_scan() results are sorted by {}".format(partition_key)
+        )
+    projection = query.options.get("projection")
+    if not _loads(projection, partition_key) or not _loads(projection, "_id"):
+        raise errors.QueryError(
+            "parallel_scan() needs {} and _id in the projection".format(
+                partition_key
+            )
+        )
+    if partitions is None:
+        partitions = 4 * workers
+    mgr = query._mgr
+    flt = compiled["filter"]
+    bounds = split_points(mgr, flt, partition_key, partitions)
+    kwargs = dict(query.options, sort=sort)
+    own_executor = executor is None
+    if own_executor:
+        executor = ThreadPoolExecutor(workers)
+    pending = deque()
+    ranges = partition_filters(flt, partition_key, bounds)
+    stop = threading.Event()
+
+    def submit():
+        part_filter = next(ranges, None)
+        if part_filter is None:
+            return
+        out = queue.Queue(QUEUE_DEPTH)
+        future = executor.submit(
+            contextvars.copy_context().run,
+            _scan,
+            mgr,
+            part_filter,
+            kwargs,
+            partition_key,
+            batch_size,
+            retries,
+            out,
+            stop,
+        )
+        pending.append((future, out))
+
+    try:
+        for i in range(workers + 1):
+            submit()
+        while pending:
+            future, out = pending.popleft()
+            for batch in _drain(out):
+                if batches:
+                    yield batch
+                else:
+                    for doc in batch:
+                        yield doc
+            submit()
+    finally:
+        stop.set()
+        for future, out in pending:
+            future.cancel()
+        if own_executor:
+            executor.shutdown(wait=False)
+
+
+def split_points(mgr, flt, key, partitions):
+    """Return the values splitting the documents matching flt into about
+    partitions ranges of key"""
+    if partitions < 2:
+        return []
+    collection = mgr.collection_manager.collection
+    pipeline = [
+        {"$match": flt},
+        {"$bucketAuto": {"groupBy": "$" + key, "buckets": partitions}},
+    ]
+    buckets = list(collection.aggregate(pipeline))
+    bounds = [bucket["_id"]["min"] for bucket in buckets[1:]]
+    # The range between values of different BSON types would match
+    # nothing: keep the bounds of the most common type (the documents of
+    # the other types fall in the first range)
+    counts = {}
+    for bound in bounds:
+        bracket = _bracket(bound)
+        if bracket is not None:
+            counts[bracket] = counts.get(bracket, 0) + 1
+    if not counts:
+        return []
+    bracket = max(counts, key=counts.get)
+    return [bound for bound in bounds if _bracket(bound) == bracket]
+
+
+def partition_filters(flt, key, bounds):
+    """Yield a filter per range between bounds. The first range also
+    matches documents whose key is missing or of another type."""
+    if not bounds:
+        yield flt
+        return
+    ranges = [{"$not": {"$gte": bounds[0]}}]
+    ranges += [{"$gte": lo, "$lt": hi} for lo, hi in zip(bounds, bounds[1:])]
+    ranges.append({"$gte": bounds[-1]})
+    for rng in ranges:
+        if key in flt:
+            yield {"$and": [flt, {key: rng}]}
+        else:
+            yield dict(flt, **{key: rng})
+
+
+def _scan(mgr, flt, kwargs, key, batch_size, retries, out, stop):
+    """Put the batches of the documents matching flt into out, then
+    _DONE (or the exception which ended the scan)"""
+    try:
+        _read(mgr, flt, kwargs, key, batch_size, retries, out, stop)
+    except Exception as err:
+        _put(out, err, stop)
+    else:
+        _put(out, _DONE, stop)
+
+
+def _read(mgr, flt, kwargs, key, batch_size, retries, out, stop):
+    last = None
+    for attempt in range(retries + 1):
+        part_filter = flt
+        if last is not None:
+            part_filter = {"$and": [flt, _after(key, *last)]}
+        try:
+            cursor = mgr.find(filter=part_filter, **kwargs)
+            for batch in cursor.batches(batch_size):
+                if not _put(out, batch, stop):
+                    return
+                last = _position(batch[-1], key)
+            return
+        except pymongo.errors.PyMongoError:
+            if attempt == retries:
+                raise
+
+
+def _drain(out):
+    """Yield the batches put into out by _scan"""
+    while True:
+        item = out.get()
+        if item is _DONE:
+            return
+        if isinstance(item, Exception):
+            raise item
+        yield item
+
+
+def _put(out, item, stop):
+    """Put item into out unless the scan is stopped first"""
+    while not stop.is_set():
+        try:
+            out.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def _sort(key):
+    if key == "_id":
+        return [("_id", 1)]
+    return [(key, 1), ("_id", 1)]
+
+
+def _loads(projection, key):
+    """True if the documents loaded with projection hold key"""
+    if projection is None:
+        return True
+    if key == "_id":
+        return projection.include_id
+    covered = any(
+        key == name or key.startswith(name + ".")
+        for name in projection.names
+    )
+    return covered != projection.exclusive
+
+
+def _bracket(value):
+    """The BSON comparison type bracket of value, or None for null"""
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return bool
+    if isinstance(value, (int, float, bson.Decimal128)):
+        return "number"
+    return type(value)
+
+
+def _position(doc, key):
+    """The (key, _id) values of doc (a missing key sorts as null)"""
+    value = doc
+    for name in key.split("."):
+        if not isinstance(value, dict):
+            value = None
+            break
+        value = value.get(name)
+    return value, doc["_id"]
+
+
+def _after(key, value, _id):
+    """The filter matching the documents after (value, _id) in the
+    order of _sort(key), comparing values of any BSON type as sort does"""
+    if key == "_id":
+        return {"$expr": {"$gt": ["$_id", {"$literal": value}]}}
+    field = {"$ifNull": ["$" + key, None]}
+    value = {"$literal": value}
+    return {
+        "$expr": {
+            "$or": [
+                {"$gt": [field, value]},
+                {
+                    "$and": [
+                        {"$eq": [field, value]},
+                        {"$gt": ["$_id", {"$literal": _id}]},
+                    ]
+                },
+            ]
+        }
+    }
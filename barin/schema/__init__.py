@@ -17,6 +17,7 @@ __all__ = (
     "Document",
     "Array",
     "compile_schema",
+    "profile",
 )
 from .base import Invalid, Missing, Validator, Anything, Strip
 from .scalar import (
@@ -33,3 +34,4 @@ from .scalar import (
 )
 from .compound import Document, Array
 from .compiler import compile_schema
+from .profiler import profile
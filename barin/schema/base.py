@@ -92,9 +92,16 @@ class Validator(object):
             raise Invalid(self._msgs['missing'], value)
         return self._validate(value, state)
 
+    _validate_interpreted = validate
+
     def _validate(self, value, state=None):
         return value
 
+    def compile(self):
+        """Return a function equivalent to self.validate, generating
+        specialized code where possible."""
+        return self.validate
+
     def _get_default(self):
         if callable(self.default):
             return self.default()
@@ -0,0 +1,236 @@
+"""Code generation for Document and Array validators.
+
+The generated functions have the same semantics as ``Validator.validate``
+for valid input.  They only implement the "happy path": as soon as
+anything looks wrong they raise ``_Fallback`` (or let ``Invalid``
+propagate), and the top-level wrapper re-runs the interpreted validator
+which produces the properly structured ``Invalid`` error.
+"""
+import contextvars
+import uuid
+import itertools
+from datetime import datetime
+
+import bson
+
+from .base import Validator, Anything, Invalid, Missing
+from . import scalar
+from . import compound
+
+
+class _Fallback(Exception):
+    pass
+
+
+# The ids of the validators profiled (by profile.profile()) in the current
+# context: their compiled functions run the (instrumented) interpreted
+# validators instead
+_profiled = contextvars.ContextVar('barin_profiled', default=frozenset())
+
+
+# Scalars whose _validate is a pure isinstance check
+_TYPE_CHECKS = {
+    scalar.ObjectId: bson.ObjectId,
+    scalar.DBRef: bson.dbref.DBRef,
+    scalar.Number: (int, float),
+    scalar.Integer: int,
+    scalar.Unicode: str,
+}
+
+# Validators whose _validate does nothing
+_NO_CHECKS = (Validator, Anything, scalar.Scalar)
+
+
+def compile_validator(validator):
+    """Return a function with the same signature and semantics as
+    validator.validate"""
+    if not _is_compound(validator):
+        return validator._validate_interpreted
+    gen = _Generator()
+    fname = gen.function(validator)
+    fast = gen.build()[fname]
+    slow = validator._validate_interpreted
+
+    def validate(value, state=None):
+        if id(validator) in _profiled.get():
+            return validator._validate_interpreted(value, state)
+        try:
+            return fast(value, state)
+        except (_Fallback, Invalid):
+            return slow(value, state)
+
+    validate.__name__ = 'compiled_' + fname
+    validate.source = gen.source
+    return validate
+
+
+class _Generator(object):
+
+    def __init__(self):
+        self._counter = itertools.count()
+        self._functions = {}   # id(validator) => function name
+        self._chunks = []
+        self.namespace = dict(
+            Missing=Missing,
+            _Fallback=_Fallback,
+            datetime=datetime,
+            UUID=uuid.UUID)
+        self.source = None
+
+    def build(self):
+        self.source = '\n\n'.join(self._chunks)
+        code = compile(self.source, '<barin.schema.codegen>', 'exec')
+        exec(code, self.namespace)
+        return self.namespace
+
+    def const(self, prefix, value):
+        name = '{}_{}'.format(prefix, next(self._counter))
+        self.namespace[name] = value
+        return name
+
+    def function(self, validator):
+        """Generate a function for a Document or Array validator, returning
+        its name"""
+        fname = self._functions.get(id(validator))
+        if fname is not None:
+            return fname
+        kind = type(validator).__name__.lower()
+        fname = self._functions[id(validator)] = '_{}_{}'.format(
+            kind, next(self._counter))
+        self.const('_keep', validator)  # keep id(validator) alive
+        lines = ['def {}(value, state):'.format(fname)]
+        self.prologue(validator, 'value', lines, '    ', 'return None')
+        if type(validator) is compound.Document:
+            self.document_body(validator, lines)
+        else:
+            self.array_body(validator, lines)
+        self._chunks.append('\n'.join(lines))
+        return fname
+
+    def prologue(self, validator, var, lines, indent, on_none):
+        """Handle the Missing/default/None dance from Validator.validate"""
+        default = validator.default
+        if default is not Missing:
+            lines.append('{}if {} is Missing:'.format(indent, var))
+            dname = self.const('_default', default)
+            if callable(default):
+                lines.append('{}    {} = {}()'.format(indent, var, dname))
+            else:
+                lines.append('{}    {} = {}'.format(indent, var, dname))
+        lines.append('{}if {} is None:'.format(indent, var))
+        if validator.allow_none:
+            lines.append('{}    {}'.format(indent, on_none))
+        else:
+            lines.append('{}    raise _Fallback'.format(indent))
+        if validator.required:
+            lines.append('{}elif {} is Missing:'.format(indent, var))
+            lines.append('{}    raise _Fallback'.format(indent))
+
+    def document_body(self, validator, lines):
+        lines.append('    if not isinstance(value, dict):')
+        lines.append('        raise _Fallback')
+        lines.append('    get = value.get')
+        names = []
+        for ix, (name, fv) in enumerate(validator.fields.items()):
+            var = 'v_{}'.format(ix)
+            names.append((name, var))
+            lines.append('    {} = get({!r}, Missing)'.format(var, name))
+            self.value(fv, var, lines, '    ')
+        lines.append('    validated = {{{}}}'.format(', '.join(
+            '{!r}: {}'.format(name, var) for name, var in names)))
+        known = self.const('_known', frozenset(validator.fields))
+        if not validator.strip_extra:
+            lines.append('    if not value.keys() <= {}:'.format(known))
+        if validator.strip_extra:
+            pass
+        elif not validator.allow_extra:
+            lines.append('        raise _Fallback')
+        else:
+            lines.append('        for k in value:')
+            lines.append('            if k not in {}:'.format(known))
+            if validator.extra_validator:
+                ename = self.const('_extra', validator.extra_validator)
+                lines.append(
+                    '                validated[k] = {}.validate('
+                    'value[k], state)'.format(ename))
+            else:
+                lines.append('                validated[k] = value[k]')
+        cname = self.const('_as_class', validator.as_class)
+        lines.append('    return {}(validated)'.format(cname))
+
+    def array_body(self, validator, lines):
+        lines.append('    if not isinstance(value, list):')
+        lines.append('        raise _Fallback')
+        ev = validator.validator
+        if ev is Missing:
+            lines.append('    return value')
+            return
+        if _is_compound(ev):
+            fname = self.function(ev)
+            lines.append(
+                '    return [{}(v, state) for v in value]'.format(fname))
+            return
+        if type(ev) in _NO_CHECKS and ev.allow_none:
+            lines.append('    return list(value)')
+            return
+        lines.append('    result = []')
+        lines.append('    append = result.append')
+        lines.append('    for v in value:')
+        self.value(ev, 'v', lines, '        ')
+        lines.append('        append(v)')
+        lines.append('    return result')
+
+    def value(self, validator, var, lines, indent):
+        """Emit statements validating (and converting) var in place"""
+        vtype = type(validator)
+        if _is_compound(validator):
+            fname = self.function(validator)
+            lines.append('{}{} = {}({}, state)'.format(
+                indent, var, fname, var))
+            return
+        if vtype not in _TYPE_CHECKS and vtype not in _NO_CHECKS and (
+                vtype not in (scalar.Float, scalar.DateTime, scalar.UUID)):
+            # Unknown validator, just delegate
+            vname = self.const('_validator', validator)
+            lines.append('{}{} = {}.validate({}, state)'.format(
+                indent, var, vname, var))
+            return
+        if vtype in _NO_CHECKS and validator.allow_none and (
+                not validator.required and validator.default is Missing):
+            # Anything() and friends pass every value through unchanged
+            return
+        self.prologue(validator, var, lines, indent, 'pass')
+        body = []
+        if vtype in _TYPE_CHECKS:
+            tname = self.const('_type', _TYPE_CHECKS[vtype])
+            body.append('if not isinstance({}, {}):'.format(var, tname))
+            body.append('    raise _Fallback')
+        elif vtype is scalar.Float:
+            body.append('if isinstance({}, (int, float)):'.format(var))
+            body.append('    {} = float({})'.format(var, var))
+            body.append('else:')
+            body.append('    raise _Fallback')
+        elif vtype is scalar.DateTime:
+            vname = self.const('_validator', validator)
+            body.append(
+                'if {0}.__class__ is not datetime or {0}.tzinfo is not None:'
+                .format(var))
+            body.append('    {} = {}._validate({}, state)'.format(
+                var, vname, var))
+        elif vtype is scalar.UUID:
+            vname = self.const('_validator', validator)
+            body.append('if {}.__class__ is not UUID:'.format(var))
+            body.append('    {} = {}._validate({}, state)'.format(
+                var, vname, var))
+        if body:
+            lines.append('{}else:'.format(indent))
+            lines.extend('{}    {}'.format(indent, line) for line in body)
+
+
+def _is_compound(validator):
+    vtype = type(validator)
+    if vtype is compound.Document:
+        return True
+    if vtype is compound.Array:
+        return validator.only_validate == [slice(None)]
+    return False
@@ -5,13 +5,34 @@ import six
 
 from barin import errors
 from barin.base import Document as BaseDocument
+from barin.util import reify
 from barin.schema.base import Validator, Invalid, Missing
 
 
 log = logging.getLogger(__name__)
 
 
-class Document(Validator):
+class _Compilable(Validator):
+    """Mixin for validators that support code generation.
+
+    When constructed with compiled=True, validate() dispatches to the
+    generated function."""
+
+    def validate(self, value, state=None):
+        if self.compiled:
+            return self._compiled(value, state)
+        return self._validate_interpreted(value, state)
+
+    def compile(self):
+        return self._compiled
+
+    @reify
+    def _compiled(self):
+        from barin.schema.codegen import compile_validator
+        return compile_validator(self)
+
+
+class Document(_Compilable):
     _msgs = dict(
         Validator._msgs,
         not_doc='Value must be a document',
@@ -24,6 +45,7 @@ class Document(Validator):
             strip_extra=False,
             extra_validator=Missing,
             as_class=BaseDocument,
+            compiled=False,
             **kwargs):
         if not kwargs.setdefault('required', False):
             kwargs.setdefault('default', lambda: {})
@@ -41,6 +63,7 @@ class Document(Validator):
         self.strip_extra = strip_extra
         self.extra_validator = extra_validator
         self.as_class = as_class
+        self.compiled = compiled
 
     def __repr__(self):
         parts = [self.__class__.__name__]
@@ -95,7 +118,7 @@ class Document(Validator):
         return self.as_class(validated)
 
 
-class Array(Validator):
+class Array(_Compilable):
     _msgs = dict(
         Validator._msgs,
         not_arr='Value must be an array')
@@ -104,6 +127,7 @@ class Array(Validator):
             self,
             validator=Missing,
             only_validate=Missing,
+            compiled=False,
             **kwargs):
         kwargs.setdefault('default', list)
         super(Array, self).__init__(**kwargs)
@@ -113,6 +137,7 @@ class Array(Validator):
         elif only_validate is Missing:
             only_validate = [slice(None)]
         self.only_validate = only_validate
+        self.compiled = compiled
 
     def __getitem__(self, name):
         return self.validator
@@ -0,0 +1,251 @@
+"""Profiling of validation, attributing its cost to schema fields.
+
+    with schema.profile(MyDoc.m.schema) as prof:
+        for doc in sample:
+            MyDoc.m.schema.validate(doc)
+    prof.report()
+
+Reads through the class managers are profiled too. While the block is
+active, each validator of the given schema trees is wrapped to count its
+calls and time them, by validator and dotted field path
+(``MyDoc.tags[].name``; ``*`` for extra fields) and by validator class.
+The self time of a validator excludes the time of the validators it
+calls. A validator shared by several fields is reported under each of
+them.
+
+Only validation in the context (thread or task) that entered the block,
+and in copies of it, is recorded; elsewhere the wrappers just call
+through. Compiled validators of the profiled trees run their interpreted
+validators in that context, so the times are those of the interpreted
+code; other compiled validators keep their generated code (and don't
+report the profiled validators they inline).
+"""
+import contextlib
+import contextvars
+import sys
+import threading
+from time import perf_counter
+
+from .base import Missing
+from . import codegen
+from . import compound
+
+# The Profiles whose with block is active in the current context
+_active = contextvars.ContextVar("barin_profiles", default=())
+
+
+class Stats(object):
+    def __init__(self):
+        self.calls = 0
+        self.cumulative = 0.0
+        self.own = 0.0
+
+
+class _Frame(object):
+    """A running profiled call"""
+
+    __slots__ = ("validator", "path", "inner", "calls")
+
+    def __init__(self, validator, path):
+        self.validator = validator
+        self.path = path
+        self.inner = 0.0  # time spent in the profiled validators it calls
+        self.calls = {}  # id(child validator) => number of calls
+
+
+class Profile(object):
+    def __init__(self):
+        self.stats = {}  # (validator, dotted path) => Stats
+        self.classes = {}  # validator class name => Stats
+        self._children = {}  # (id(parent), path) => [(validator, path)]
+        self._root_paths = {}  # id(validator) => path outside a parent
+        self._local = threading.local()
+
+    @property
+    def paths(self):
+        """Stats by dotted path"""
+        result = {}
+        for (validator, path), st in self.stats.items():
+            total = result.setdefault(path, Stats())
+            total.calls += st.calls
+            total.cumulative += st.cumulative
+            total.own += st.own
+        return result
+
+    def _frames(self):
+        local = self._local
+        try:
+            return local.stack, local.active
+        except AttributeError:
+            local.stack, local.active = [], {}
+            return local.stack, local.active
+
+    def _add(self, validator, path, parent):
+        """Record that validator is called at path by parent (a (validator,
+        path) pair or None), after the validators added before for
+        parent"""
+        self.stats[validator, path] = Stats()
+        if parent is None:
+            self._root_paths[id(validator)] = path
+        else:
+            self._root_paths.setdefault(id(validator), path)
+            key = (id(parent[0]), parent[1])
+            self._children.setdefault(key, []).append((validator, path))
+
+    def _path(self, validator, stack):
+        """The path of a call of validator, from the profiled call running
+        it (if any)"""
+        if stack:
+            caller = stack[-1]
+            children = self._children.get(
+                (id(caller.validator), caller.path), ()
+            )
+            paths = [path for child, path in children if child is validator]
+            if paths:
+                # A parent calls the validators of its fields in order, so
+                # the nth call of a validator shared by several fields is
+                # for the nth of them (and the rest for extra fields or
+                # array items, which come last)
+                count = caller.calls.get(id(validator), 0)
+                caller.calls[id(validator)] = count + 1
+                return paths[min(count, len(paths) - 1)]
+        return self._root_paths[id(validator)]
+
+    def wrap(self, validator, validate):
+        """Return validate, recording its calls under the class of
+        validator and its path"""
+        cname = type(validator).__name__
+        class_stats = self.classes.setdefault(cname, Stats())
+
+        def profiled(value, state=None):
+            if self not in _active.get():
+                return validate(value, state)
+            stack, active = self._frames()
+            frame = _Frame(validator, self._path(validator, stack))
+            stack.append(frame)
+            active[cname] = active.get(cname, 0) + 1
+            start = perf_counter()
+            try:
+                return validate(value, state)
+            finally:
+                elapsed = perf_counter() - start
+                own = elapsed - frame.inner
+                stack.pop()
+                if stack:
+                    stack[-1].inner += elapsed
+                active[cname] -= 1
+                path_stats = self.stats[validator, frame.path]
+                path_stats.calls += 1
+                path_stats.cumulative += elapsed
+                path_stats.own += own
+                class_stats.calls += 1
+                class_stats.own += own
+                if not active[cname]:
+                    # Only the outermost call of a (nested) class
+                    class_stats.cumulative += elapsed
+
+        profiled.__name__ = "profiled_validate"
+        return profiled
+
+    def report(self, sort="own", limit=None, file=None):
+        """Print the paths and classes, sorted by sort (own, cumulative
+        or calls)"""
+        if file is None:
+            file = sys.stdout
+        for title, table in (("path", self.paths), ("class", self.classes)):
+            rows = sorted(
+                ((name, st) for name, st in table.items() if st.calls),
+                key=lambda row: getattr(row[1], sort),
+                reverse=True,
+            )
+            if limit is not None:
+                rows = rows[:limit]
+            print(
+                "{:>10} {:>12} {:>12} {:>12}  {}".format(
+                    "calls", "cumulative", "self", "self/call", title
+                ),
+                file=file,
+            )
+            for name, st in rows:
+                print(
+                    "{:>10} {:>12.6f} {:>12.6f} {:>12.9f}  {}".format(
+                        st.calls,
+                        st.cumulative,
+                        st.own,
+                        st.own / st.calls,
+                        name,
+                    ),
+                    file=file,
+                )
+            print(file=file)
+
+
+@contextlib.contextmanager
+def profile(*validators):
+    """Profile the validation of the schema trees of validators in the
+    current context, yielding a Profile"""
+    prof = Profile()
+    patched = {}  # id(validator) => (validator, saved attributes)
+    for root in validators:
+        for validator, path, parent in _walk(root, _root_path(root), None):
+            prof._add(validator, path, parent)
+            if id(validator) in patched:
+                continue
+            saved = dict(
+                (name, validator.__dict__[name])
+                for name in ("validate", "_validate_interpreted")
+                if name in validator.__dict__
+            )
+            patched[id(validator)] = (validator, saved)
+            if isinstance(validator, compound._Compilable):
+                wrapped = prof.wrap(validator, validator._validate_interpreted)
+                validator._validate_interpreted = wrapped
+            else:
+                wrapped = prof.wrap(validator, validator.validate)
+            validator.validate = wrapped
+    active_token = _active.set(_active.get() + (prof,))
+    profiled_token = codegen._profiled.set(
+        codegen._profiled.get() | frozenset(patched)
+    )
+    try:
+        yield prof
+    finally:
+        codegen._profiled.reset(profiled_token)
+        _active.reset(active_token)
+        for validator, saved in patched.values():
+            validator.__dict__.pop("validate", None)
+            validator.__dict__.pop("_validate_interpreted", None)
+            validator.__dict__.update(saved)
+
+
+def _root_path(validator):
+    as_class = getattr(validator, "as_class", None)
+    name = getattr(as_class, "__name__", None)
+    if name is None or name == "Document":
+        name = type(validator).__name__
+    return name
+
+
+def _walk(validator, path, parent, ancestors=()):
+    """Yield (validator, path, parent) for the validators of a tree, the
+    children of each parent in the order it calls them"""
+    if id(validator) in ancestors:
+        return
+    yield validator, path, parent
+    ancestors += (id(validator),)
+    here = (validator, path)
+    if isinstance(validator, compound.Document):
+        for name, fld in validator.fields.items():
+            for item in _walk(fld, path + "." + name, here, ancestors):
+                yield item
+        if validator.extra_validator is not Missing:
+            for item in _walk(
+                validator.extra_validator, path + ".*", here, ancestors
+            ):
+                yield item
+    elif isinstance(validator, compound.Array):
+        if validator.validator is not Missing:
+            for item in _walk(
+                validator.validator, path + "[]", here, ancestors
+            ):
+                yield item
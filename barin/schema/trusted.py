@@ -0,0 +1,76 @@
+"""Loaders for trusted values, which skip validation.
+
+A trusted loader assumes its input is valid. It only does what validation
+would do to a valid value besides checking it: it fills in defaults,
+drops stripped fields, and wraps documents in their ``as_class``.
+"""
+from .base import Missing, Strip
+from . import compound
+
+
+def trusted_loader(validator):
+    """Return a function(value) converting a trusted value the way
+    validator.validate would convert it when valid"""
+    if isinstance(validator, compound.Document):
+        return _document_loader(validator)
+    elif isinstance(validator, compound.Array):
+        return _array_loader(validator)
+    return None
+
+
+def _document_loader(validator):
+    as_class = validator.as_class
+    defaults = []
+    nested = []
+    stripped = []
+    for name, fld in validator.fields.items():
+        if isinstance(fld, Strip):
+            stripped.append(name)
+            continue
+        loader = trusted_loader(fld)
+        if fld.default is not Missing:
+            defaults.append((name, fld, loader))
+        if loader is not None:
+            nested.append((name, loader))
+    if validator.strip_extra:
+        fields = validator.fields
+    else:
+        fields = None
+
+    def load(value):
+        if not isinstance(value, dict):
+            return value
+        if fields is None:
+            result = dict(value)
+        else:
+            result = dict((k, v) for k, v in value.items() if k in fields)
+        for name in stripped:
+            result.pop(name, None)
+        for name, loader in nested:
+            v = result.get(name)
+            if v is not None:
+                result[name] = loader(v)
+        for name, fld, loader in defaults:
+            if name not in result:
+                v = fld._get_default()
+                if loader is not None and v is not None:
+                    v = loader(v)
+                result[name] = v
+        return as_class(result)
+
+    return load
+
+
+def _array_loader(validator):
+    if validator.validator is Missing:
+        return list
+    item_loader = trusted_loader(validator.validator)
+    if item_loader is None:
+        return list
+
+    def load(value):
+        if not isinstance(value, list):
+            return value
+        return [item_loader(v) for v in value]
+
+    return load
@@ -0,0 +1,240 @@
+"""Unit of work: an identity map plus batched, ordered writes.
+
+Within ``with metadata.session():``
+
+- documents loaded through cursors and find_one() are unique per
+  (collection, _id); loading the same document twice returns the same
+  object
+- doc.m.insert(), doc.m.replace(), doc.m.save(), doc.m.delete() and
+  doc.m.update() (without refresh) are queued instead of sent immediately
+- loaded documents which were modified in place are saved on flush,
+  sending only their changes (see barin.diff)
+
+flush() sends one ordered bulk_write per collection. The before_ hooks of
+the queued operations (of the instance operation, e.g. before_save, then
+of the collection operation it becomes, e.g. before_update_one) fire
+just before their bulk_write, the after_ hooks once it succeeded. The
+operations of a collection whose bulk_write fails stay pending. The
+session flushes when the block exits without an exception and discards
+pending operations otherwise. Documents of other Metadata objects are
+neither tracked nor queued.
+"""
+from collections import namedtuple
+from contextvars import ContextVar
+
+import pymongo
+
+from . import diff
+from . import event
+from . import lazy
+from . import partial
+
+_CURRENT = ContextVar("barin_session", default=None)
+
+_Op = namedtuple("_Op", "im hook args kwargs")
+
+_REQUESTS = dict(
+    insert_one=pymongo.InsertOne,
+    delete_one=pymongo.DeleteOne,
+    replace_one=pymongo.ReplaceOne,
+    update_one=pymongo.UpdateOne,
+)
+
+
+def current(metadata=None):
+    """Return the active session (if it belongs to metadata, when given),
+    or None"""
+    sess = _CURRENT.get()
+    if sess is not None and metadata is not None:
+        if sess.metadata is not metadata:
+            return None
+    return sess
+
+
+class Session(object):
+    def __init__(self, metadata):
+        self.metadata = metadata
+        self.identity_map = {}
+        self._ops = {}
+        self._queued = {}
+        self._token = None
+
+    def __repr__(self):
+        return "<Session {} loaded, {} pending>".format(
+            len(self.identity_map), sum(map(len, self._ops.values()))
+        )
+
+    def __enter__(self):
+        self._token = _CURRENT.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        _CURRENT.reset(self._token)
+        self._token = None
+        if exc_type is None:
+            self.flush()
+        else:
+            self.expunge_all()
+
+    def get(self, cls, _id):
+        """Return the loaded instance of cls with the given _id, or None"""
+        key = (cls.m.collection_manager.name, _id)
+        return self.identity_map.get(key)
+
+    def merge(self, manager, obj):
+        """Return the tracked instance with obj's identity, tracking obj
+        if there is none yet"""
+        key = self._key(manager, obj)
+        if key is None:
+            return obj
+        existing = self.identity_map.get(key)
+        if existing is not None:
+            return existing
+        self.identity_map[key] = obj
+        return obj
+
+    def insert(self, im):
+        self._queue(im, "insert")
+
+    def replace(self, im, **kwargs):
+        partial.require_complete(im.instance)
+        self._queue(im, "replace", kwargs=kwargs)
+
+    def save(self, im, **kwargs):
+        self._queue(im, "save", kwargs=kwargs)
+
+    def update(self, im, update_spec, **kwargs):
+        self._queue(im, "update", (update_spec,), kwargs)
+
+    def delete(self, im):
+        self._queue(im, "delete")
+
+    def expunge_all(self):
+        """Forget all loaded documents and pending operations"""
+        self.identity_map.clear()
+        self._ops.clear()
+        self._queued.clear()
+
+    def flush(self):
+        """Send all pending operations, returning the BulkWriteResults"""
+        self._queue_dirty()
+        results = []
+        # The operations of a collection stay pending until its
+        # bulk_write succeeds
+        for coll_mgr, coll_ops in list(self._ops.items()):
+            sent, writes, specs = [], [], []
+            for op in coll_ops:
+                spec = None
+                if op.hook == "save":
+                    spec = diff.update_spec(
+                        op.im.instance,
+                        partial.schema_for(op.im.instance, op.im.schema),
+                    )
+                    if spec == {}:
+                        continue
+                sent.append(op)
+                writes.append(self._write(op, spec))
+                specs.append(spec)
+            if writes:
+                for op, write in zip(sent, writes):
+                    self._call_hooks("before_", op, write)
+                requests = [
+                    _REQUESTS[name](*args, **kwargs)
+                    for name, args, kwargs in writes
+                ]
+                results.append(
+                    coll_mgr.collection.bulk_write(requests, ordered=True)
+                )
+                coll_mgr.invalidate_cache()
+            del self._ops[coll_mgr]
+            for op in coll_ops:
+                self._queued.pop(id(op.im.instance), None)
+            for op, write in zip(sent, writes):
+                self._call_hooks("after_", op, write)
+            for op, spec in zip(sent, specs):
+                self._applied(op, spec)
+        return results
+
+    def _key(self, manager, obj):
+        coll_mgr = getattr(manager, "collection_manager", None)
+        if coll_mgr is None or coll_mgr.metadata is not self.metadata:
+            return None
+        _id = obj.get("_id")
+        if _id is None:
+            return None
+        try:
+            hash(_id)
+        except TypeError:
+            return None
+        return (coll_mgr.name, _id)
+
+    def _queue(self, im, hook, args=(), kwargs=None):
+        queued = self._queued.setdefault(id(im.instance), set())
+        if hook in ("replace", "save") and queued & {"insert", "replace"}:
+            # The pending write already sends the current state
+            return
+        queued.add(hook)
+        op = _Op(im, hook, args, kwargs or {})
+        self._ops.setdefault(im.collection_manager, []).append(op)
+
+    def _queue_dirty(self):
+        for key, obj in list(self.identity_map.items()):
+            if diff.stored(obj) is None:
+                continue
+            if self._queued.get(id(obj), set()) - {"update"}:
+                continue
+            # Also save the changes made in place to updated documents
+            self._queue(obj.m, "save")
+
+    def _write(self, op, spec=None):
+        """Return the collection operation (name, args, kwargs) of op"""
+        instance = op.im.instance
+        if op.hook == "insert":
+            return "insert_one", (op.im.adapter(instance),), {}
+        flt = {"_id": instance["_id"]}
+        if op.hook == "delete":
+            return "delete_one", (flt,), {}
+        elif op.hook == "save" and spec is not None:
+            return "update_one", (flt, spec), op.kwargs
+        elif op.hook == "save":
+            kwargs = dict(op.kwargs)
+            kwargs.setdefault("upsert", True)
+            lazy.materialize(instance)
+            return "replace_one", (flt, instance), kwargs
+        elif op.hook == "replace":
+            lazy.materialize(instance)
+            return "replace_one", (flt, instance), op.kwargs
+        else:
+            return "update_one", (flt, op.args[0]), op.kwargs
+
+    def _call_hooks(self, prefix, op, write):
+        """Call the hooks of op and of its collection operation, in the
+        order they fire outside of sessions"""
+        name, args, kwargs = write
+        hooks = op.im.hooks
+        mgr = op.im._manager
+        if prefix == "before_":
+            event._call_hooks(
+                hooks.get(prefix + op.hook, ()), op.im, op.args, op.kwargs
+            )
+            event._call_hooks(hooks.get(prefix + name, ()), mgr, args, kwargs)
+        else:
+            event._call_hooks(hooks.get(prefix + name, ()), mgr, args, kwargs)
+            event._call_hooks(
+                hooks.get(prefix + op.hook, ()), op.im, op.args, op.kwargs
+            )
+
+    def _applied(self, op, spec=None):
+        instance = op.im.instance
+        if spec:
+            diff.commit(instance, spec)
+        elif op.hook in ("insert", "replace", "save"):
+            diff.snapshot(instance)
+        key = self._key(op.im._manager, instance)
+        if key is None:
+            return
+        if op.hook == "delete":
+            self.identity_map.pop(key, None)
+        elif op.hook in ("insert", "replace", "save"):
+            self.identity_map[key] = instance
+
@@ -0,0 +1,142 @@
+from unittest import IsolatedAsyncioTestCase
+
+from unittest.mock import Mock, AsyncMock
+
+from barin import collection, Metadata, Field, diff, event
+
+
+class FakeAsyncCursor(object):
+    def __init__(self, docs):
+        self._it = iter(docs)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._it)
+        except StopIteration:
+            raise StopAsyncIteration()
+
+
+class TestAsync(IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.db = Mock()
+        self.metadata = Metadata()
+        self.MyDoc = collection(
+            self.metadata,
+            "mydoc",
+            Field("_id", int),
+            Field("x", int),
+        )
+        self.metadata.bind_async(self.db)
+        self.coll = self.db.mydoc
+        self.coll.with_options.return_value = self.coll
+        for name in (
+            "find_one",
+            "insert_one",
+            "update_many",
+            "replace_one",
+            "count_documents",
+        ):
+            setattr(self.coll, name, AsyncMock())
+
+    async def test_find_one(self):
+        self.coll.find_one.return_value = {"_id": 1, "x": 5}
+        doc = await self.MyDoc.m.aio.find_one({"_id": 1})
+        self.assertIsInstance(doc, self.MyDoc)
+        self.assertEqual(doc.x, 5)
+
+    async def test_find(self):
+        self.coll.find.return_value = FakeAsyncCursor(
+            [{"_id": 1, "x": 1}, {"_id": 2, "x": 2}]
+        )
+        docs = await self.MyDoc.m.aio.find({"x": {"$gt": 0}}).all()
+        self.assertEqual([d._id for d in docs], [1, 2])
+        self.assertTrue(all(isinstance(d, self.MyDoc) for d in docs))
+
+    async def test_query(self):
+        self.coll.find.return_value = FakeAsyncCursor([{"_id": 1, "x": 1}])
+        q = self.MyDoc.m.query.match({"x": 1}).limit(1)
+        docs = [doc async for doc in q.aio]
+        self.assertEqual(docs, [{"_id": 1, "x": 1}])
+        self.coll.find.assert_called_with(filter={"x": 1}, limit=1)
+
+    async def test_query_cached(self):
+        self.coll.find.return_value = FakeAsyncCursor([{"_id": 1, "x": 1}])
+        q = self.MyDoc.m.query.match({"x": 1}).cached(10)
+        docs = await q.aio.all()
+        self.assertEqual(docs, [{"_id": 1, "x": 1}])
+        self.coll.find.assert_called_with(filter={"x": 1})
+
+    async def test_update_refresh(self):
+        self.coll.find_one_and_update = AsyncMock(
+            return_value={"_id": 1, "x": 2}
+        )
+        doc = self.MyDoc.m.create(_id=1, x=1)
+        await doc.m.aio.update({"$inc": {"x": 1}}, refresh=True)
+        self.assertEqual(doc.x, 2)
+        self.assertEqual(diff.stored(doc), {"_id": 1, "x": 2})
+        self.assertEqual(diff.update_spec(doc), {})
+
+    async def test_query_update_many(self):
+        await self.MyDoc.m.query.match({"x": 1}).aio.update_many(
+            {"$set": {"x": 2}}
+        )
+        self.coll.update_many.assert_awaited_with(
+            {"x": 1}, {"$set": {"x": 2}}
+        )
+
+    async def test_aggregate(self):
+        self.coll.aggregate = AsyncMock(
+            return_value=FakeAsyncCursor([{"_id": 1, "x": 1}])
+        )
+        doc = await self.MyDoc.m.aggregate.match({"x": 1}).aio.first()
+        self.assertIsInstance(doc, self.MyDoc)
+        self.coll.aggregate.assert_awaited_with([{"$match": {"x": 1}}])
+
+    async def test_async_hooks(self):
+        calls = []
+
+        @event.listens_for(self.MyDoc, "before_insert")
+        async def before(im):
+            calls.append(("before", im.instance._id))
+
+        @event.listens_for(self.MyDoc, "after_insert")
+        def after(im):
+            calls.append(("after", im.instance._id))
+
+        doc = self.MyDoc.m.create(_id=1, x=1)
+        await doc.m.aio.insert()
+        self.coll.insert_one.assert_awaited_with({"_id": 1, "x": 1})
+        self.assertEqual(calls, [("before", 1), ("after", 1)])
+
+    async def test_async_hooks_not_sync(self):
+        calls = []
+
+        @event.listens_for(self.MyDoc, "before_insert")
+        async def before(im):
+            calls.append("async")
+
+        sync_db = Mock()
+        sync_db.mydoc.with_options.return_value = sync_db.mydoc
+        self.metadata.bind(sync_db)
+        self.MyDoc.m.create(_id=1, x=1).m.insert()
+        sync_db.mydoc.insert_one.assert_called_with({"_id": 1, "x": 1})
+        self.assertEqual(calls, [])
+        await self.MyDoc.m.create(_id=2, x=2).m.aio.insert()
+        self.assertEqual(calls, ["async"])
+
+    async def test_sync_hook_awaitable(self):
+        async def hook(im):
+            pass
+
+        event.listen(self.MyDoc, "before_insert", lambda im: hook(im))
+        self.metadata.bind(Mock())
+        with self.assertRaises(TypeError):
+            self.MyDoc.m.create(_id=1, x=1).m.insert()
+
+    async def test_replace(self):
+        doc = self.MyDoc.m.create(_id=1, x=1)
+        await doc.m.aio.replace()
+        self.coll.replace_one.assert_awaited_with({"_id": 1}, doc)
@@ -0,0 +1,85 @@
+from unittest import TestCase
+
+from unittest.mock import Mock
+
+import pymongo
+
+from barin import collection, Metadata, Field, backref
+
+
+class TestBackref(TestCase):
+    def setUp(self):
+        self.db = Mock()
+        self.metadata = Metadata()
+        self.Group = collection(
+            self.metadata,
+            "group",
+            Field("_id", int),
+            Field("user_ids", [int], backref=backref("user", "group_ids")),
+        )
+        self.User = collection(
+            self.metadata,
+            "user",
+            Field("_id", int),
+            Field("group_ids", [int]),
+            Field("owner_id", int, default=None),
+        )
+        self.Doc = collection(
+            self.metadata,
+            "doc",
+            Field("_id", int),
+            Field("owner_id", int, backref=backref("user", "owner_id")),
+        )
+        self.metadata.bind(self.db)
+
+    def test_synchronize_m2m(self):
+        group = self.Group.m.create(_id=1, user_ids=[2, 3])
+        group.m.synchronize()
+        self.assertFalse(self.db.user.update_many.called)
+        self.db.user.bulk_write.assert_called_once_with(
+            [
+                pymongo.UpdateMany(
+                    {"group_ids": 1, "_id": {"$nin": [2, 3]}},
+                    {"$pull": {"group_ids": 1}},
+                ),
+                pymongo.UpdateMany(
+                    {"_id": {"$in": [2, 3]}},
+                    {"$addToSet": {"group_ids": 1}},
+                ),
+            ],
+            ordered=True,
+        )
+
+    def test_synchronize_delete(self):
+        group = self.Group.m.create(_id=1, user_ids=[2, 3])
+        group.m.synchronize(isdel=True)
+        self.db.user.bulk_write.assert_called_once_with(
+            [
+                pymongo.UpdateMany(
+                    {"group_ids": 1}, {"$pull": {"group_ids": 1}}
+                )
+            ],
+            ordered=True,
+        )
+
+    def test_synchronize_many(self):
+        groups = [
+            self.Group.m.create(_id=i, user_ids=[i + 1]) for i in range(3)
+        ]
+        docs = [self.Doc.m.create(_id=i, owner_id=i) for i in range(3)]
+        self.Group.m.synchronize_many(groups)
+        self.Doc.m.synchronize_many(docs)
+        self.assertEqual(self.db.user.bulk_write.call_count, 2)
+        args, kwargs = self.db.user.bulk_write.call_args_list[0]
+        self.assertEqual(len(args[0]), 6)
+        args, kwargs = self.db.user.bulk_write.call_args_list[1]
+        self.assertEqual(
+            args[0][:2],
+            [
+                pymongo.UpdateMany(
+                    {"owner_id": 0, "_id": {"$ne": 0}},
+                    {"$set": {"owner_id": None}},
+                ),
+                pymongo.UpdateOne({"_id": 0}, {"$set": {"owner_id": 0}}),
+            ],
+        )
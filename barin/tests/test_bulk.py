@@ -0,0 +1,163 @@
+import contextvars
+import uuid
+from unittest import TestCase
+
+from unittest.mock import Mock
+
+import bson
+from bson.binary import UuidRepresentation
+import pymongo.errors
+
+from barin import collection, Metadata, Field
+from barin import schema as S
+
+
+class TestInsertBulk(TestCase):
+    def setUp(self):
+        self.db = Mock()
+        self.metadata = Metadata()
+        self.MyDoc = collection(
+            self.metadata,
+            "mydoc",
+            Field("_id", int),
+            Field("x", int),
+        )
+        self.metadata.bind(self.db)
+        self.db.mydoc.codec_options = bson.CodecOptions()
+        self.inserted = []
+        self.db.mydoc.insert_many.side_effect = self.insert_many
+
+    def insert_many(self, docs, ordered):
+        docs = [bson.decode(doc.raw) for doc in docs]
+        dups = [i for i, doc in enumerate(docs) if doc["_id"] < 0]
+        if not dups:
+            self.inserted.extend(docs)
+            return
+        stop = dups[0] if ordered else len(docs)
+        ok = [d for i, d in enumerate(docs[:stop]) if i not in dups]
+        self.inserted.extend(ok)
+        raise pymongo.errors.BulkWriteError(
+            {
+                "nInserted": len(ok),
+                "writeErrors": [
+                    {"index": i, "code": 11000}
+                    for i in (dups[:1] if ordered else dups)
+                ],
+            }
+        )
+
+    def docs(self, n, bad=(), dup=()):
+        for i in range(n):
+            if i in bad:
+                yield {"_id": i, "x": "bad"}
+            elif i in dup:
+                yield {"_id": -i, "x": i}
+            else:
+                yield {"_id": i, "x": i}
+
+    def test_chunks_and_batches(self):
+        res = self.MyDoc.m.insert_bulk(
+            self.docs(25), chunk_size=10, max_bytes=100, workers=2
+        )
+        self.assertEqual(res.inserted_count, 25)
+        self.assertEqual(res.errors, [])
+        self.assertEqual(
+            sorted(d["_id"] for d in self.inserted), list(range(25))
+        )
+        # 100 bytes hold 4 of these documents
+        calls = self.db.mydoc.insert_many.call_args_list
+        sizes = [len(c.args[0]) for c in calls]
+        self.assertEqual(max(sizes), 4)
+
+    def test_codec_options(self):
+        Other = collection(
+            self.metadata,
+            "other",
+            Field("_id", int),
+            Field("uid", S.UUID),
+        )
+        opts = bson.CodecOptions(
+            uuid_representation=UuidRepresentation.STANDARD
+        )
+        self.db.other.codec_options = opts
+        uid = uuid.uuid4()
+        res = Other.m.insert_bulk([{"_id": 1, "uid": uid}])
+        self.assertEqual((res.inserted_count, res.errors), (1, []))
+        docs = self.db.other.insert_many.call_args.args[0]
+        self.assertEqual(bson.decode(docs[0].raw, opts)["uid"], uid)
+
+    def test_encoding_errors(self):
+        Other = collection(
+            self.metadata,
+            "other",
+            Field("_id", int),
+            Field("uid", S.UUID(allow_none=True)),
+        )
+        self.db.other.codec_options = bson.CodecOptions()
+        docs = [{"_id": 1, "uid": uuid.uuid4()}, {"_id": 2, "uid": None}]
+        res = Other.m.insert_bulk(docs)
+        self.assertEqual(res.inserted_count, 1)
+        self.assertEqual([e.index for e in res.errors], [0])
+        self.assertIsInstance(res.errors[0].error, ValueError)
+
+    def test_validator_bug_propagates(self):
+        class Broken(S.Validator):
+            def _validate(self, value, state=None):
+                raise TypeError("bug")
+
+        Other = collection(
+            self.metadata,
+            "other",
+            Field("_id", int),
+            Field("y", Broken()),
+        )
+        self.db.other.codec_options = bson.CodecOptions()
+        for workers in (0, 2):
+            with self.assertRaises(TypeError):
+                Other.m.insert_bulk([{"_id": 1, "y": 1}], workers=workers)
+        self.db.other.insert_many.assert_not_called()
+
+    def test_worker_context(self):
+        var = contextvars.ContextVar("var", default=None)
+        seen = set()
+
+        class Recorder(S.Validator):
+            def _validate(self, value, state=None):
+                seen.add(var.get())
+                return value
+
+        Other = collection(
+            self.metadata,
+            "other",
+            Field("_id", int),
+            Field("y", Recorder()),
+        )
+        self.db.other.codec_options = bson.CodecOptions()
+        var.set("caller")
+        docs = [{"_id": i, "y": i} for i in range(10)]
+        res = Other.m.insert_bulk(docs, chunk_size=2, workers=2)
+        self.assertEqual(res.inserted_count, 10)
+        self.assertEqual(seen, {"caller"})
+
+    def test_unordered_errors(self):
+        res = self.MyDoc.m.insert_bulk(
+            self.docs(25, bad=(3, 17), dup=(12,)), chunk_size=10
+        )
+        self.assertEqual(res.inserted_count, 22)
+        self.assertEqual([e.index for e in res.errors], [3, 12, 17])
+        self.assertEqual(res.errors[1].error["code"], 11000)
+
+    def test_ordered_stops(self):
+        res = self.MyDoc.m.insert_bulk(
+            self.docs(25, bad=(13,)), chunk_size=10, ordered=True
+        )
+        self.assertEqual(res.inserted_count, 13)
+        self.assertEqual([e.index for e in res.errors], [13])
+        self.assertEqual([d["_id"] for d in self.inserted], list(range(13)))
+
+    def test_ordered_write_error(self):
+        res = self.MyDoc.m.insert_bulk(
+            self.docs(25, dup=(5,)), chunk_size=10, ordered=True
+        )
+        self.assertEqual(res.inserted_count, 5)
+        self.assertEqual([e.index for e in res.errors], [5])
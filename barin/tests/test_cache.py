@@ -0,0 +1,196 @@
+from unittest import TestCase
+
+from unittest.mock import Mock
+
+import bson
+import pymongo.errors
+from bson.raw_bson import RawBSONDocument
+
+from barin import collection, Metadata, Field
+from barin.cache import ResultCache
+
+
+def raw(doc):
+    return RawBSONDocument(bson.encode(doc))
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class TestResultCache(TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.cache = ResultCache(
+            ttl=10, max_entries=2, max_bytes=100, clock=self.clock
+        )
+
+    def test_ttl(self):
+        self.cache.put(b"k", [b"x"])
+        self.assertEqual(self.cache.get(b"k"), [b"x"])
+        self.clock.now = 10
+        self.assertIsNone(self.cache.get(b"k"))
+        self.assertEqual(self.cache.stats()["hits"], 1)
+        self.assertEqual(self.cache.stats()["misses"], 1)
+        self.assertEqual(self.cache.nbytes, 0)
+
+    def test_lru(self):
+        self.cache.put(b"a", [])
+        self.cache.put(b"b", [])
+        self.cache.get(b"a")
+        self.cache.put(b"c", [])
+        self.assertIsNone(self.cache.get(b"b"))
+        self.assertEqual(self.cache.get(b"a"), [])
+        self.assertEqual(self.cache.evictions, 1)
+
+    def test_max_bytes(self):
+        self.assertFalse(self.cache.put(b"big", [b"x" * 100]))
+        self.cache.put(b"a", [b"x" * 70])
+        self.cache.put(b"b", [b"x" * 30])
+        self.assertIsNone(self.cache.get(b"a"))
+        self.assertEqual(self.cache.nbytes, 31)
+
+    def test_stale_fill(self):
+        docs = self.cache.fill(b"k", iter([raw({"a": 1})]))
+        next(docs)
+        self.cache.invalidate()
+        list(docs)
+        self.assertIsNone(self.cache.get(b"k"))
+
+
+class TestCachedReads(TestCase):
+    def setUp(self):
+        self.db = Mock()
+        self.metadata = Metadata()
+        self.Country = collection(
+            self.metadata,
+            "country",
+            Field("_id", str),
+            Field("name", str),
+            cache=True,
+        )
+        self.MyDoc = collection(
+            self.metadata,
+            "mydoc",
+            Field("_id", int),
+        )
+        self.metadata.bind(self.db)
+        # raw_collection() views, which return RawBSONDocuments
+        self.raw = {}
+        for name in ("country", "mydoc"):
+            coll = getattr(self.db, name)
+            coll.codec_options = bson.CodecOptions()
+            coll.with_options.return_value = self.raw[name] = Mock()
+
+    def test_get(self):
+        fr = raw({"_id": "fr", "name": "F"})
+        self.raw["country"].find_one.return_value = fr
+        c1 = self.Country.m.get(_id="fr")
+        c2 = self.Country.m.get(_id="fr")
+        self.assertEqual(c1, c2)
+        self.assertIsNot(c1, c2)
+        self.assertIsInstance(c2, self.Country)
+        self.raw["country"].find_one.assert_called_once_with({"_id": "fr"})
+        stats = self.Country.m.collection_manager.cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+
+    def test_miss_none(self):
+        self.raw["country"].find_one.return_value = None
+        self.assertIsNone(self.Country.m.get(_id="xx"))
+        self.assertIsNone(self.Country.m.get(_id="xx"))
+        self.raw["country"].find_one.assert_called_once()
+
+    def test_invalidate_on_write(self):
+        fr = raw({"_id": "fr", "name": "F"})
+        self.raw["country"].find_one.return_value = fr
+        c = self.Country.m.get(_id="fr")
+        c.m.update({"$set": {"name": "G"}})
+        self.Country.m.get(_id="fr")
+        self.assertEqual(self.raw["country"].find_one.call_count, 2)
+        self.Country.m.query.match({"_id": "fr"}).delete_many()
+        self.Country.m.get(_id="fr")
+        self.assertEqual(self.raw["country"].find_one.call_count, 3)
+
+    def test_query(self):
+        self.raw["country"].find.side_effect = lambda *a, **kw: iter(
+            [raw({"_id": "fr", "name": "F"}), raw({"_id": "de", "name": "D"})]
+        )
+        q = self.Country.m.query.match({"name": {"$gt": "A"}}).sort("name")
+        self.assertEqual([c._id for c in q], ["fr", "de"])
+        self.assertEqual([c._id for c in q.lazy()], ["fr", "de"])
+        self.raw["country"].find.assert_called_once_with(
+            filter={"name": {"$gt": "A"}}, sort=[("name", 1)]
+        )
+        self.db.country.find.return_value = iter([{"_id": "fr", "name": "F"}])
+        self.assertEqual(len(q.cached(False).all()), 1)
+
+    def test_cursor_chaining(self):
+        self.raw["country"].find.side_effect = lambda *a, **kw: iter(
+            [raw({"_id": "fr", "name": "F"})]
+        )
+        cursor = self.Country.m.find({}).sort("name").skip(1).limit(2)
+        self.assertEqual([c._id for c in cursor], ["fr"])
+        self.Country.m.find({}).sort("name").skip(1).limit(2).all()
+        self.raw["country"].find.assert_called_once_with(
+            {}, sort=[("name", 1)], skip=1, limit=2
+        )
+        self.Country.m.find({}).sort("name", -1).all()
+        self.raw["country"].find.assert_called_with({}, sort=[("name", -1)])
+
+    def test_cursor_started(self):
+        self.raw["country"].find.return_value = iter(
+            [raw({"_id": "fr", "name": "F"}), raw({"_id": "de", "name": "D"})]
+        )
+        cursor = self.Country.m.find({})
+        next(cursor)
+        with self.assertRaises(pymongo.errors.InvalidOperation):
+            cursor.limit(1)
+
+    def test_cursor_bypass(self):
+        docs = [{"_id": "fr", "name": "F"}]
+        pymongo_cursor = Mock()
+        pymongo_cursor.__next__ = Mock(side_effect=iter(docs).__next__)
+        self.db.country.find.return_value = pymongo_cursor
+        cursor = self.Country.m.find({})
+        cursor.batch_size(10)
+        cursor.hint("name_1")
+        self.assertEqual([c._id for c in cursor], ["fr"])
+        self.db.country.find.assert_called_once_with({})
+        pymongo_cursor.batch_size.assert_called_once_with(10)
+        pymongo_cursor.hint.assert_called_once_with("name_1")
+        self.raw["country"].find.assert_not_called()
+        with self.assertRaises(AttributeError):
+            self.Country.m.find({}).no_such_method
+
+    def test_out_invalidates(self):
+        self.raw["country"].find_one.return_value = raw(
+            {"_id": "fr", "name": "F"}
+        )
+        self.Country.m.get(_id="fr")
+        self.db.mydoc.aggregate.return_value = iter([])
+        self.MyDoc.m.aggregate.match({}).out("country")
+        self.Country.m.get(_id="fr")
+        self.assertEqual(self.raw["country"].find_one.call_count, 2)
+
+    def test_query_count(self):
+        self.db.country.count_documents.return_value = 2
+        q = self.Country.m.query.match({"name": "F"})
+        self.assertEqual(q.count(), 2)
+        self.db.country.count_documents.assert_called_once_with(
+            filter={"name": "F"}
+        )
+
+    def test_query_cached(self):
+        self.db.mydoc.find.side_effect = lambda *a, **kw: iter([{"_id": 1}])
+        self.raw["mydoc"].find.return_value = iter([raw({"_id": 1})])
+        q = self.MyDoc.m.query.match({"_id": 1})
+        q.all()
+        q.all()
+        self.assertEqual(self.db.mydoc.find.call_count, 2)
+        q.cached(ttl=5).all()
+        self.assertEqual(q.cached(ttl=5).all(), [{"_id": 1}])
+        self.raw["mydoc"].find.assert_called_once()
@@ -2,9 +2,11 @@ from unittest import TestCase
 
 from unittest.mock import Mock
 
+import bson
 import pymongo
 
 from barin import collection, subdocument, Metadata, Field, Index
+from barin import lazy
 from barin import schema as S
 
 
@@ -127,3 +129,70 @@ class TestSubdocNone(TestCase):
 
     def test_can_create(self):
         self.doc = self.MyDoc.m.create()
+
+
+class TestLazy(TestCase):
+    def setUp(self):
+        self.db = Mock()
+        self.metadata = Metadata()
+        subdoc = subdocument(self.metadata, "subdoc", Field("x", int))
+        self.MyDoc = collection(
+            self.metadata,
+            "mydoc",
+            Field("_id", int),
+            Field("x", int),
+            Field("y", int, default=10),
+            Field("sub", subdoc),
+        )
+        self.metadata.bind(self.db)
+        self.db.mydoc.with_options.return_value = self.db.mydoc
+        raw = bson.raw_bson.RawBSONDocument(
+            bson.encode({"_id": 0, "x": "bad", "sub": {"x": 1}})
+        )
+        self.db.mydoc.find.return_value = iter([raw])
+
+    def test_find_lazy(self):
+        doc = self.MyDoc.m.find({}, lazy=True).first()
+        self.assertIsInstance(doc, self.MyDoc)
+        self.assertEqual(doc._id, 0)
+        self.assertEqual(doc.sub.x, 1)
+        self.assertEqual(doc.y, 10)
+        with self.assertRaises(S.Invalid):
+            doc.x
+        self.assertTrue(self.db.mydoc.with_options.called)
+
+    def test_lazy_field_names(self):
+        doc = {
+            "s": "abc",
+            "f": 1.5,
+            "d": {"a": [1, 2]},
+            "b": bson.Binary(b"xyz", 4),
+            "o": bson.ObjectId(),
+            "t": True,
+            "n": None,
+            "i": 1,
+            "l": bson.Int64(2),
+            "r": bson.Regex("a.*", "i"),
+            "c": bson.Code("f()", {"x": 1}),
+            "ts": bson.Timestamp(1, 2),
+            "dec": bson.Decimal128("1.5"),
+            "min": bson.MinKey(),
+        }
+        names = lazy.field_names(bson.encode(doc))
+        self.assertEqual(names, list(doc))
+
+    def test_query_lazy(self):
+        doc = self.MyDoc.m.query.lazy().first()
+        self.assertEqual(doc["_id"], 0)
+        doc.x = 5
+        self.assertEqual(
+            dict(doc), {"_id": 0, "x": 5, "y": 10, "sub": {"x": 1}}
+        )
+        self.assertEqual(list(doc), ["_id", "x", "y", "sub"])
+
+    def test_replace_lazy(self):
+        doc = self.MyDoc.m.query.lazy().first()
+        doc.x = 5
+        doc.m.replace()
+        args, kwargs = self.db.mydoc.replace_one.call_args
+        self.assertEqual(dict.__len__(args[1]), 4)
@@ -1,9 +1,8 @@
-import re
 from unittest import TestCase
 
 from unittest.mock import Mock
 
-from barin import collection, derived, Metadata, Field
+from barin import collection, cmap, derived, Metadata, Field, errors
 
 
 class TestDerived(TestCase):
@@ -42,9 +41,57 @@ class TestDerived(TestCase):
     def test_query_derived(self):
         self.assertEqual(
             self.Derived.m.query._compile_query(),
-            {"filter": {"disc": re.compile("^derived")}},
+            {"filter": {"disc": {"$eq": "derived"}}},
         )
 
+    def test_query_derived_subclasses(self):
+        Sub = derived(self.Derived, "derived.sub")
+        self.assertEqual(
+            self.Derived.m.query._compile_query(),
+            {"filter": {"disc": {"$in": ["derived", "derived.sub"]}}},
+        )
+        self.assertEqual(
+            Sub.m.aggregate.pipeline,
+            [{"$match": {"disc": {"$eq": "derived.sub"}}}],
+        )
+
+    def test_query_cmapped_subclasses(self):
+        @cmap(self.Derived)
+        class Mapped(object):
+            pass
+
+        derived(self.Derived, "derived.sub")
+        derived(Mapped, "derived.sub2")
+        self.assertEqual(
+            Mapped.m.query._compile_query(),
+            {
+                "filter": {
+                    "disc": {
+                        "$in": ["derived", "derived.sub", "derived.sub2"]
+                    }
+                }
+            },
+        )
+
+    def test_discriminator_index(self):
+        Poly = collection(
+            self.metadata,
+            "poly",
+            Field("_id", int),
+            Field("disc", str),
+            polymorphic_discriminator="disc",
+            discriminator_index=["created"],
+        )
+        (index,) = Poly.m.indexes
+        self.assertEqual(index.arg, [("disc", 1), ("created", 1)])
+        with self.assertRaises(errors.SchemaError):
+            collection(
+                self.metadata,
+                "nopoly",
+                Field("_id", int),
+                discriminator_index=True,
+            )
+
     def test_poly_query(self):
         self.db.mydoc.find.return_value = iter([self.Derived.m.create(_id=1)])
         res = self.Base.m.query.one()
@@ -55,3 +102,18 @@ class TestDerived(TestCase):
         self.assertEqual(self.Derived.m.schema.strip_extra, False)
         self.assertEqual(self.Derived2.m.schema.allow_extra, True)
         self.assertEqual(self.Derived2.m.schema.strip_extra, False)
+
+    def test_adapter_sees_new_registrations(self):
+        adapter = self.Base.m.read_adapter()
+        self.assertEqual(type(adapter({"_id": 1, "disc": "late"})), self.Base)
+        Late = derived(self.Base, "late")
+        self.assertIs(self.Base.m.registry.by_class(Late).cls, Late)
+        self.assertEqual(type(adapter({"_id": 1, "disc": "late"})), Late)
+
+    def test_adapt_many(self):
+        adapter = self.Base.m.read_adapter()
+        docs = adapter.many(
+            [{"_id": 1, "disc": "derived", "x": 1}, {"_id": 2}]
+        )
+        self.assertEqual([type(d) for d in docs], [self.Derived, self.Base])
+        self.assertEqual(docs[1].disc, "base")
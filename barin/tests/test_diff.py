@@ -0,0 +1,191 @@
+import uuid
+from unittest import TestCase
+
+from unittest.mock import Mock
+
+import bson
+from bson.raw_bson import RawBSONDocument
+
+from barin import collection, Metadata, Field, diff
+from barin import schema as S
+
+
+class TestSave(TestCase):
+    def setUp(self):
+        self.db = Mock()
+        self.metadata = Metadata()
+        self.MyDoc = collection(
+            self.metadata,
+            "mydoc",
+            Field("_id", int),
+            Field("x", int),
+            Field("tags", [str]),
+            Field("sub", {"a": int, "b": {"c": int}}),
+            Field("opt", S.Anything(required=False)),
+        )
+        self.metadata.bind(self.db)
+        self.db.mydoc.with_options.return_value = self.db.mydoc
+
+    def load(self, lazy=False):
+        doc = {
+            "_id": 1,
+            "x": 1,
+            "tags": ["a"],
+            "sub": {"a": 1, "b": {"c": 1}},
+            "opt": 1,
+        }
+        if lazy:
+            doc = RawBSONDocument(bson.encode(doc))
+        self.db.mydoc.find.return_value = iter([doc])
+        return self.MyDoc.m.find(lazy=lazy).first()
+
+    def test_unchanged(self):
+        doc = self.load()
+        self.assertIsNone(doc.m.save())
+        self.db.mydoc.update_one.assert_not_called()
+
+    def test_minimal_update(self):
+        doc = self.load()
+        doc.x = 2
+        doc.tags.append("b")
+        doc.sub.b["c"] = 2
+        del doc["opt"]
+        doc.m.save()
+        self.db.mydoc.update_one.assert_called_once_with(
+            {"_id": 1},
+            {
+                "$set": {"x": 2, "sub.b.c": 2},
+                "$unset": {"opt": ""},
+                "$push": {"tags": {"$each": ["b"]}},
+            },
+        )
+        doc.m.save()
+        self.db.mydoc.update_one.assert_called_once()
+
+    def test_lazy(self):
+        doc = self.load(lazy=True)
+        doc.sub["a"] = 5
+        doc.m.save()
+        self.db.mydoc.update_one.assert_called_once_with(
+            {"_id": 1}, {"$set": {"sub.a": 5}}
+        )
+
+    def test_validates_changed(self):
+        doc = self.load()
+        doc["x"] = 2
+        doc.m.save()
+        self.assertEqual(doc.x, 2)
+        self.db.mydoc.update_one.assert_called_once_with(
+            {"_id": 1}, {"$set": {"x": 2}}
+        )
+        doc["x"] = "foo"
+        with self.assertRaises(S.Invalid):
+            doc.m.save()
+        del doc["x"]
+        with self.assertRaises(S.Invalid):
+            doc.m.save()
+
+    def test_new_document(self):
+        doc = self.MyDoc.m.create(
+            _id=1, x=1, tags=[], sub={"a": 1, "b": {"c": 1}}, opt=1
+        )
+        doc.m.save()
+        self.db.mydoc.replace_one.assert_called_once_with(
+            {"_id": 1}, doc, upsert=True
+        )
+        doc.x = 3
+        doc.m.save()
+        self.db.mydoc.update_one.assert_called_once_with(
+            {"_id": 1}, {"$set": {"x": 3}}
+        )
+
+    def test_new_document_uuid(self):
+        Other = collection(
+            self.metadata,
+            "other",
+            Field("_id", int),
+            Field("uid", S.UUID),
+        )
+        doc = Other.m.create(_id=1, uid=uuid.uuid4())
+        doc.m.save()
+        self.db.other.replace_one.assert_called_once_with(
+            {"_id": 1}, doc, upsert=True
+        )
+        self.assertEqual(diff.stored(doc), {"_id": 1, "uid": doc.uid})
+        self.assertEqual(diff.update_spec(doc), {})
+
+    def test_converted_unchanged(self):
+        Other = collection(
+            self.metadata,
+            "other",
+            Field("_id", int),
+            Field("f", float),
+            Field("uid", S.UUID),
+        )
+        self.db.other.with_options.return_value = self.db.other
+        uid = uuid.uuid4()
+        self.db.other.find.return_value = iter(
+            [{"_id": 1, "f": 1, "uid": bson.Binary(uid.bytes, 4)}]
+        )
+        doc = Other.m.find().first()
+        self.assertEqual(doc.uid, uid)
+        self.assertIsNone(doc.m.save())
+        self.db.other.update_one.assert_not_called()
+        doc.f = 2.0
+        doc.m.save()
+        self.db.other.update_one.assert_called_once_with(
+            {"_id": 1}, {"$set": {"f": 2.0}}
+        )
+
+    def test_anything_in_place(self):
+        self.db.mydoc.find.return_value = iter(
+            [
+                {
+                    "_id": 1,
+                    "x": 1,
+                    "tags": [],
+                    "sub": {"a": 1, "b": {"c": 1}},
+                    "opt": {"k": [1]},
+                }
+            ]
+        )
+        doc = self.MyDoc.m.find().first()
+        self.assertIsNone(doc.m.save())
+        self.db.mydoc.update_one.assert_not_called()
+        doc.opt["k"].append(2)
+        doc.opt["j"] = 1
+        doc.m.save()
+        self.db.mydoc.update_one.assert_called_once_with(
+            {"_id": 1},
+            {"$set": {"opt.j": 1}, "$push": {"opt.k": {"$each": [2]}}},
+        )
+
+
+class TestDiff(TestCase):
+    def spec(self, old, new):
+        obj = dict(new)
+        return diff.update_spec(diff.track(_Doc(obj), old))
+
+    def test_shrunk_list(self):
+        self.assertEqual(
+            self.spec({"l": [1, 2]}, {"l": [1]}), {"$set": {"l": [1]}}
+        )
+
+    def test_dotted_keys(self):
+        self.assertEqual(
+            self.spec({"d": {"a.b": 1}}, {"d": {"a.b": 2}}),
+            {"$set": {"d": {"a.b": 2}}},
+        )
+
+    def test_shared_mutable(self):
+        sub = {"a": 1}
+        self.assertEqual(
+            self.spec({"d": sub}, {"d": sub}), {"$set": {"d": sub}}
+        )
+
+    def test_type_change(self):
+        self.assertEqual(self.spec({"n": 1}, {"n": 1.0}), {"$set": {"n": 1.0}})
+
+
+class _Doc(dict):
+    pass
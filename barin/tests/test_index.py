@@ -0,0 +1,96 @@
+from unittest import TestCase
+
+from unittest.mock import Mock
+
+import pymongo.errors
+from bson.son import SON
+
+from barin import collection, Metadata, Field, Index
+
+
+def info(name, key, **options):
+    return dict(name=name, key=SON(key), v=2, **options)
+
+
+class TestEnsureIndexes(TestCase):
+    def setUp(self):
+        self.db = Mock()
+        self.metadata = Metadata()
+        self.A = collection(
+            self.metadata,
+            "a",
+            Field("_id", int),
+            Field("x", int),
+            Field("y", int),
+            Field("title", str),
+            Index("x"),
+            Index([("x", 1), ("y", -1)], unique=True),
+            Index([("title", "text")]),
+        )
+        self.B = collection(
+            self.metadata,
+            "b",
+            Field("_id", int),
+            Field("x", int),
+            Index("x", collation={"locale": "fr"}),
+        )
+        self.metadata.bind(self.db)
+        self.db.a.list_indexes.return_value = [
+            info("_id_", [("_id", 1)]),
+            info("x_1", [("x", 1)]),
+            info("x_1_y_-1", [("x", 1), ("y", -1)]),
+            info("old", [("z", 1)]),
+        ]
+        self.db.b.list_indexes.return_value = [
+            info(
+                "x_1",
+                [("x", 1)],
+                collation={"locale": "fr", "strength": 3},
+            ),
+        ]
+
+    def test_report(self):
+        report = self.metadata.ensure_indexes()
+        self.assertEqual(
+            [(c, i.arg) for c, i in report.created],
+            [("a", [("title", "text")])],
+        )
+        self.assertEqual(
+            [(c, i.arg) for c, i in report.unchanged],
+            [("a", [("x", 1)]), ("b", [("x", 1)])],
+        )
+        ((name, index, existing),) = report.conflicting
+        self.assertEqual(existing["name"], "x_1_y_-1")
+        self.assertEqual([i["name"] for c, i in report.extraneous], ["old"])
+        (models,) = self.db.a.create_indexes.call_args[0]
+        self.assertEqual(models[0].document["key"], SON([("title", "text")]))
+        self.db.b.create_indexes.assert_not_called()
+        self.db.a.drop_index.assert_not_called()
+
+    def test_dry_run_drop_unknown(self):
+        report = self.metadata.ensure_indexes(dry_run=True, drop_unknown=True)
+        self.assertEqual(len(report.created), 1)
+        self.assertEqual([i["name"] for c, i in report.dropped], ["old"])
+        self.db.a.create_indexes.assert_not_called()
+        self.db.a.drop_index.assert_not_called()
+        self.metadata.ensure_indexes(drop_unknown=True)
+        self.db.a.drop_index.assert_called_once_with("old")
+
+    def test_text_index_exists(self):
+        self.db.a.list_indexes.return_value.append(
+            info(
+                "title_text",
+                [("_fts", "text"), ("_ftsx", 1)],
+                weights={"title": 1},
+            )
+        )
+        report = self.metadata.ensure_indexes()
+        self.assertEqual(report.created, [])
+
+    def test_errors(self):
+        self.db.b.list_indexes.side_effect = pymongo.errors.OperationFailure(
+            "denied"
+        )
+        report = self.metadata.ensure_indexes()
+        self.assertEqual([c for c, e in report.errors], ["b"])
+        self.assertEqual(len(report.unchanged), 1)
@@ -0,0 +1,137 @@
+from unittest import TestCase
+
+import bson
+from bson.codec_options import DEFAULT_CODEC_OPTIONS
+from bson.raw_bson import RawBSONDocument
+from unittest.mock import Mock
+
+from barin import collection, Metadata, Field
+from barin import instrument
+
+
+def raw(doc):
+    return RawBSONDocument(bson.encode(doc))
+
+
+class TestHistogramCollector(TestCase):
+    def test_buckets(self):
+        c = instrument.HistogramCollector()
+        c.observe("mydoc", "find", "server_seconds", 0.002)
+        c.observe("mydoc", "find", "server_seconds", 2.0)
+        c.observe("mydoc", "find", "documents", 10)
+        hist = c.histogram("mydoc", "find", "server_seconds")
+        self.assertEqual(hist.count, 2)
+        self.assertEqual(hist.counts[3], 1)
+        self.assertEqual(hist.counts[9], 1)
+        hist = c.histogram("mydoc", "find", "documents")
+        self.assertEqual(hist.counts[2], 1)
+
+    def test_prometheus(self):
+        c = instrument.HistogramCollector()
+        c.observe("mydoc", "find", "documents", 10)
+        text = c.prometheus()
+        self.assertIn("# TYPE barin_documents histogram\n", text)
+        self.assertIn(
+            'barin_documents_bucket{collection="mydoc",operation="find",'
+            'le="16"} 1\n',
+            text,
+        )
+        self.assertIn(
+            'barin_documents_count{collection="mydoc",operation="find"} 1\n',
+            text,
+        )
+
+    def test_statsd(self):
+        lines = []
+        c = instrument.StatsdCollector(lines.append)
+        c.observe("mydoc", "find", "server_seconds", 0.0015)
+        c.observe("mydoc", "find", "bytes", 120)
+        self.assertEqual(
+            lines,
+            [
+                "barin.mydoc.find.server:1.500|ms",
+                "barin.mydoc.find.bytes:120|c",
+            ],
+        )
+
+
+class TestInstrument(TestCase):
+    def setUp(self):
+        self.db = Mock()
+        self.metadata = Metadata()
+        self.MyDoc = collection(
+            self.metadata,
+            "mydoc",
+            Field("_id", int),
+            Field("x", int),
+        )
+        self.metadata.bind(self.db)
+        self.db.mydoc.with_options.return_value = self.db.mydoc
+        self.db.mydoc.codec_options = DEFAULT_CODEC_OPTIONS
+        self.collector = self.metadata.instrument()
+
+    def hist(self, operation, name):
+        return self.collector.histogram("mydoc", operation, name)
+
+    def test_find(self):
+        docs = [raw({"_id": i, "x": i}) for i in range(3)]
+        self.db.mydoc.find.return_value = iter(docs)
+        result = self.MyDoc.m.find().all()
+        self.assertEqual([d.x for d in result], [0, 1, 2])
+        self.assertIsInstance(result[0], self.MyDoc)
+        for name in ("server_seconds", "decode_seconds", "adapt_seconds"):
+            self.assertEqual(self.hist("find", name).count, 1)
+        self.assertEqual(self.hist("find", "documents").sum, 3)
+        self.assertEqual(
+            self.hist("find", "bytes").sum,
+            sum(len(doc.raw) for doc in docs),
+        )
+
+    def test_query_batches(self):
+        self.db.mydoc.find.return_value = iter(
+            [{"_id": i, "x": i} for i in range(5)]
+        )
+        batches = list(self.MyDoc.m.query.match({"x": 1}).batches(2))
+        self.assertEqual([len(b) for b in batches], [2, 2, 1])
+        self.assertEqual(self.hist("find", "documents").sum, 5)
+
+    def test_cursor_close(self):
+        self.db.mydoc.find.return_value = pymongo_cursor = Mock()
+        pymongo_cursor.__iter__ = Mock(
+            return_value=iter([{"_id": 1, "x": 1}, {"_id": 2, "x": 2}])
+        )
+        cursor = self.MyDoc.m.find()
+        next(cursor)
+        self.assertIsNone(self.hist("find", "documents"))
+        cursor.close()
+        self.assertEqual(self.hist("find", "documents").sum, 1)
+        pymongo_cursor.close.assert_called_once_with()
+
+    def test_find_one(self):
+        self.db.mydoc.find_one.return_value = raw({"_id": 1, "x": 1})
+        doc = self.MyDoc.m.find_one({"_id": 1})
+        self.assertEqual(doc.x, 1)
+        for name in ("server_seconds", "decode_seconds", "adapt_seconds"):
+            self.assertEqual(self.hist("find_one", name).count, 1)
+        self.assertEqual(self.hist("find_one", "documents").sum, 1)
+
+    def test_writes(self):
+        self.MyDoc.m.insert_one(self.MyDoc(_id=1, x=1))
+        self.MyDoc.m.query.match({"x": 1}).update_many({"$set": {"x": 2}})
+        self.assertEqual(self.hist("insert_one", "server_seconds").count, 1)
+        self.assertEqual(self.hist("insert_one", "adapt_seconds").count, 1)
+        self.assertEqual(self.hist("update_many", "server_seconds").count, 1)
+
+    def test_aggregate(self):
+        self.db.mydoc.aggregate.return_value = iter(
+            [{"_id": 1, "x": 1}]
+        )
+        result = self.MyDoc.m.aggregate.match({"x": 1}).all()
+        self.assertEqual(len(result), 1)
+        self.assertEqual(self.hist("aggregate", "documents").sum, 1)
+
+    def test_disabled(self):
+        self.metadata.collector = None
+        self.db.mydoc.find.return_value = iter([{"_id": 1, "x": 1}])
+        self.MyDoc.m.find().all()
+        self.assertEqual(self.collector.histograms, {})
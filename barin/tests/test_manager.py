@@ -1,6 +1,8 @@
 from unittest import TestCase
 
-from barin import field, subdocument, metadata
+from unittest.mock import Mock
+
+from barin import field, subdocument, collection, cmap, metadata
 
 
 class TestSubdocumentManager(TestCase):
@@ -15,3 +17,36 @@ class TestSubdocumentManager(TestCase):
         self.assertFalse(hasattr(self.Doc.m, 'find'))
 
 
+class TestClassManagerCache(TestCase):
+
+    def setUp(self):
+        self.metadata = metadata.Metadata()
+        self.Doc = collection(
+            self.metadata, 'doc',
+            field.Field('_id', int),
+            field.Field('x', int))
+
+    def test_class_manager_cached(self):
+        self.assertIs(self.Doc.m, self.Doc.m)
+        self.assertIs(self.Doc.m.query, self.Doc.m.query)
+
+    def test_instance_manager(self):
+        doc = self.Doc.m.create(_id=1, x=2)
+        self.assertIs(doc.m.instance, doc)
+        self.assertIs(doc.m._manager, self.Doc.m)
+
+    def test_cmap_resets_cache(self):
+        cm = self.Doc.m
+
+        @cmap(self.Doc)
+        class Doc(object):
+            pass
+
+        self.assertIsNot(self.Doc.m, cm)
+        self.assertIs(self.Doc.m.query.real_class(), Doc)
+
+    def test_bind_after_access(self):
+        agg = self.Doc.m.aggregate
+        db = Mock()
+        self.metadata.bind(db)
+        self.assertIs(agg.collection, db.doc)
@@ -1,3 +1,4 @@
+import re
 from unittest import TestCase
 
 from barin import collection, Metadata, Field
@@ -134,3 +135,119 @@ class TestMQL(TestCase):
         self.assertEqual(
             {'$comment': 'foo'},
             mql.comment('foo'))
+
+
+class TestMatcher(TestCase):
+
+    def setUp(self):
+        self.metadata = Metadata()
+        self.MyDoc = collection(
+            self.metadata, 'mydoc',
+            Field('x', None),
+            Field('tags', [str]),
+            Field('sub', None))
+
+    def assertMatches(self, flt, doc, expected=True):
+        self.assertEqual(
+            mql.compile_matcher(flt)(doc), expected,
+            '{} on {}'.format(flt, doc))
+
+    def test_eq(self):
+        self.assertMatches(self.MyDoc.x == 5, {'x': 5})
+        self.assertMatches(self.MyDoc.x == 5, {'x': 5.0})
+        self.assertMatches(self.MyDoc.x == 5, {'x': 6}, False)
+        self.assertMatches({'x': 1}, {'x': True}, False)
+        self.assertMatches({'x': {'$eq': [1, 2]}}, {'x': [1, 2]})
+        self.assertMatches({'x': {'a': 1, 'b': 2}}, {'x': {'b': 2, 'a': 1}},
+                           False)
+
+    def test_null(self):
+        self.assertMatches({'x': None}, {})
+        self.assertMatches({'x': None}, {'x': None})
+        self.assertMatches({'x': None}, {'x': 0}, False)
+        self.assertMatches({'x': {'$ne': None}}, {}, False)
+        self.assertMatches({'x': {'$gte': None}}, {})
+        self.assertMatches({'x': {'$gt': None}}, {'x': 1}, False)
+
+    def test_arrays(self):
+        self.assertMatches(self.MyDoc.tags == 'a', {'tags': ['a', 'b']})
+        self.assertMatches(self.MyDoc.tags != 'a', {'tags': ['a', 'b']},
+                           False)
+        self.assertMatches({'x': {'$gt': 1, '$lt': 5}}, {'x': [0, 6]})
+        self.assertMatches(
+            {'x': {'$elemMatch': {'$gt': 1, '$lt': 5}}}, {'x': [0, 6]},
+            False)
+        self.assertMatches(
+            {'x': {'$elemMatch': {'$gt': 1, '$lt': 5}}}, {'x': [0, 3]})
+        self.assertMatches(self.MyDoc.tags.size(2), {'tags': ['a', 'b']})
+        self.assertMatches(self.MyDoc.tags.all(['b', 'a']),
+                           {'tags': ['a', 'b', 'c']})
+        self.assertMatches(self.MyDoc.tags.all(['a', 'd']),
+                           {'tags': ['a', 'b']}, False)
+        self.assertMatches(self.MyDoc.tags.all([]), {'tags': []}, False)
+
+    def test_dotted(self):
+        doc = {'sub': [{'a': 1, 'b': [{'c': 2}]}, {'a': 3}]}
+        self.assertMatches({'sub.a': 3}, doc)
+        self.assertMatches({'sub.b.c': 2}, doc)
+        self.assertMatches({'sub.0.a': 1}, doc)
+        self.assertMatches({'sub.1.a': 1}, doc, False)
+        self.assertMatches({'sub.b': {'$exists': True}}, doc)
+        self.assertMatches({'sub.d': {'$exists': False}}, doc)
+        self.assertMatches({'sub.d': None}, doc)
+        self.assertMatches(
+            {'sub': {'$elemMatch': {'a': 1, 'b.c': 2}}}, doc)
+        self.assertMatches(
+            {'sub': {'$elemMatch': {'a': 3, 'b.c': 2}}}, doc, False)
+
+    def test_comparison_brackets(self):
+        self.assertMatches(self.MyDoc.x > 1, {'x': 'b'}, False)
+        self.assertMatches({'x': {'$gt': 'a'}}, {'x': 'b'})
+        self.assertMatches(self.MyDoc.x <= 2, {'x': 2.0})
+
+    def test_in(self):
+        self.assertMatches(self.MyDoc.x.in_([1, 2]), {'x': 2})
+        self.assertMatches(self.MyDoc.x.in_([1, None]), {})
+        self.assertMatches(self.MyDoc.x.nin([1, 2]), {'x': [3, 2]}, False)
+        self.assertMatches(
+            self.MyDoc.x.in_([re.compile('^f')]), {'x': 'foo'})
+
+    def test_regex(self):
+        self.assertMatches(self.MyDoc.x.regex('^F', 'i'), {'x': 'foo'})
+        self.assertMatches(self.MyDoc.x.regex('^F'), {'x': 'foo'}, False)
+        self.assertMatches(self.MyDoc.x.regex('o'), {'x': ['a', 'bo']})
+        self.assertMatches({'x': re.compile('o$')}, {'x': 'foo'})
+        self.assertMatches(self.MyDoc.x.regex('o'), {'x': 1}, False)
+
+    def test_mod(self):
+        self.assertMatches(self.MyDoc.x.mod(4, 1), {'x': 5})
+        self.assertMatches(self.MyDoc.x.mod(4, -1), {'x': -5})
+        self.assertMatches(self.MyDoc.x.mod(4, 1), {'x': '5'}, False)
+
+    def test_logical(self):
+        flt = (self.MyDoc.x == 1) | (self.MyDoc.x == 2)
+        self.assertMatches(flt, {'x': 2})
+        self.assertMatches(flt, {'x': 3}, False)
+        flt = mql.and_(self.MyDoc.x > 1, self.MyDoc.x < 5,
+                       {'$or': [{'sub': 1}, {'sub': 2}]})
+        self.assertMatches(flt, {'x': 3, 'sub': 2})
+        self.assertMatches(flt, {'x': 3, 'sub': 3}, False)
+        self.assertMatches(mql.nor_({'x': 1}), {'x': 2})
+        self.assertMatches(~(self.MyDoc.x > 5), {'x': 3})
+        self.assertMatches(~(self.MyDoc.x > 5), {})
+        self.assertMatches(mql.and_(mql.comment('c'), {'x': 1}), {'x': 1})
+
+    def test_filter_documents(self):
+        docs = [self.MyDoc.m.create(x=i) for i in range(10)]
+        match = mql.compile_matcher(self.MyDoc.x.in_([2, 3]))
+        self.assertEqual([d.x for d in docs if match(d)], [2, 3])
+
+    def test_unsupported(self):
+        with self.assertRaises(errors.QueryError):
+            mql.compile_matcher(self.MyDoc.x.where('this.x'))
+        with self.assertRaises(errors.QueryError):
+            mql.compile_matcher({'$where': 'true'})
+        with self.assertRaises(errors.QueryError):
+            mql.compile_matcher({'x': {'$in': 1}})
+        with self.assertRaises(errors.QueryError):
+            mql.compile_matcher({'x': {'$not': 1}})
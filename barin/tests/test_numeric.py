@@ -0,0 +1,75 @@
+from unittest import TestCase, skipIf
+
+from unittest.mock import Mock
+
+import bson
+from bson.raw_bson import RawBSONDocument
+
+from barin import collection, Metadata, Field
+from barin import numeric
+
+try:
+    import numpy
+except ImportError:  # pragma no cover
+    numpy = None
+
+
+def raw(doc):
+    return RawBSONDocument(bson.encode(doc))
+
+
+class TestRecords(TestCase):
+    def test_iter_records(self):
+        docs = [raw({"a": 1, "b": {"c": 2}}), raw({"a": 3})]
+        res = list(numeric.iter_records(docs, "a", "b.c"))
+        self.assertEqual(res, [(1, 2), (3, None)])
+
+
+@skipIf(numpy is None, "numpy is not installed")
+class TestColumns(TestCase):
+    def setUp(self):
+        self.db = Mock()
+        self.metadata = Metadata()
+        self.MyDoc = collection(
+            self.metadata,
+            "mydoc",
+            Field("_id", int),
+            Field("a", int),
+            Field("b", {"c": float}),
+        )
+        self.metadata.bind(self.db)
+        self.db.mydoc.with_options.return_value = self.db.mydoc
+        self.docs = [
+            raw({"a": 1, "b": {"c": 1.5}}),
+            raw({"a": 2, "b": {}}),
+            raw({"b": {"c": None}}),
+        ]
+
+    def test_builder_grows(self):
+        builder = numeric.ColumnBuilder(["x"], {"x": "i8"}, capacity=1)
+        for i in range(10):
+            builder.append([i])
+        res = builder.finish()
+        self.assertEqual(res["x"].tolist(), list(range(10)))
+
+    def test_query_to_columns(self):
+        self.db.mydoc.find.return_value = iter(self.docs)
+        res = self.MyDoc.m.query.match({"a": {"$gt": 0}}).to_columns(
+            "a", "b.c", dtypes={"a": "i8", "b.c": "f8"}
+        )
+        self.db.mydoc.find.assert_called_with(
+            projection={"a": 1, "b.c": 1, "_id": 0},
+            filter={"a": {"$gt": 0}},
+        )
+        self.assertEqual(res["a"].dtype, numpy.dtype("i8"))
+        self.assertEqual(res["a"].tolist(), [1, 2, None])
+        self.assertEqual(res["b.c"].tolist(), [1.5, None, None])
+
+    def test_aggregate_to_columns(self):
+        self.db.mydoc.aggregate.return_value = iter(self.docs)
+        res = self.MyDoc.m.aggregate.to_columns("a")
+        self.db.mydoc.aggregate.assert_called_with(
+            [{"$project": {"a": 1, "_id": 0}}]
+        )
+        self.assertEqual(res["a"].dtype, numpy.dtype(object))
+        self.assertEqual(res["a"].mask.tolist(), [False, False, True])
@@ -0,0 +1,139 @@
+from unittest import TestCase
+
+from unittest.mock import Mock
+
+import bson
+from bson.raw_bson import RawBSONDocument
+
+from barin import collection, subdocument, Metadata, Field, errors
+from barin import partial
+from barin import schema as S
+
+
+class TestProjection(TestCase):
+    def test_from_spec(self):
+        p = partial.Projection.from_spec(["a", "b.c"])
+        self.assertEqual(p.spec(), {"a": 1, "b.c": 1})
+        self.assertFalse(p.exclusive)
+        p = partial.Projection.from_spec({"a": 0, "_id": 0})
+        self.assertTrue(p.exclusive)
+        self.assertEqual(p.spec(), {"a": 0, "_id": 0})
+        self.assertIsNone(partial.Projection.from_spec({}))
+        with self.assertRaises(errors.QueryError):
+            partial.Projection.from_spec({"a": 1, "b": 0})
+
+    def test_includes(self):
+        p = partial.Projection(["a", "b.c"])
+        self.assertTrue(p.includes("_id"))
+        self.assertTrue(p.includes("b"))
+        self.assertFalse(p.includes("c"))
+        p = partial.Projection(["a"], exclusive=True)
+        self.assertFalse(p.includes("a"))
+        self.assertTrue(p.includes("b"))
+
+    def test_combine(self):
+        p = partial.Projection().only(["a"]).only(["b"])
+        self.assertEqual(p, partial.Projection(["b", "a"]))
+        p = partial.Projection().exclude(["a", "_id"])
+        self.assertEqual(p.spec(), {"a": 0, "_id": 0})
+        with self.assertRaises(errors.QueryError):
+            partial.Projection().only(["a"]).exclude(["b"])
+
+
+class TestPartialQueries(TestCase):
+    def setUp(self):
+        self.db = Mock()
+        self.metadata = Metadata()
+        self.Sub = subdocument(
+            self.metadata, "sub", Field("a", int), Field("b", int)
+        )
+        self.MyDoc = collection(
+            self.metadata,
+            "mydoc",
+            Field("_id", int),
+            Field("x", int),
+            Field("y", int),
+            Field("sub", self.Sub),
+        )
+        self.metadata.bind(self.db)
+        self.db.mydoc.with_options.return_value = self.db.mydoc
+
+    def test_only(self):
+        self.db.mydoc.find.return_value = iter([{"_id": 1, "sub": {"a": 2}}])
+        q = self.MyDoc.m.query.match({"x": 1}).only("sub.a")
+        doc = q.first()
+        self.db.mydoc.find.assert_called_with(
+            filter={"x": 1}, projection={"sub.a": 1}
+        )
+        self.assertIsInstance(doc, self.MyDoc)
+        self.assertIsInstance(doc, partial.PartialDocument)
+        self.assertEqual(doc.sub.a, 2)
+        self.assertEqual(
+            partial.projection_of(doc), partial.Projection(["sub.a"])
+        )
+        with self.assertRaises(errors.FieldNotLoaded):
+            doc.x
+        with self.assertRaises(errors.FieldNotLoaded):
+            doc["y"]
+        self.assertIsNone(doc.get("y"))
+
+    def test_exclude(self):
+        self.db.mydoc.find.return_value = iter(
+            [{"_id": 1, "x": 1, "sub": {"a": 1, "b": 2}}]
+        )
+        doc = self.MyDoc.m.query.exclude("y").first()
+        self.db.mydoc.find.assert_called_with(filter={}, projection={"y": 0})
+        self.assertEqual(doc.sub.b, 2)
+        with self.assertRaises(errors.FieldNotLoaded):
+            doc.y
+
+    def test_invalid_loaded_field(self):
+        self.db.mydoc.find.return_value = iter([{"_id": 1, "x": "1"}])
+        with self.assertRaises(S.Invalid):
+            self.MyDoc.m.query.only("x").first()
+
+    def test_find_one_positional(self):
+        self.db.mydoc.find_one.return_value = {"_id": 1, "x": 3}
+        doc = self.MyDoc.m.find_one({"_id": 1}, ["x"])
+        self.db.mydoc.find_one.assert_called_with({"_id": 1}, {"x": 1})
+        self.assertEqual(doc.x, 3)
+        with self.assertRaises(errors.FieldNotLoaded):
+            doc.y
+
+    def test_lazy(self):
+        raw = RawBSONDocument(bson.encode({"_id": 1, "x": 3}))
+        self.db.mydoc.find.return_value = iter([raw])
+        doc = self.MyDoc.m.query.only("x").lazy().first()
+        self.assertEqual(doc.x, 3)
+        with self.assertRaises(errors.FieldNotLoaded):
+            doc.y
+
+    def test_save(self):
+        self.db.mydoc.find.return_value = iter([{"_id": 1, "x": 3}])
+        doc = self.MyDoc.m.query.only("x").first()
+        doc["x"] = 4
+        doc["y"] = 5
+        doc.m.save()
+        self.db.mydoc.update_one.assert_called_with(
+            {"_id": 1}, {"$set": {"x": 4, "y": 5}}
+        )
+        doc["y"] = "5"
+        with self.assertRaises(S.Invalid):
+            doc.m.save()
+
+    def test_replace(self):
+        self.db.mydoc.find.return_value = iter([{"_id": 1, "x": 3}])
+        doc = self.MyDoc.m.query.only("x").first()
+        with self.assertRaises(errors.PartialDocumentError):
+            doc.m.replace()
+        self.db.mydoc.replace_one.assert_not_called()
+
+    def test_aggregate(self):
+        self.db.mydoc.aggregate.return_value = iter([{"_id": 1, "x": 3}])
+        agg = self.MyDoc.m.aggregate.match({"x": 3}).only("x")
+        doc = agg.first()
+        self.db.mydoc.aggregate.assert_called_with(
+            [{"$match": {"x": 3}}, {"$project": {"x": 1}}]
+        )
+        with self.assertRaises(errors.FieldNotLoaded):
+            doc.y
@@ -0,0 +1,110 @@
+from unittest import TestCase
+
+from unittest.mock import Mock
+
+from barin import collection, Metadata, Field, Index
+from barin import plans
+
+
+def explain(plan, returned=1, examined=1):
+    return {
+        "queryPlanner": {"winningPlan": plan},
+        "executionStats": {
+            "nReturned": returned,
+            "totalDocsExamined": examined,
+            "totalKeysExamined": examined,
+        },
+    }
+
+
+class TestSuggestIndex(TestCase):
+    def test_esr(self):
+        index = plans.suggest_index(
+            {"status": "new", "age": {"$gt": 5}, "tag": {"$in": ["a"]}},
+            [("created", -1)],
+        )
+        self.assertEqual(
+            index.arg,
+            [("status", 1), ("tag", 1), ("created", -1), ("age", 1)],
+        )
+
+    def test_and_or(self):
+        index = plans.suggest_index(
+            {"$and": [{"a": 1}, {"b": {"$lt": 2}}], "$or": [{"c": 1}]}
+        )
+        self.assertEqual(index.arg, [("a", 1), ("b", 1)])
+        self.assertIsNone(plans.suggest_index({}))
+
+
+class TestCheckPlans(TestCase):
+    def setUp(self):
+        self.db = Mock()
+        self.metadata = Metadata()
+        self.MyDoc = collection(
+            self.metadata,
+            "mydoc",
+            Field("_id", int),
+            Field("x", int),
+            Field("y", int),
+            Index([("x", 1), ("y", -1)]),
+        )
+        self.metadata.bind(self.db)
+        self.cursor = self.db.mydoc.find.return_value
+
+    def test_explain(self):
+        q = self.MyDoc.m.query.match({"x": 1}).sort("y").only("x")
+        q.explain()
+        self.db.mydoc.find.assert_called_with(
+            filter={"x": 1}, sort=[("y", 1)], projection={"x": 1}
+        )
+        self.cursor.explain.assert_called_with()
+
+    def test_covered(self):
+        self.cursor.explain.return_value = explain(
+            {
+                "stage": "FETCH",
+                "inputStage": {
+                    "stage": "IXSCAN",
+                    "keyPattern": {"x": 1, "y": -1},
+                },
+            }
+        )
+        q = self.MyDoc.m.query.match({"x": 1})
+        (report,) = self.metadata.check_plans([q])
+        self.assertTrue(report.ok)
+        self.assertIsNone(report.suggestion)
+
+    def test_idhack(self):
+        self.cursor.explain.return_value = explain({"stage": "IDHACK"})
+        report = plans.check(self.MyDoc.m.query.match({"_id": 1}))
+        self.assertTrue(report.ok)
+
+    def test_collscan_sort(self):
+        self.cursor.explain.return_value = explain(
+            {
+                "queryPlan": {
+                    "stage": "SORT",
+                    "inputStage": {"stage": "COLLSCAN"},
+                }
+            },
+            returned=2,
+            examined=1000,
+        )
+        q = self.MyDoc.m.query.match({"y": {"$gt": 1}}).sort("x")
+        report = plans.check(q)
+        self.assertEqual(
+            report.issues, ["COLLSCAN", "SORT", "ratio", "undeclared"]
+        )
+        self.assertEqual(report.ratio, 500)
+        self.assertEqual(report.suggestion.arg, [("x", 1), ("y", 1)])
+
+    def test_undeclared(self):
+        self.cursor.explain.return_value = explain(
+            {
+                "stage": "FETCH",
+                "inputStage": {"stage": "IXSCAN", "keyPattern": {"y": 1}},
+            }
+        )
+        report = plans.check(self.MyDoc.m.query.match({"y": 1}))
+        self.assertEqual(report.issues, ["undeclared"])
+        self.assertEqual(report.suggestion.arg, [("y", 1)])
@@ -0,0 +1,97 @@
+import gc
+import itertools
+from unittest import TestCase
+
+from unittest.mock import Mock
+
+from barin import collection, Metadata, Field
+from barin.prefetch import Prefetcher
+from barin.schema import Invalid
+
+
+def failing(n):
+    for i in range(n):
+        yield i
+    raise RuntimeError("lost")
+
+
+class TestPrefetcher(TestCase):
+    def test_batches(self):
+        p = Prefetcher(range(10), 3, depth=2)
+        sizes = []
+        while True:
+            batch = p.next_batch()
+            if not batch:
+                break
+            sizes.append(len(batch))
+        self.assertEqual(sizes, [3, 3, 3, 1])
+        self.assertEqual(p.next_batch(), [])
+        stats = p.stats()
+        self.assertEqual((stats["batches"], stats["documents"]), (4, 10))
+
+    def test_adapt(self):
+        p = Prefetcher(range(4), 2, adapt=lambda b: [x * 2 for x in b])
+        self.assertEqual(p.next_batch(), [0, 2])
+
+    def test_error(self):
+        p = Prefetcher(failing(4), 3)
+        self.assertEqual(p.next_batch(), [0, 1, 2])
+        with self.assertRaises(RuntimeError):
+            p.next_batch()
+        self.assertEqual(p.next_batch(), [])
+
+    def test_close(self):
+        p = Prefetcher(itertools.count(), 10, depth=1)
+        p.next_batch()
+        p.close(timeout=5)
+        self.assertFalse(p._thread.is_alive())
+
+    def test_garbage_collected(self):
+        p = Prefetcher(itertools.count(), 10, depth=1)
+        thread = p._thread
+        del p
+        gc.collect()
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+
+
+class TestPrefetchCursor(TestCase):
+    def setUp(self):
+        self.db = Mock()
+        self.metadata = Metadata()
+        self.MyDoc = collection(
+            self.metadata,
+            "mydoc",
+            Field("_id", int),
+            Field("x", int),
+        )
+        self.metadata.bind(self.db)
+        self.db.mydoc.with_options.return_value = self.db.mydoc
+
+    def test_query(self):
+        self.db.mydoc.find.return_value = iter(
+            [{"_id": i, "x": i} for i in range(250)]
+        )
+        cursor = self.MyDoc.m.query.prefetch(2).get_cursor()
+        docs = list(cursor)
+        self.assertEqual([d._id for d in docs], list(range(250)))
+        self.assertIsInstance(docs[0], self.MyDoc)
+        self.assertEqual(cursor.prefetch_stats()["batches"], 3)
+
+    def test_invalid(self):
+        self.db.mydoc.find.return_value = iter(
+            [{"_id": 1, "x": 1}, {"_id": 2, "x": "2"}]
+        )
+        with self.assertRaises(Invalid):
+            self.MyDoc.m.query.prefetch(2, adapt=False).all()
+
+    def test_close(self):
+        self.db.mydoc.find.return_value = pymongo_cursor = Mock()
+        pymongo_cursor.__iter__ = Mock(
+            return_value=({"_id": i, "x": i} for i in itertools.count())
+        )
+        cursor = self.MyDoc.m.find(prefetch=1)
+        next(cursor)
+        cursor.close()
+        self.assertFalse(cursor._prefetcher._thread.is_alive())
+        pymongo_cursor.close.assert_called_once_with()
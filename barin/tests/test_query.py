@@ -0,0 +1,78 @@
+from unittest import TestCase
+
+from unittest.mock import Mock
+
+from barin import collection, Metadata, Field
+from barin.schema import Invalid
+
+
+class TestQuery(TestCase):
+    def setUp(self):
+        self.db = Mock()
+        self.metadata = Metadata()
+        self.MyDoc = collection(
+            self.metadata,
+            "mydoc",
+            Field("_id", int),
+            Field("x", int),
+        )
+        self.metadata.bind(self.db)
+        self.db.mydoc.with_options.return_value = self.db.mydoc
+
+    def test_pipeline(self):
+        q = self.MyDoc.m.query.match({"x": 1}).sort("x").limit(5)
+        self.assertEqual(
+            q.pipeline,
+            [{"$match": {"x": 1}}, {"$sort": ("x", 1)}, {"$limit": 5}],
+        )
+
+    def test_shared_prefix(self):
+        base = self.MyDoc.m.query.match({"x": 1})
+        q1 = base.skip(1)
+        q2 = base.skip(2)
+        self.assertIs(q1._stages.parent, q2._stages.parent)
+        self.assertEqual(base.pipeline, [{"$match": {"x": 1}}])
+        self.assertEqual(q1._compile_query()["skip"], 1)
+        self.assertEqual(q2._compile_query()["skip"], 2)
+
+    def test_compile_cached(self):
+        q = self.MyDoc.m.query.match({"x": 1}).match({"_id": 2})
+        res = q._compile_query()
+        self.assertEqual(res, {"filter": {"x": 1, "_id": 2}})
+        self.assertIs(q._compile_query(), res)
+        self.assertIs(q.lazy()._compile_query(), res)
+
+    def test_update_many(self):
+        self.MyDoc.m.query.match({"x": 1}).update_many({"$set": {"x": 2}})
+        self.db.mydoc.update_many.assert_called_with(
+            {"x": 1}, {"$set": {"x": 2}}
+        )
+
+    def test_batches(self):
+        self.db.mydoc.find.return_value = cursor = Mock()
+        cursor.__iter__ = Mock(
+            return_value=iter([{"_id": i, "x": i} for i in range(5)])
+        )
+        batches = list(self.MyDoc.m.query.match({"x": 1}).batches(2))
+        cursor.batch_size.assert_called_with(2)
+        self.assertEqual([len(b) for b in batches], [2, 2, 1])
+        self.assertIsInstance(batches[2][0], self.MyDoc)
+        self.assertEqual(batches[2][0].x, 4)
+
+    def test_aggregate_batches(self):
+        self.db.mydoc.aggregate.return_value = iter(
+            [{"_id": 1, "x": 1}, {"_id": 2, "x": "2"}]
+        )
+        with self.assertRaises(Invalid):
+            list(self.MyDoc.m.aggregate.batches(10))
+
+    def test_raw_aggregate_batches(self):
+        self.db.mydoc.aggregate.return_value = cursor = Mock()
+        cursor.__iter__ = Mock(
+            return_value=iter([{"_id": i, "n": i} for i in range(5)])
+        )
+        q = self.MyDoc.m.aggregate.group({"_id": "$x", "n": {"$sum": 1}})
+        batches = list(q.batches(2))
+        cursor.batch_size.assert_called_with(2)
+        self.assertEqual([len(b) for b in batches], [2, 2, 1])
+        self.assertEqual(batches[2][0], {"_id": 4, "n": 4})
@@ -0,0 +1,129 @@
+from unittest import TestCase
+
+from unittest.mock import Mock
+
+from barin import collection, cmap, Metadata, Field, relationship, event
+from barin.schema import Invalid
+
+
+class TestPreload(TestCase):
+    def setUp(self):
+        self.db = Mock()
+        self.metadata = Metadata()
+        customer = collection(
+            self.metadata,
+            "customer",
+            Field("_id", int),
+            Field("name", str),
+        )
+        order = collection(
+            self.metadata,
+            "order",
+            Field("_id", int),
+            Field("customer_id", int),
+        )
+
+        @cmap(customer)
+        class Customer(object):
+            orders = relationship.eq(
+                "order", "_id", "customer_id", many=True
+            )
+
+        @cmap(order)
+        class Order(object):
+            customer = relationship.eq("customer", "customer_id")
+
+        self.Customer = customer
+        self.Order = order
+        self.metadata.bind(self.db)
+        self.db.customer.aggregate.return_value = iter(
+            [dict(_id=1, name="a"), dict(_id=2, name="b")]
+        )
+        self.db.order.find.return_value = iter(
+            [dict(_id=i, customer_id=1 + i % 3) for i in range(6)]
+        )
+
+    def test_preload_one(self):
+        orders = self.Order.m.query.preload("customer").all()
+        self.assertEqual(self.db.customer.aggregate.call_count, 1)
+        args, kwargs = self.db.customer.aggregate.call_args
+        self.assertEqual(
+            args[0], [{"$match": {"_id": {"$in": [1, 2, 3]}}}]
+        )
+        self.assertEqual(
+            [o.customer and o.customer.name for o in orders],
+            ["a", "b", None, "a", "b", None],
+        )
+        self.assertIs(orders[0].customer, orders[3].customer)
+        self.assertEqual(self.db.customer.aggregate.call_count, 1)
+
+    def test_preload_many(self):
+        self.db.customer.find.return_value = iter(
+            [dict(_id=1, name="a"), dict(_id=2, name="b")]
+        )
+        self.db.order.aggregate.return_value = iter(
+            [dict(_id=i, customer_id=1 + i % 3) for i in range(6)]
+        )
+        customers = self.Customer.m.find().preload("orders").all()
+        self.assertEqual(
+            [[o._id for o in c.orders] for c in customers], [[0, 3], [1, 4]]
+        )
+        self.assertEqual(self.db.order.aggregate.call_count, 1)
+
+    def test_validate_mode(self):
+        self.db.order.find.return_value = iter(
+            [dict(_id=0, customer_id=1, customer=dict(_id=1, name=5))]
+        )
+        self.db.customer.aggregate.return_value = iter(
+            [dict(_id=1, name=5)]
+        )
+        order = self.Order.m.find(validate="trusted").first()
+        with self.assertRaises(Invalid):
+            order.customer
+        self.metadata.validate = "trusted"
+        self.assertEqual(order.customer.name, 5)
+        self.db.order.find.return_value = iter([dict(_id=0, customer_id=1)])
+        order = self.Order.m.find().preload("customer").first()
+        self.assertEqual(order.customer.name, 5)
+
+    def test_many_same_type(self):
+        self.db.customer.find.side_effect = lambda *a, **kw: iter(
+            [dict(_id=1, name="a")]
+        )
+        self.db.order.aggregate.side_effect = lambda *a, **kw: iter(
+            [dict(_id=0, customer_id=1), dict(_id=3, customer_id=1)]
+        )
+        loaded = self.Customer.m.find().first().orders
+        preloaded = self.Customer.m.find().preload("orders").first().orders
+        self.assertIsInstance(loaded, list)
+        self.assertIsInstance(preloaded, list)
+        self.assertEqual([o._id for o in loaded], [0, 3])
+        self.assertEqual([o._id for o in preloaded], [0, 3])
+
+    def test_adapted_once(self):
+        adapted = []
+
+        def hook(obj):
+            adapted.append(obj._id)
+
+        event.listens_for_object(hook)
+        self.addCleanup(event._OBJECT_HOOKS.remove, hook)
+        self.db.customer.find.side_effect = lambda *a, **kw: iter(
+            [dict(_id=1, name="a")]
+        )
+        self.db.order.aggregate.side_effect = lambda *a, **kw: iter(
+            [dict(_id=0, customer_id=1), dict(_id=3, customer_id=1)]
+        )
+        customer = self.Customer.m.find().first()
+        del adapted[:]
+        customer.orders
+        self.assertEqual(adapted, [0, 3])
+        del adapted[:]
+        customer = self.Customer.m.find().preload("orders").first()
+        customer.orders
+        self.assertEqual(sorted(adapted), [0, 1, 3])
+        self.db.order.find.return_value = iter([dict(_id=0, customer_id=1)])
+        order = self.Order.m.find().first()
+        del adapted[:]
+        order.customer
+        self.assertEqual(adapted, [1])
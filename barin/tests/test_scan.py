@@ -0,0 +1,185 @@
+import contextvars
+from unittest import TestCase
+
+from unittest.mock import Mock
+
+import pymongo.errors
+
+from barin import collection, Metadata, Field, errors
+from barin import scan
+
+
+def in_range(value, rng):
+    if "$not" in rng:
+        return not in_range(value, rng["$not"])
+    if "$gte" in rng and not value >= rng["$gte"]:
+        return False
+    if "$lt" in rng and not value < rng["$lt"]:
+        return False
+    return True
+
+
+class TestPartitionFilters(TestCase):
+    def test_ranges(self):
+        parts = list(scan.partition_filters({"x": 1}, "_id", [10, 20]))
+        self.assertEqual(
+            parts,
+            [
+                {"x": 1, "_id": {"$not": {"$gte": 10}}},
+                {"x": 1, "_id": {"$gte": 10, "$lt": 20}},
+                {"x": 1, "_id": {"$gte": 20}},
+            ],
+        )
+
+    def test_key_in_filter(self):
+        (part, _) = scan.partition_filters({"_id": {"$gt": 5}}, "_id", [10])
+        self.assertEqual(
+            part,
+            {"$and": [{"_id": {"$gt": 5}}, {"_id": {"$not": {"$gte": 10}}}]},
+        )
+
+    def test_no_bounds(self):
+        self.assertEqual(list(scan.partition_filters({}, "_id", [])), [{}])
+
+
+class TestParallelScan(TestCase):
+    def setUp(self):
+        self.db = Mock()
+        self.metadata = Metadata()
+        self.MyDoc = collection(
+            self.metadata,
+            "mydoc",
+            Field("_id", int),
+            Field("x", int),
+        )
+        self.metadata.bind(self.db)
+        self.db.mydoc.with_options.return_value = self.db.mydoc
+        self.docs = [{"_id": i, "x": i % 3} for i in range(100)]
+        self.db.mydoc.aggregate.return_value = [
+            {"_id": {"min": lo, "max": lo + 25}, "count": 25}
+            for lo in (0, 25, 50, 75)
+        ]
+        self.failures = 0
+        self.db.mydoc.find.side_effect = self.find
+
+    def find(self, filter, **kwargs):
+        if self.failures:
+            self.failures -= 1
+            raise pymongo.errors.AutoReconnect("lost")
+        rng = filter.get("_id", {})
+        return iter(
+            [dict(doc) for doc in self.docs if in_range(doc["_id"], rng)]
+        )
+
+    def test_scan(self):
+        q = self.MyDoc.m.query.match({"x": {"$gte": 0}})
+        res = list(q.parallel_scan(workers=2, partitions=4))
+        self.assertEqual([doc._id for doc in res], list(range(100)))
+        self.assertIsInstance(res[0], self.MyDoc)
+        self.assertEqual(self.db.mydoc.find.call_count, 4)
+        pipeline = self.db.mydoc.aggregate.call_args[0][0]
+        self.assertEqual(
+            pipeline,
+            [
+                {"$match": {"x": {"$gte": 0}}},
+                {"$bucketAuto": {"groupBy": "$_id", "buckets": 4}},
+            ],
+        )
+
+    def test_batches_and_options(self):
+        q = self.MyDoc.m.query.sort("_id").only("x")
+        parts = list(q.parallel_scan(workers=2, batches=True))
+        self.assertEqual([len(p) for p in parts], [25, 25, 25, 25])
+        kwargs = self.db.mydoc.find.call_args[1]
+        self.assertEqual(kwargs["sort"], [("_id", 1)])
+        self.assertEqual(kwargs["projection"], {"x": 1})
+
+    def test_rejected(self):
+        q = self.MyDoc.m.query
+        with self.assertRaises(errors.QueryError):
+            list(q.sort("x").parallel_scan())
+        with self.assertRaises(errors.QueryError):
+            list(q.sort("_id", -1).parallel_scan())
+        with self.assertRaises(errors.QueryError):
+            list(q.only("_id").parallel_scan(partition_key="x"))
+        with self.assertRaises(errors.QueryError):
+            list(q.exclude("_id").parallel_scan())
+
+    def test_mixed_type_bounds(self):
+        self.db.mydoc.aggregate.return_value = [
+            {"_id": {"min": lo, "max": None}, "count": 1}
+            for lo in (None, 0, 25, "a", 50, 75)
+        ]
+        self.assertEqual(
+            scan.split_points(self.MyDoc.m, {}, "_id", 6), [0, 25, 50, 75]
+        )
+
+    def test_context(self):
+        var = contextvars.ContextVar("var", default=None)
+        seen = set()
+
+        def find(filter, **kwargs):
+            seen.add(var.get())
+            return self.find(filter, **kwargs)
+
+        self.db.mydoc.find.side_effect = find
+        var.set("caller")
+        list(self.MyDoc.m.query.parallel_scan(workers=2, partitions=4))
+        self.assertEqual(seen, {"caller"})
+
+    def test_retry(self):
+        self.failures = 2
+        res = list(self.MyDoc.m.query.parallel_scan(workers=1, partitions=4))
+        self.assertEqual(len(res), 100)
+        self.assertEqual(self.db.mydoc.find.call_count, 6)
+
+    def test_bounded_batches(self):
+        parts = list(
+            self.MyDoc.m.query.parallel_scan(
+                workers=2, batches=True, batch_size=10
+            )
+        )
+        self.assertEqual([len(p) for p in parts], [10, 10, 5] * 4)
+        kwargs = self.db.mydoc.find.call_args[1]
+        self.assertEqual(kwargs["sort"], [("_id", 1)])
+
+    def test_retry_resumes(self):
+        filters = []
+
+        def fail_after(docs, count):
+            for doc in docs[:count]:
+                yield doc
+            raise pymongo.errors.AutoReconnect("lost")
+
+        def find(filter, **kwargs):
+            filters.append(filter)
+            if "$and" in filter:
+                part, after = filter["$and"]
+                start = after["$expr"]["$gt"][1]["$literal"]
+                return (doc for doc in self.find(part) if doc["_id"] > start)
+            docs = list(self.find(filter, **kwargs))
+            if len(filters) == 2:
+                return fail_after(docs, 15)
+            return iter(docs)
+
+        self.db.mydoc.find.side_effect = find
+        res = list(
+            self.MyDoc.m.query.parallel_scan(
+                workers=1, partitions=4, batch_size=10
+            )
+        )
+        self.assertEqual([doc._id for doc in res], list(range(100)))
+        self.assertEqual(len(filters), 5)
+        self.assertEqual(
+            filters[2]["$and"][1],
+            {"$expr": {"$gt": ["$_id", {"$literal": 34}]}},
+        )
+
+    def test_retries_exhausted(self):
+        self.failures = 3
+        with self.assertRaises(pymongo.errors.AutoReconnect):
+            list(self.MyDoc.m.query.parallel_scan(retries=2))
+
+    def test_limit(self):
+        with self.assertRaises(errors.QueryError):
+            list(self.MyDoc.m.query.limit(5).parallel_scan())
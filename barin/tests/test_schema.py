@@ -1,5 +1,8 @@
+import threading
+from unittest import TestCase, mock
+
 import bson
-from unittest import TestCase
+import six
 
 from barin import schema as S
 
@@ -200,3 +203,144 @@ class TestArray(TestCase):
         val = [1, 2, 3, 'foo']
         res = s.validate(val)
         self.assertEqual(val, res)
+
+
+class TestCompiled(TestCase):
+
+    def setUp(self):
+        self.sub = S.Document(fields=dict(
+            a=S.Integer(),
+            b=S.Array(validator=S.Float())))
+        self.s = S.Document(
+            fields=dict(
+                x=S.Integer(default=0),
+                y=S.Unicode(default=None),
+                sub=self.sub,
+                subs=S.Array(validator=self.sub)),
+            compiled=True)
+
+    def test_compile_equivalent(self):
+        val = {'x': 1, 'sub': {'a': 1, 'b': [1, 2.5]}, 'subs': [
+            {'a': 2, 'b': []}]}
+        res = self.s.validate(val)
+        self.assertEqual(res, self.s._validate_interpreted(val))
+        self.assertEqual(res['sub']['b'], [1.0, 2.5])
+        self.assertIsInstance(res['sub']['b'][0], float)
+
+    def test_compile_defaults(self):
+        s = S.Document(
+            fields=dict(
+                x=S.Integer(default=0),
+                y=S.Unicode(default=None),
+                z=S.Array(validator=S.Integer())),
+            compiled=True)
+        res = s.validate({})
+        self.assertEqual(res, {'x': 0, 'y': None, 'z': []})
+
+    def test_compile_error_structure(self):
+        val = {'x': 'foo', 'subs': [{'a': 1}, {'a': 'bar'}]}
+        with self.assertRaises(S.Invalid) as err:
+            self.s.validate(val)
+        errs = err.exception.document
+        self.assertEqual(sorted(errs), ['sub', 'subs', 'x'])
+        self.assertIsNone(errs['subs'].array[0])
+        self.assertIsInstance(errs['subs'].array[1], S.Invalid)
+
+    def test_compile_extra(self):
+        s = S.Document(
+            fields=dict(x=S.Integer()),
+            extra_validator=S.Integer(),
+            compiled=True)
+        self.assertEqual(s.validate({'x': 1, 'y': 2}), {'x': 1, 'y': 2})
+        with self.assertRaises(S.Invalid):
+            s.validate({'x': 1, 'y': 'foo'})
+        s = S.Document(
+            fields=dict(x=S.Integer()), strip_extra=True, compiled=True)
+        self.assertEqual(s.validate({'x': 1, 'y': 2}), {'x': 1})
+
+    def test_compile_option(self):
+        s = S.compile_schema(None, {'x': int}, compiled=True)
+        self.assertTrue(s.compiled)
+        self.assertTrue(hasattr(s.compile(), 'source'))
+
+
+class TestProfile(TestCase):
+
+    def setUp(self):
+        self.schema = S.compile_schema(
+            None, {'x': int, 'tags': [{'name': str}]}, compiled=True)
+
+    def test_paths(self):
+        validate = self.schema.compile()
+        with S.profile(self.schema) as prof:
+            for i in range(3):
+                validate({'x': i, 'tags': [{'name': 'a'}, {'name': 'b'}]})
+        self.assertEqual(
+            sorted(prof.paths),
+            ['Document', 'Document.tags', 'Document.tags[]',
+             'Document.tags[].name', 'Document.x'])
+        self.assertEqual(prof.paths['Document'].calls, 3)
+        self.assertEqual(prof.paths['Document.tags[].name'].calls, 6)
+        root = prof.paths['Document']
+        self.assertLess(root.own, root.cumulative)
+        docs = prof.classes['Document']
+        self.assertEqual(docs.calls, 9)
+        self.assertLessEqual(docs.cumulative, root.cumulative)
+
+    def test_restored(self):
+        with S.profile(self.schema):
+            pass
+        self.assertNotIn('validate', self.schema.__dict__)
+        self.assertNotIn('validate', self.schema.fields['x'].__dict__)
+        self.assertEqual(
+            self.schema.validate({'x': 1, 'tags': []}),
+            {'x': 1, 'tags': []})
+
+    def test_invalid(self):
+        with S.profile(self.schema) as prof:
+            with self.assertRaises(S.Invalid):
+                self.schema.validate({'x': 'one'})
+        self.assertEqual(prof.paths['Document.x'].calls, 1)
+
+    def test_report(self):
+        out = six.StringIO()
+        with S.profile(self.schema) as prof:
+            self.schema.validate({'x': 1})
+        prof.report(file=out)
+        lines = out.getvalue().splitlines()
+        self.assertIn('self/call', lines[0])
+        self.assertTrue(any(line.endswith('Document.x') for line in lines))
+        self.assertFalse(any(line.endswith('name') for line in lines))
+
+    def test_shared_validator(self):
+        name = S.Unicode()
+        s = S.Document(
+            fields=dict(
+                first=name, last=name, aliases=S.Array(validator=name)),
+            allow_extra=True, extra_validator=name)
+        with S.profile(s) as prof:
+            s.validate({'first': 'a', 'last': 'b', 'aliases': ['c', 'd'],
+                        'nick': 'e'})
+        self.assertEqual(
+            dict((path, st.calls) for path, st in prof.paths.items()),
+            {'Document': 1, 'Document.first': 1, 'Document.last': 1,
+             'Document.aliases': 1, 'Document.aliases[]': 2,
+             'Document.*': 1})
+        self.assertEqual(prof.stats[name, 'Document.aliases[]'].calls, 2)
+
+    def test_other_threads(self):
+        other = S.compile_schema(None, {'y': int}, compiled=True)
+        validate = self.schema.compile()
+        compiled = other.compile()
+        with S.profile(self.schema) as prof:
+            with mock.patch.object(
+                    other, '_validate_interpreted') as interpreted:
+                compiled({'y': 1})
+            interpreted.assert_not_called()
+            thread = threading.Thread(
+                target=validate, args=({'x': 1, 'tags': []},))
+            thread.start()
+            thread.join()
+            self.assertEqual(prof.paths['Document'].calls, 0)
+            validate({'x': 1, 'tags': []})
+        self.assertEqual(prof.paths['Document'].calls, 1)
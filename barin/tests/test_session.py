@@ -0,0 +1,200 @@
+from unittest import TestCase
+
+from unittest.mock import Mock
+
+import pymongo
+import pymongo.errors
+
+from barin import collection, Metadata, Field, event, session
+
+
+class TestSession(TestCase):
+    def setUp(self):
+        self.db = Mock()
+        self.metadata = Metadata()
+        self.MyDoc = collection(
+            self.metadata,
+            "mydoc",
+            Field("_id", int),
+            Field("x", int),
+        )
+        self.Other = collection(
+            self.metadata,
+            "other",
+            Field("_id", int),
+        )
+        self.metadata.bind(self.db)
+        self.db.mydoc.with_options.return_value = self.db.mydoc
+
+    def test_context(self):
+        self.assertIsNone(session.current())
+        with self.metadata.session() as sess:
+            self.assertIs(session.current(), sess)
+        self.assertIsNone(session.current())
+
+    def test_identity_map(self):
+        self.db.mydoc.find.side_effect = lambda *a, **kw: iter(
+            [{"_id": 1, "x": 1}]
+        )
+        self.db.mydoc.find_one.return_value = {"_id": 1, "x": 1}
+        with self.metadata.session() as sess:
+            doc1 = self.MyDoc.m.find().first()
+            doc2 = self.MyDoc.m.query.match({"x": 1}).first()
+            doc3 = self.MyDoc.m.get(_id=1)
+            self.assertIs(doc1, doc2)
+            self.assertIs(doc1, doc3)
+            self.assertIs(sess.get(self.MyDoc, 1), doc1)
+        self.db.mydoc.bulk_write.assert_not_called()
+        doc4 = self.MyDoc.m.find().first()
+        self.assertIsNot(doc1, doc4)
+
+    def test_flush_batches(self):
+        self.db.mydoc.find.return_value = iter([{"_id": 1, "x": 1}])
+        with self.metadata.session():
+            doc = self.MyDoc.m.find().first()
+            doc.x = 2
+            self.MyDoc.m.create(_id=2, x=2).m.insert()
+            self.MyDoc.m.create(_id=3, x=3).m.delete()
+            self.Other.m.create(_id=1).m.insert()
+            self.db.mydoc.insert_one.assert_not_called()
+            self.db.mydoc.delete_one.assert_not_called()
+        self.db.mydoc.bulk_write.assert_called_once_with(
+            [
+                pymongo.InsertOne({"_id": 2, "x": 2}),
+                pymongo.DeleteOne({"_id": 3}),
+                pymongo.UpdateOne({"_id": 1}, {"$set": {"x": 2}}),
+            ],
+            ordered=True,
+        )
+        self.db.other.bulk_write.assert_called_once_with(
+            [pymongo.InsertOne({"_id": 1})], ordered=True
+        )
+
+    def test_unchanged_not_written(self):
+        self.db.mydoc.find.return_value = iter([{"_id": 1, "x": 1}])
+        with self.metadata.session() as sess:
+            self.MyDoc.m.find().all()
+            self.assertEqual(sess.flush(), [])
+        self.db.mydoc.bulk_write.assert_not_called()
+
+    def test_insert_then_modify(self):
+        with self.metadata.session():
+            doc = self.MyDoc.m.create(_id=1, x=1)
+            doc.m.insert()
+            doc.x = 2
+            doc.m.replace()
+        self.db.mydoc.bulk_write.assert_called_once_with(
+            [pymongo.InsertOne({"_id": 1, "x": 2})], ordered=True
+        )
+
+    def test_update(self):
+        with self.metadata.session():
+            doc = self.MyDoc.m.create(_id=1, x=1)
+            doc.m.update({"$inc": {"x": 1}}, upsert=True)
+        self.db.mydoc.bulk_write.assert_called_once_with(
+            [pymongo.UpdateOne({"_id": 1}, {"$inc": {"x": 1}}, upsert=True)],
+            ordered=True,
+        )
+
+    def test_hooks(self):
+        calls = []
+
+        @event.listens_for(self.MyDoc, "before_insert")
+        def before(im):
+            self.db.mydoc.bulk_write.assert_not_called()
+            calls.append("before")
+
+        @event.listens_for(self.MyDoc, "after_insert")
+        def after(im):
+            self.db.mydoc.bulk_write.assert_called_once()
+            calls.append("after")
+
+        with self.metadata.session():
+            self.MyDoc.m.create(_id=1, x=1).m.insert()
+            self.assertEqual(calls, [])
+        self.assertEqual(calls, ["before", "after"])
+
+    def test_collection_hooks(self):
+        self.db.mydoc.find.return_value = iter([{"_id": 1, "x": 1}])
+        calls = []
+        for name in ("insert_one", "update_one", "delete_one"):
+            for prefix in ("before_", "after_"):
+                event.listen(
+                    self.MyDoc,
+                    prefix + name,
+                    lambda mgr, *args, _n=prefix + name: calls.append(
+                        (_n, args)
+                    ),
+                )
+        with self.metadata.session():
+            doc = self.MyDoc.m.find().first()
+            doc.x = 2
+            self.MyDoc.m.create(_id=2, x=2).m.insert()
+            self.MyDoc.m.create(_id=3, x=3).m.delete()
+            self.assertEqual(calls, [])
+        self.assertEqual(
+            calls,
+            [
+                ("before_insert_one", ({"_id": 2, "x": 2},)),
+                ("before_delete_one", ({"_id": 3},)),
+                ("before_update_one", ({"_id": 1}, {"$set": {"x": 2}})),
+                ("after_insert_one", ({"_id": 2, "x": 2},)),
+                ("after_delete_one", ({"_id": 3},)),
+                ("after_update_one", ({"_id": 1}, {"$set": {"x": 2}})),
+            ],
+        )
+
+    def test_other_metadata(self):
+        other_db = Mock()
+        other_metadata = Metadata()
+        Third = collection(other_metadata, "third", Field("_id", int))
+        other_metadata.bind(other_db)
+        other_db.third.with_options.return_value = other_db.third
+        other_db.third.find.side_effect = lambda *a, **kw: iter([{"_id": 1}])
+        with self.metadata.session() as sess:
+            self.assertIsNone(session.current(other_metadata))
+            doc1 = Third.m.find().first()
+            doc2 = Third.m.find().first()
+            self.assertIsNot(doc1, doc2)
+            Third.m.create(_id=2).m.insert()
+            other_db.third.insert_one.assert_called_once_with({"_id": 2})
+            self.assertEqual(sess.identity_map, {})
+        other_db.third.bulk_write.assert_not_called()
+
+    def test_failed_flush_keeps_pending(self):
+        self.db.other.with_options.return_value = self.db.other
+        self.db.other.bulk_write.side_effect = pymongo.errors.AutoReconnect()
+        sess = self.metadata.session()
+        with sess:
+            self.MyDoc.m.create(_id=1, x=1).m.insert()
+            self.Other.m.create(_id=2).m.insert()
+            with self.assertRaises(pymongo.errors.AutoReconnect):
+                sess.flush()
+            self.db.mydoc.bulk_write.assert_called_once()
+            self.db.other.bulk_write.side_effect = None
+        self.db.mydoc.bulk_write.assert_called_once()
+        self.db.other.bulk_write.assert_called_with(
+            [pymongo.InsertOne({"_id": 2})], ordered=True
+        )
+        self.assertEqual(self.db.other.bulk_write.call_count, 2)
+
+    def test_update_and_modify(self):
+        self.db.mydoc.find.return_value = iter([{"_id": 1, "x": 1}])
+        with self.metadata.session():
+            doc = self.MyDoc.m.find().first()
+            doc.m.update({"$inc": {"y": 1}})
+            doc.x = 2
+        self.db.mydoc.bulk_write.assert_called_once_with(
+            [
+                pymongo.UpdateOne({"_id": 1}, {"$inc": {"y": 1}}),
+                pymongo.UpdateOne({"_id": 1}, {"$set": {"x": 2}}),
+            ],
+            ordered=True,
+        )
+
+    def test_rollback(self):
+        with self.assertRaises(ValueError):
+            with self.metadata.session():
+                self.MyDoc.m.create(_id=1, x=1).m.insert()
+                raise ValueError()
+        self.db.mydoc.bulk_write.assert_not_called()
@@ -0,0 +1,106 @@
+from unittest import TestCase
+
+from unittest.mock import Mock, patch
+
+from barin import collection, subdocument, Metadata, Field
+from barin import schema as S
+from barin.adapter import validation_mode
+from barin.schema.trusted import trusted_loader
+
+
+class TestValidationMode(TestCase):
+    def test_parse(self):
+        self.assertEqual(validation_mode(None), ("full", 1.0))
+        self.assertEqual(validation_mode("trusted"), ("trusted", 0.0))
+        self.assertEqual(validation_mode("sampled(0.25)"), ("sampled", 0.25))
+        with self.assertRaises(ValueError):
+            validation_mode("sampled(1.5)")
+        with self.assertRaises(ValueError):
+            validation_mode("none")
+
+
+class TestTrustedLoader(TestCase):
+    def setUp(self):
+        self.metadata = Metadata()
+        self.Sub = subdocument(self.metadata, "sub", Field("a", int))
+        self.MyDoc = collection(
+            self.metadata,
+            "mydoc",
+            Field("_id", int),
+            Field("x", int, default=5),
+            Field("subs", [self.Sub]),
+            Field("nested", {"b": S.Integer(default=1)}),
+        )
+
+    def test_load(self):
+        load = trusted_loader(self.MyDoc.m.schema)
+        raw = {"_id": 1, "x": "not checked", "subs": [{"a": 1}]}
+        doc = load(raw)
+        self.assertIsInstance(doc, self.MyDoc)
+        self.assertEqual(doc.x, "not checked")
+        self.assertIsInstance(doc.subs[0], self.Sub)
+        self.assertEqual(doc.nested, {"b": 1})
+
+    def test_defaults(self):
+        load = trusted_loader(self.MyDoc.m.schema)
+        raw = {"_id": 1, "subs": []}
+        self.assertEqual(load(raw), self.MyDoc.m.schema.validate(raw))
+
+
+class TestReadModes(TestCase):
+    def setUp(self):
+        self.db = Mock()
+        self.metadata = Metadata()
+        self.MyDoc = collection(
+            self.metadata,
+            "mydoc",
+            Field("_id", int),
+            Field("x", int),
+        )
+        self.Trusted = collection(
+            self.metadata,
+            "trusted",
+            Field("_id", int),
+            Field("x", int),
+            validate="trusted",
+        )
+        self.metadata.bind(self.db)
+        self.db.mydoc.with_options.return_value = self.db.mydoc
+        self.bad = {"_id": 1, "x": "bad"}
+        self.db.mydoc.find.side_effect = lambda *a, **kw: iter([self.bad])
+        self.db.mydoc.find_one.return_value = self.bad
+        self.db.trusted.find_one.return_value = self.bad
+
+    def test_full(self):
+        with self.assertRaises(S.Invalid):
+            self.MyDoc.m.query.first()
+        with self.assertRaises(S.Invalid):
+            self.MyDoc.m.get(_id=1)
+
+    def test_query(self):
+        doc = self.MyDoc.m.query.validate("trusted").first()
+        self.assertIsInstance(doc, self.MyDoc)
+        self.assertEqual(doc.x, "bad")
+        doc = self.MyDoc.m.find_one({"_id": 1}, validate="trusted")
+        self.assertEqual(doc.x, "bad")
+
+    def test_collection(self):
+        self.assertEqual(self.Trusted.m.get(_id=1).x, "bad")
+
+    def test_global(self):
+        self.metadata.validate = "trusted"
+        self.assertEqual(self.MyDoc.m.get(_id=1).x, "bad")
+
+    def test_writes_validate(self):
+        self.metadata.validate = "trusted"
+        with self.assertRaises(S.Invalid):
+            self.Trusted.m.insert_one(self.bad)
+
+    def test_sampled(self):
+        q = self.MyDoc.m.query.validate("sampled(0.5)")
+        with patch("random.random", side_effect=[0.9, 0.1]):
+            with self.assertLogs("barin.adapter", "WARNING"):
+                docs = [q.first(), q.first()]
+        self.assertEqual([d.x for d in docs], ["bad", "bad"])
+        adapter = self.MyDoc.m.read_adapter("sampled(0.5)")
+        self.assertEqual((adapter.sampled, adapter.failures), (1, 1))
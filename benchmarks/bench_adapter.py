@@ -0,0 +1,71 @@
+"""Per-document overhead of the read adapters over schema validation
+(registration lookup, change tracking, hooks).
+
+Run directly to print the cost per document::
+
+    $ python -m benchmarks.bench_adapter
+"""
+import timeit
+
+from barin import Metadata, Field, collection, derived
+
+
+def make_classes(polymorphic):
+    metadata = Metadata()
+    if not polymorphic:
+        Doc = collection(metadata, "doc", Field("_id", int), Field("x", int))
+        return Doc, {"_id": 1, "x": 1}
+    Doc = collection(
+        metadata,
+        "doc",
+        Field("_id", int),
+        Field("kind", str),
+        polymorphic_discriminator="kind",
+    )
+    for i in range(20):
+        derived(Doc, "kind-{}".format(i), Field("x", int))
+    return Doc, {"_id": 1, "kind": "kind-7", "x": 1}
+
+
+class TimeAdapter(object):
+    params = ["static", "polymorphic"]
+    param_names = ["registry"]
+
+    def setup(self, registry):
+        Doc, self.doc = make_classes(registry == "polymorphic")
+        self.adapter = Doc.m.read_adapter()
+        reg = Doc.m.registry.by_value(self.doc)
+        self.validate = reg.schema.validate
+        self.adapter(self.doc)
+
+    def time_validate(self, registry):
+        self.validate(self.doc)
+
+    def time_adapter(self, registry):
+        self.adapter(self.doc)
+
+
+def main(number=50000):
+    for registry in TimeAdapter.params:
+        bench = TimeAdapter()
+        bench.setup(registry)
+        result = {}
+        for name in ("validate", "adapter"):
+            func = getattr(bench, "time_" + name)
+            elapsed = min(
+                timeit.repeat(lambda: func(registry), number=number, repeat=3)
+            )
+            result[name] = 1e6 * elapsed / number
+        print(
+            "{:>12}: validate {:.2f} us, adapter {:.2f} us, "
+            "overhead {:.2f} us/doc".format(
+                registry,
+                result["validate"],
+                result["adapter"],
+                result["adapter"] - result["validate"],
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""insert_bulk() with serial validation (workers=0) and with validation on
+a thread pool, inserting into a stub collection with a simulated server
+latency per insert_many() (0 for validation and encoding alone).
+
+Run directly to print the documents/sec of each::
+
+    $ python -m benchmarks.bench_bulk
+"""
+import time
+import timeit
+
+import bson
+
+from barin import Metadata, Field, collection
+
+N = 5000
+
+
+class StubCollection(object):
+    """Stands in for a pymongo collection, sleeping latency seconds per
+    insert_many() (which releases the GIL, like socket I/O)"""
+
+    name = "doc"
+    codec_options = bson.CodecOptions()
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def with_options(self, **kwargs):
+        return self
+
+    def insert_many(self, docs, ordered=True):
+        if self.latency:
+            time.sleep(self.latency)
+
+
+class StubDatabase(object):
+    def __init__(self, latency):
+        self.latency = latency
+
+    def __getattr__(self, name):
+        return StubCollection(self.latency)
+
+
+def make_docs():
+    return [
+        {
+            "_id": i,
+            "name": "doc-{}".format(i),
+            "values": list(range(10)),
+            "sub": {"a": i, "b": "x" * 20},
+        }
+        for i in range(N)
+    ]
+
+
+class TimeInsertBulk(object):
+    params = ([0, 4], [0, 0.002])
+    param_names = ["workers", "latency"]
+
+    def setup(self, workers, latency):
+        metadata = Metadata(StubDatabase(latency))
+        self.Doc = collection(
+            metadata,
+            "doc",
+            Field("_id", int),
+            Field("name", str),
+            Field("values", [int]),
+            Field("sub", {"a": int, "b": str}),
+        )
+        self.docs = make_docs()
+
+    def time_insert_bulk(self, workers, latency):
+        self.Doc.m.insert_bulk(self.docs, chunk_size=500, workers=workers)
+
+
+def main(number=3):
+    for latency in TimeInsertBulk.params[1]:
+        for workers in TimeInsertBulk.params[0]:
+            bench = TimeInsertBulk()
+            bench.setup(workers, latency)
+            elapsed = min(
+                timeit.repeat(
+                    lambda: bench.time_insert_bulk(workers, latency),
+                    number=number,
+                    repeat=3,
+                )
+            )
+            print(
+                "workers={} latency={:>5}: {:>10,.0f} docs/sec".format(
+                    workers, latency, N * number / elapsed
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Cursor iteration: one document at a time against Cursor.batches().
+
+Run directly to print docs/sec for each form::
+
+    $ python -m benchmarks.bench_cursor
+"""
+import timeit
+
+from barin import Metadata, Field, collection
+
+
+class StubCursor(object):
+    """Stands in for a pymongo cursor over documents already fetched"""
+
+    def __init__(self, docs):
+        self._it = iter(docs)
+
+    def __iter__(self):
+        return self._it
+
+    def __next__(self):
+        return next(self._it)
+
+    def batch_size(self, size):
+        return self
+
+
+class StubCollection(object):
+    def __init__(self, docs):
+        self.docs = docs
+
+    def find(self, *args, **kwargs):
+        return StubCursor(self.docs)
+
+
+class StubDatabase(object):
+    def __init__(self, docs):
+        self.doc = StubCollection(docs)
+
+
+class TimeCursor(object):
+    params = ["single", "batches"]
+    param_names = ["iteration"]
+    size = 10000
+
+    def setup(self, iteration):
+        docs = [{"_id": i, "x": i, "name": "doc"} for i in range(self.size)]
+        metadata = Metadata(StubDatabase(docs))
+        self.Doc = collection(
+            metadata,
+            "doc",
+            Field("_id", int),
+            Field("x", int),
+            Field("name", str),
+        )
+
+    def time_iterate(self, iteration):
+        if iteration == "single":
+            for doc in self.Doc.m.find():
+                pass
+        else:
+            for batch in self.Doc.m.find().batches(1000):
+                pass
+
+
+def main(number=10):
+    for iteration in TimeCursor.params:
+        bench = TimeCursor()
+        bench.setup(iteration)
+        elapsed = min(
+            timeit.repeat(
+                lambda: bench.time_iterate(iteration), number=number, repeat=3
+            )
+        )
+        print(
+            "{:>12}: {:>10,.0f} docs/sec".format(
+                iteration, number * bench.size / elapsed
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
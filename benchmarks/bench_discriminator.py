@@ -0,0 +1,113 @@
+"""Query plans of polymorphic discriminator filters on a collection with
+many subtypes: the former prefix $regex against the $eq/$in filters of
+Registration.spec.
+
+Needs a MongoDB server (BARIN_BENCH_MONGODB, default localhost). Run
+directly to print the explain() statistics of each filter::
+
+    $ python -m benchmarks.bench_discriminator
+"""
+import os
+import re
+
+import pymongo
+import pymongo.errors
+
+from barin import Metadata, Field, collection, derived
+
+MONGODB_URI = os.environ.get("BARIN_BENCH_MONGODB", "mongodb://localhost")
+SUBTYPES = 50
+DOCS_PER_SUBTYPE = 200
+
+
+def make_classes(metadata):
+    Base = collection(
+        metadata,
+        "bench_disc",
+        Field("_id", int),
+        Field("kind", str, default="base"),
+        polymorphic_discriminator="kind",
+        discriminator_index=True,
+    )
+    # kind-1 has derived classes kind-1.0, kind-1.1, ...: its prefix
+    # $regex also matches kind-10 ... kind-19
+    parents = [derived(Base, "kind-{}".format(i)) for i in range(SUBTYPES)]
+    for i in range(3):
+        derived(parents[1], "kind-1.{}".format(i))
+    return Base, parents[1]
+
+
+def kinds():
+    return ["kind-{}".format(i) for i in range(SUBTYPES)] + [
+        "kind-1.{}".format(i) for i in range(3)
+    ]
+
+
+class TrackDiscriminatorPlans(object):
+    params = ["regex", "eq_in"]
+    param_names = ["filter"]
+    timeout = 120
+
+    def setup(self, mode):
+        client = pymongo.MongoClient(
+            MONGODB_URI, serverSelectionTimeoutMS=2000
+        )
+        try:
+            client.admin.command("ping")
+        except pymongo.errors.PyMongoError:
+            raise NotImplementedError("No MongoDB server at " + MONGODB_URI)
+        metadata = Metadata(client.barin_bench)
+        Base, self.Derived = make_classes(metadata)
+        coll = Base.m.collection
+        if coll.estimated_document_count() == 0:
+            names = kinds()
+            coll.insert_many(
+                {"_id": i, "kind": names[i % len(names)]}
+                for i in range(len(names) * DOCS_PER_SUBTYPE)
+            )
+            for index in Base.m.indexes:
+                index.create(coll)
+        if mode == "regex":
+            self.filter = {"kind": {"$regex": "^" + re.escape("kind-1")}}
+        else:
+            self.filter = self.Derived.m.query._compile_query()["filter"]
+        self.coll = coll
+
+    def _stats(self):
+        plan = self.coll.find(self.filter).explain()
+        return plan["executionStats"]
+
+    def track_keys_examined(self, mode):
+        return self._stats()["totalKeysExamined"]
+
+    def track_docs_examined(self, mode):
+        return self._stats()["totalDocsExamined"]
+
+    def track_docs_returned(self, mode):
+        return self._stats()["nReturned"]
+
+    def time_query(self, mode):
+        list(self.coll.find(self.filter))
+
+
+def main():
+    for mode in TrackDiscriminatorPlans.params:
+        bench = TrackDiscriminatorPlans()
+        try:
+            bench.setup(mode)
+        except NotImplementedError as err:
+            print(err)
+            return
+        print(
+            "{:>8}: keys={:>6} docs={:>6} returned={:>6} filter={}".format(
+                mode,
+                bench.track_keys_examined(mode),
+                bench.track_docs_examined(mode),
+                bench.track_docs_returned(mode),
+                bench.filter,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Overhead of the ``.m`` manager descriptors.
+
+Run directly to print the cost per access::
+
+    $ python -m benchmarks.bench_manager
+"""
+import timeit
+
+from barin import Metadata, Field, collection
+
+
+class StubCollection(object):
+    """Stands in for a pymongo collection without doing any I/O"""
+
+    name = "doc"
+
+    def update_one(self, *args, **kwargs):
+        return None
+
+    def find(self, *args, **kwargs):
+        return iter([])
+
+
+class StubDatabase(object):
+    def __getattr__(self, name):
+        return StubCollection()
+
+
+def make_doc():
+    metadata = Metadata(StubDatabase())
+    return collection(
+        metadata,
+        "doc",
+        Field("_id", int),
+        Field("x", int),
+    )
+
+
+class TimeManager(object):
+    def setup(self):
+        self.Doc = make_doc()
+        self.doc = self.Doc.m.create(_id=1, x=1)
+
+    def time_class_manager(self):
+        self.Doc.m
+
+    def time_query(self):
+        self.Doc.m.query
+
+    def time_instance_manager(self):
+        self.doc.m
+
+    def time_instance_update(self):
+        self.doc.m.update({"$inc": {"x": 1}})
+
+
+def main(number=20000):
+    bench = TimeManager()
+    bench.setup()
+    for name in sorted(dir(bench)):
+        if not name.startswith("time_"):
+            continue
+        func = getattr(bench, name)
+        elapsed = min(timeit.repeat(func, number=number, repeat=3))
+        print("{:>24}: {:>8.2f} us".format(name, 1e6 * elapsed / number))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Field extraction from raw BSON documents with barin.numeric: the
+element scanner get_fields() and the RawBSONDocument walk get_paths().
+
+Run directly to print the documents/sec of each::
+
+    $ python -m benchmarks.bench_numeric
+"""
+import timeit
+
+import bson
+from bson.raw_bson import RawBSONDocument
+
+from barin import numeric
+
+NAMES = ["x", "point.lat", "point.lon"]
+
+
+def make_raw():
+    doc = dict(("f{}".format(i), "value-{}".format(i)) for i in range(20))
+    doc.update(x=1.5, point={"lat": 48.8, "lon": 2.3, "label": "here"})
+    return bson.encode(doc)
+
+
+class TimeExtract(object):
+    params = ["get_fields", "get_paths"]
+    param_names = ["function"]
+
+    def setup(self, function):
+        self.data = make_raw()
+        self.trie = numeric.PathTrie([n.split(".") for n in NAMES])
+        self.opts = bson.DEFAULT_CODEC_OPTIONS
+        if function == "get_fields":
+            try:
+                self.extract()
+            except (TypeError, KeyError) as err:
+                # The scanner relies on private bson element getters
+                raise NotImplementedError(
+                    "get_fields is incompatible with this bson: "
+                    "{!r}".format(err)
+                )
+
+    def extract(self):
+        return numeric.get_fields(self.data, self.opts, self.trie)
+
+    def time_extract(self, function):
+        if function == "get_fields":
+            self.extract()
+        else:
+            numeric.get_paths(RawBSONDocument(self.data), self.trie)
+
+
+def main(number=20000):
+    for function in TimeExtract.params:
+        bench = TimeExtract()
+        try:
+            bench.setup(function)
+        except NotImplementedError as err:
+            print("{:>12}: skipped ({})".format(function, err))
+            continue
+        elapsed = min(
+            timeit.repeat(
+                lambda: bench.time_extract(function), number=number, repeat=3
+            )
+        )
+        print("{:>12}: {:>10,.0f} docs/sec".format(function, number / elapsed))
+
+
+if __name__ == "__main__":
+    main()
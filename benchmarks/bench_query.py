@@ -0,0 +1,79 @@
+"""Query building, Query._compile_query, mql.and_ merging, and
+client-side matching with mql.compile_matcher.
+
+Run directly to print the cost per call::
+
+    $ python -m benchmarks.bench_query
+"""
+import timeit
+
+from barin import Metadata, Field, collection
+from barin import mql
+
+
+class TimeQuery(object):
+    def setup(self):
+        metadata = Metadata()
+        self.Doc = collection(
+            metadata,
+            "doc",
+            Field("_id", int),
+            Field("x", int),
+            Field("y", int),
+            Field("name", str),
+        )
+        self.query = self.build()
+        self.query._compile_query()
+        self.parts = [
+            {"x": {"$gte": 1}},
+            {"x": {"$lt": 10}},
+            {"y": 2},
+            {"name": {"$in": ["a", "b"]}},
+            {"$or": [{"y": 1}, {"y": 3}]},
+        ]
+        self.match = mql.compile_matcher(mql.and_(*self.parts))
+        self.docs = [
+            {"_id": i, "x": i % 20, "y": i % 4, "name": "ab"[i % 2]}
+            for i in range(1000)
+        ]
+
+    def build(self):
+        return (
+            self.Doc.m.query.match({"x": {"$gte": 1}})
+            .match({"y": 2})
+            .sort("x")
+            .skip(10)
+            .limit(20)
+        )
+
+    def time_build(self):
+        self.build()
+
+    def time_build_compile(self):
+        self.build()._compile_query()
+
+    def time_compile_cached(self):
+        self.query._compile_query()
+
+    def time_and_merge(self):
+        mql.and_(*self.parts)
+
+    def time_match_1000(self):
+        match = self.match
+        for doc in self.docs:
+            match(doc)
+
+
+def main(number=2000):
+    bench = TimeQuery()
+    bench.setup()
+    for name in sorted(dir(bench)):
+        if not name.startswith("time_"):
+            continue
+        func = getattr(bench, name)
+        elapsed = min(timeit.repeat(func, number=number, repeat=3))
+        print("{:>24}: {:>8.2f} us".format(name, 1e6 * elapsed / number))
+
+
+if __name__ == "__main__":
+    main()
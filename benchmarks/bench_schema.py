@@ -0,0 +1,103 @@
+"""Schema build time, and validation throughput by schema shape: flat,
+wide (many fields), deep (nested subdocuments) and array-heavy.
+
+Run directly to print the build times and docs/sec per shape and mode::
+
+    $ python -m benchmarks.bench_schema
+"""
+import timeit
+from datetime import datetime
+
+from barin import Metadata, Field, collection
+from barin import schema as S
+
+
+def shape(name):
+    """Return the (schema spec, document) of a shape"""
+    if name == "flat":
+        spec = {"_id": int, "name": str, "x": float, "when": datetime}
+        doc = {"_id": 1, "name": "doc", "x": 1.5, "when": datetime(2020, 1, 1)}
+    elif name == "wide":
+        spec = dict(("f{}".format(i), int) for i in range(100))
+        doc = dict(("f{}".format(i), i) for i in range(100))
+    elif name == "deep":
+        spec, doc = {"x": int}, {"x": 1}
+        for i in range(10):
+            spec = {"x": int, "child": spec}
+            doc = {"x": i, "child": doc}
+    elif name == "arrays":
+        spec = {
+            "tags": [str],
+            "points": [{"x": float, "y": float}],
+            "matrix": [[int]],
+        }
+        doc = {
+            "tags": ["tag-{}".format(i) for i in range(50)],
+            "points": [{"x": 1.0 * i, "y": 2.0 * i} for i in range(50)],
+            "matrix": [list(range(10)) for i in range(10)],
+        }
+    return spec, doc
+
+
+class TimeSchemaBuild(object):
+    def setup(self):
+        self.spec, doc = shape("wide")
+        self.metadata = Metadata()
+        self.Doc = collection(
+            self.metadata,
+            "doc",
+            *[Field(name, int) for name in self.spec]
+        )
+        self.reg = self.Doc.m.registry.by_class(self.Doc)
+
+    def time_compile_schema(self):
+        S.compile_schema(self.metadata, self.spec)
+
+    def time_registration_schema(self):
+        self.reg.__dict__.pop("schema", None)
+        self.reg.schema
+
+
+class TimeShapeValidation(object):
+    params = (["flat", "wide", "deep", "arrays"], ["interpreted", "compiled"])
+    param_names = ["shape", "mode"]
+
+    def setup(self, name, mode):
+        spec, self.doc = shape(name)
+        schema = S.compile_schema(None, spec, compiled=mode == "compiled")
+        self.validate = schema.validate
+        # Generate code outside of the timed region
+        self.validate(self.doc)
+
+    def time_validate(self, name, mode):
+        self.validate(self.doc)
+
+
+def main(number=2000):
+    bench = TimeSchemaBuild()
+    bench.setup()
+    for name in ("compile_schema", "registration_schema"):
+        func = getattr(bench, "time_" + name)
+        elapsed = min(timeit.repeat(func, number=number, repeat=3))
+        print("{:>20}: {:>8.2f} us".format(name, 1e6 * elapsed / number))
+    shapes, modes = TimeShapeValidation.params
+    for name in shapes:
+        for mode in modes:
+            bench = TimeShapeValidation()
+            bench.setup(name, mode)
+            elapsed = min(
+                timeit.repeat(
+                    lambda: bench.time_validate(name, mode),
+                    number=number,
+                    repeat=3,
+                )
+            )
+            print(
+                "{:>8} {:>12}: {:>10,.0f} docs/sec".format(
+                    name, mode, number / elapsed
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Document validation throughput: interpreted, code-generated, and
+trusted (validation skipped, see barin.schema.trusted).
+
+Run directly to print docs/sec for each mode::
+
+    $ python -m benchmarks.bench_validation
+"""
+import timeit
+from datetime import datetime
+
+import bson
+
+from barin import Metadata, Field, collection, subdocument
+from barin import schema as S
+from barin.schema.trusted import trusted_loader
+
+
+def make_schema(compiled):
+    metadata = Metadata()
+    item = subdocument(
+        metadata,
+        "item",
+        Field("sku", str),
+        Field("qty", int),
+        Field("price", float),
+    )
+    doc = collection(
+        metadata,
+        "order",
+        Field("_id", S.ObjectId, default=bson.ObjectId),
+        Field("customer", str),
+        Field("created", datetime),
+        Field("status", str, default="new"),
+        Field("total", float, default=0.0),
+        Field("notes", str, default=None),
+        Field("tags", [str]),
+        Field("items", [item]),
+        compiled=compiled,
+    )
+    return doc.m.schema
+
+
+def make_doc():
+    return {
+        "_id": bson.ObjectId(),
+        "customer": "alice",
+        "created": datetime(2020, 1, 1),
+        "status": "paid",
+        "total": 42,
+        "tags": ["a", "b", "c"],
+        "items": [
+            {"sku": "sku-{}".format(i), "qty": i, "price": 1.5 * i}
+            for i in range(5)
+        ],
+    }
+
+
+class TimeDocumentValidation(object):
+    params = ["interpreted", "compiled", "trusted"]
+    param_names = ["mode"]
+
+    def setup(self, mode):
+        self.schema = make_schema(mode == "compiled")
+        self.doc = make_doc()
+        if mode == "trusted":
+            self.validate = trusted_loader(self.schema)
+        else:
+            self.validate = self.schema.validate
+        # Generate code outside of the timed region
+        self.validate(self.doc)
+
+    def time_validate(self, mode):
+        self.validate(self.doc)
+
+
+def main(number=20000):
+    for mode in TimeDocumentValidation.params:
+        bench = TimeDocumentValidation()
+        bench.setup(mode)
+        elapsed = min(
+            timeit.repeat(
+                lambda: bench.time_validate(mode), number=number, repeat=3
+            )
+        )
+        print("{:>12}: {:>10,.0f} docs/sec".format(mode, number / elapsed))
+
+
+if __name__ == "__main__":
+    main()
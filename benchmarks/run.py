@@ -0,0 +1,213 @@
+"""Run the benchmark suite and record its results.
+
+The bench_* modules hold asv-style classes: Time*/Track* classes with
+optional params, param_names, setup() and teardown(), and time_* (timed)
+and track_* (value recorded) methods. A setup() raising
+NotImplementedError skips its benchmarks (e.g. those needing a MongoDB
+server). They can also be run with asv.
+
+This runner needs nothing but barin::
+
+    $ python -m benchmarks.run [--filter validation] [--compare FILE]
+
+It writes the results as JSON to benchmarks/results/, named after the
+date and git commit, and compares them with the previous results file
+(or FILE), reporting the benchmarks slower by more than --threshold.
+Record the results of each release to see regressions between them.
+"""
+import argparse
+import datetime
+import glob
+import importlib
+import inspect
+import itertools
+import json
+import os
+import pkgutil
+import platform
+import subprocess
+import sys
+import timeit
+
+import pymongo
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def discover(pattern=None):
+    """Yield the (module name, benchmark class) of the suite"""
+    path = [os.path.dirname(__file__)]
+    for info in sorted(pkgutil.iter_modules(path), key=lambda i: i.name):
+        if not info.name.startswith("bench_"):
+            continue
+        module = importlib.import_module("benchmarks." + info.name)
+        for name, cls in inspect.getmembers(module, inspect.isclass):
+            if cls.__module__ != module.__name__:
+                continue
+            if not name.startswith(("Time", "Track")):
+                continue
+            if pattern and pattern not in "{}.{}".format(info.name, name):
+                continue
+            yield info.name, cls
+
+
+def param_sets(cls):
+    params = getattr(cls, "params", None)
+    if params is None:
+        return [()]
+    if len(getattr(cls, "param_names", ())) > 1:
+        return list(itertools.product(*params))
+    return [(param,) for param in params]
+
+
+def run_class(module, cls, repeat=3, min_time=0.2):
+    """Yield the (key, result) of each benchmark of cls"""
+    methods = sorted(
+        name
+        for name in dir(cls)
+        if name.startswith("time_") or name.startswith("track_")
+    )
+    for args in param_sets(cls):
+        bench = cls()
+        label = "({})".format(", ".join(map(str, args))) if args else ""
+        try:
+            if hasattr(bench, "setup"):
+                bench.setup(*args)
+        except NotImplementedError as err:
+            for name in methods:
+                key = "{}.{}.{}{}".format(module, cls.__name__, name, label)
+                yield key, dict(skipped=str(err))
+            continue
+        try:
+            for name in methods:
+                key = "{}.{}.{}{}".format(module, cls.__name__, name, label)
+                func = getattr(bench, name)
+                if name.startswith("track_"):
+                    yield key, dict(value=func(*args), unit="value")
+                    continue
+                timer = timeit.Timer(lambda: func(*args))
+                number = _number(timer, min_time)
+                best = min(timer.repeat(repeat=repeat, number=number))
+                yield key, dict(value=best / number, unit="seconds")
+        finally:
+            if hasattr(bench, "teardown"):
+                bench.teardown(*args)
+
+
+def _number(timer, min_time):
+    """The number of calls taking at least min_time"""
+    number = 1
+    while True:
+        if timer.timeit(number) >= min_time:
+            return number
+        number *= 10
+
+
+def environment():
+    try:
+        commit = subprocess.check_output(
+            ["git", "rev-parse", "HEAD"],
+            cwd=os.path.dirname(__file__),
+            stderr=subprocess.DEVNULL,
+        )
+        commit = commit.decode("ascii").strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    try:
+        from importlib import metadata
+
+        version = metadata.version("barin")
+    except Exception:
+        version = None
+    return dict(
+        date=datetime.datetime.now().isoformat(timespec="seconds"),
+        commit=commit,
+        barin=version,
+        python=platform.python_version(),
+        pymongo=pymongo.version,
+        machine=platform.machine(),
+        platform=platform.platform(),
+    )
+
+
+def compare(previous, results, threshold):
+    """Print the ratio of each timing to the previous run's, returning
+    the keys slower by more than threshold"""
+    regressions = []
+    for key, result in sorted(results.items()):
+        old = previous.get(key)
+        if old is None or result.get("unit") != "seconds":
+            continue
+        if old.get("unit") != "seconds" or not old["value"]:
+            continue
+        ratio = result["value"] / old["value"]
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  REGRESSION"
+            regressions.append(key)
+        print("{:>7.2f}x  {}{}".format(ratio, key, flag))
+    return regressions
+
+
+def latest_results(directory, exclude=None):
+    paths = sorted(glob.glob(os.path.join(directory, "*.json")))
+    paths = [path for path in paths if path != exclude]
+    return paths[-1] if paths else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--filter", help="only run the matching classes")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--min-time",
+        type=float,
+        default=0.2,
+        help="seconds per measurement (default 0.2)",
+    )
+    parser.add_argument("--compare", help="results file to compare with")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="slowdown reported as a regression (default 0.2, i.e. 20%%)",
+    )
+    parser.add_argument("--output", default=RESULTS_DIR)
+    args = parser.parse_args(argv)
+
+    results = {}
+    for module, cls in discover(args.filter):
+        for key, result in run_class(module, cls, args.repeat, args.min_time):
+            results[key] = result
+            if "skipped" in result:
+                print(
+                    "     skipped  {} ({})".format(key, result["skipped"])
+                )
+            elif result["unit"] == "seconds":
+                print("{:>9.3f} us  {}".format(1e6 * result["value"], key))
+            else:
+                print("{:>12}  {}".format(result["value"], key))
+
+    env = environment()
+    if not os.path.isdir(args.output):
+        os.makedirs(args.output)
+    name = "{}-{}.json".format(
+        env["date"].replace(":", ""), (env["commit"] or "unknown")[:8]
+    )
+    path = os.path.join(args.output, name)
+    with open(path, "w") as fp:
+        json.dump(dict(env, results=results), fp, indent=2, sort_keys=True)
+    print("Results written to {}".format(path))
+
+    previous = args.compare or latest_results(args.output, exclude=path)
+    if previous is None:
+        return 0
+    with open(previous) as fp:
+        old = json.load(fp)
+    print("Compared with {} ({}):".format(previous, old.get("commit")))
+    regressions = compare(old["results"], results, args.threshold)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())